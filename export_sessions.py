@@ -1,161 +1,587 @@
 #!/usr/bin/env python3
 """
-Export all story sessions and judge evaluations to a single JSON file
-for the frontend viewer
+Export all story sessions and judge evaluations for the frontend viewer
+
+Writes a small index (frontend/public/sessions/index.json) plus one shard per
+session and one text file per scene, all named by content hash so they can be
+cached forever, with precompressed .gz (and .br when brotli is installed)
+variants next to them.
+
+Exports are incremental: a manifest of per-file mtimes, sizes and hashes
+(plus the stat of each session's text metrics cache) is kept next to the
+output, and only sessions whose files or metrics changed since the last
+run are re-read (through a worker pool).
+
+Local text metrics (text_metrics.py) are refreshed first and their summary
+is part of each session's stats.
 """
 
 import os
+import re
+import sys
+import gzip
 import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain
 from pathlib import Path
 
-def export_sessions():
-    """Export all sessions to frontend/public/data.json"""
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # optional, only needed for the .br variants
+    brotli = None
+
+sys.path.insert(0, str(Path(__file__).parent))
+from goat_storytelling_agent.story_file import read_scenes
+from text_metrics import METRICS_VERSION, load_metrics, metrics_path, update_metrics
+
+MANIFEST_VERSION = 5
+DEFAULT_WORKERS = 8
+HASH_LENGTH = 12
+# numeric judge fields that are worth sorting and filtering on
+SCORE_KEY_RE = re.compile(r'score|_rate$|^stakes_clarity$|^friction$', re.IGNORECASE)
+
+
+def atomic_write_bytes(path, data):
+    """Write bytes to a temp file in the same directory, then rename it over path"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Atomically write JSON to path"""
+    atomic_write_bytes(path, json.dumps(data, **dump_kwargs).encode('utf-8'))
+
+
+def write_compressed_variants(path, data):
+    """Write precompressed .gz (and .br if available) siblings of path"""
+    atomic_write_bytes(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        atomic_write_bytes(f"{path}.br", brotli.compress(data))
+
+
+def write_asset(public_dir, stem, suffix, data):
+    """Write a content-addressed asset and its compressed variants
+
+    Returns the asset path relative to public_dir, e.g.
+    "sessions/4/scene_0001.3f2a9c1b7d4e.txt"
+    """
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    rel_path = f"{stem}.{digest}{suffix}"
+    path = public_dir / rel_path
+    if not path.exists():
+        atomic_write_bytes(path, data)
+        write_compressed_variants(path, data)
+    return rel_path
+
+
+def hash_file(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_session_files(session_dir):
+    """Map every file under a session directory to its (mtime_ns, size)"""
+    files = {}
+    for root, _, names in os.walk(session_dir):
+        for name in names:
+            path = Path(root) / name
+            st = path.stat()
+            files[path.relative_to(session_dir).as_posix()] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def fingerprint_session(session_dir, stats, previous):
+    """Build the manifest entry for a session, hashing only files whose stat changed
+
+    Returns the new file fingerprints and whether the session content changed
+    compared to the previous manifest entry.
+    """
+    previous = previous or {}
+    fingerprints = {}
+    changed = set(stats) != set(previous)
+    for rel_path, (mtime_ns, size) in stats.items():
+        old = previous.get(rel_path)
+        if old and old["mtime_ns"] == mtime_ns and old["size"] == size:
+            fingerprints[rel_path] = old
+            continue
+        sha = hash_file(session_dir / rel_path)
+        if not old or old["sha256"] != sha:
+            changed = True
+        fingerprints[rel_path] = {"mtime_ns": mtime_ns, "size": size, "sha256": sha}
+    return fingerprints, changed
+
+
+def metrics_fingerprint(session_dir):
+    """Version, mtime and size of a session's cached text metrics (None if never computed)
+
+    The cache lives outside the session directory, so recomputed metrics
+    would not otherwise change the session's fingerprint.
+    """
+    try:
+        st = metrics_path(session_dir).stat()
+    except OSError:
+        return None
+    return {"version": METRICS_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def load_manifest(manifest_file):
+    """Load the export manifest, or an empty one if missing or incompatible"""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "sessions": {}}
+
+
+def load_previous_index(index_file):
+    """Index the session entries of the previous export by id"""
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return {s["id"]: s for s in json.load(f).get("sessions", [])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def exported_session_ids(output_dir):
+    """IDs of the sessions that have a shard directory in output_dir
+
+    Read from disk rather than the previous index, which --full ignores;
+    dot-directories (caches such as .text_metrics) are not sessions.
+    """
+    if not output_dir.exists():
+        return set()
+    return {d.name for d in output_dir.iterdir() if d.is_dir() and not d.name.startswith(".")}
+
+
+def load_session(session_dir):
+    """Read seed, plans and judge evaluations of one session directory
+
+    The story itself is read scene by scene with load_scenes.
+    """
+    session_id = session_dir.name.replace("session_", "")
+    session_data = {
+        "id": session_id,
+        "title": "Untitled Story",
+        "seed": {},
+        "plans": {},
+        "judges": {},
+        "text_metrics": None
+    }
+    
+    # Load seed.json if exists (new format)
+    seed_path = session_dir / "seed.json"
+    if seed_path.exists():
+        try:
+            with open(seed_path, 'r', encoding='utf-8') as f:
+                session_data["seed"] = json.load(f)
+                session_data["title"] = session_data["seed"].get("topic", "Untitled Story")
+        except Exception as e:
+            print(f"Warning: Could not read seed for {session_id}: {e}")
+    
+    # Load plans from plans/ folder (new format)
+    plans_dir = session_dir / "plans"
+    if plans_dir.exists():
+        plan_files = {
+            "initial_book_spec": "1_initial_book_spec.txt",
+            "enhanced_book_spec": "2_enhanced_book_spec.txt",
+            "initial_plot": "3_initial_plot.json",
+            "enhanced_plot": "4_enhanced_plot.json",
+            "scene_plan": "5_scene_plan.json"
+        }
+        
+        for key, filename in plan_files.items():
+            plan_path = plans_dir / filename
+            if plan_path.exists():
+                try:
+                    with open(plan_path, 'r', encoding='utf-8') as f:
+                        if filename.endswith('.json'):
+                            session_data["plans"][key] = json.load(f)
+                        else:
+                            session_data["plans"][key] = f.read()
+                except Exception as e:
+                    print(f"Warning: Could not read {filename} for {session_id}: {e}")
+    
+    # Fallback: extract plans from generation_log.json if plans/ doesn't exist
+    if not session_data["plans"]:
+        gen_log_path = session_dir / "generation_log.json"
+        if gen_log_path.exists():
+            try:
+                with open(gen_log_path, 'r', encoding='utf-8') as f:
+                    gen_log = json.load(f)
+                    
+                    # Get title from topic
+                    topic = gen_log.get("topic", "")
+                    if not topic:
+                        for step in gen_log.get("steps", []):
+                            if step.get("step") == "generate_story_start":
+                                topic = step.get("data", {}).get("topic", "")
+                                break
+                    if topic and not session_data["seed"]:
+                        session_data["title"] = topic
+                    
+                    # Extract plan data from steps (old format)
+                    for step in gen_log.get("steps", []):
+                        step_name = step.get("step", "")
+                        data = step.get("data", {})
+                        
+                        if step_name == "enhance_book_spec_success":
+                            session_data["plans"]["enhanced_book_spec"] = data.get("enhanced_spec", "")
+                        elif step_name == "enhance_plot_chapters_success":
+                            session_data["plans"]["enhanced_plot"] = data.get("enhanced_plan", [])
+                        elif step_name == "split_chapters_into_scenes_success":
+                            session_data["plans"]["scene_plan"] = data.get("scene_plan", [])
+            except Exception as e:
+                print(f"Warning: Could not read generation log for {session_id}: {e}")
+    
+    # Load judge evaluations from evaluations/ folder (new format)
+    evaluations_dir = session_dir / "evaluations"
+    if evaluations_dir.exists():
+        for eval_file in evaluations_dir.glob("*.json"):
+            judge_name = eval_file.stem
+            try:
+                with open(eval_file, 'r', encoding='utf-8') as f:
+                    session_data["judges"][judge_name] = json.load(f)
+            except Exception as e:
+                print(f"Warning: Could not read {judge_name} for {session_id}: {e}")
+    
+    # Fallback: load judges from root (old format)
+    if not session_data["judges"]:
+        judge_files = {
+            "gpa": "gpa_evaluation.json",
+            "structure": "structure_analysis.json",
+            "structure_simple": "structure_analysis_simple.json",
+            "character": "character_analysis.json",
+            "plot": "plot_analysis.json",
+            "writing_quality": "writing_quality.json"
+        }
+        
+        for judge_name, filename in judge_files.items():
+            judge_path = session_dir / filename
+            if judge_path.exists():
+                try:
+                    with open(judge_path, 'r', encoding='utf-8') as f:
+                        session_data["judges"][judge_name] = json.load(f)
+                except Exception as e:
+                    print(f"Warning: Could not read {judge_name} for {session_id}: {e}")
+
+    metrics = load_metrics(session_dir)
+    if metrics:
+        session_data["text_metrics"] = {"summary": metrics["summary"], "scenes": metrics["scenes"]}
+
+    return session_data
+
+
+def load_step_timeline(session_dir):
+    """(step name, timestamp) pairs from a session's generation_log.json"""
+    gen_log_path = session_dir / "generation_log.json"
+    if not gen_log_path.exists():
+        return []
+    try:
+        with open(gen_log_path, 'r', encoding='utf-8') as f:
+            steps = json.load(f).get("steps", [])
+        return [(step.get("step", ""), datetime.fromisoformat(step["timestamp"]))
+                for step in steps if step.get("timestamp")]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Warning: Could not read step timestamps for {session_dir.name}: {e}")
+        return []
+
+
+def timeline_durations(timeline):
+    """Total, per-stage and per-scene generation durations in seconds"""
+    if len(timeline) < 2:
+        return None, {}, []
+    times = np.array([ts.timestamp() for _, ts in timeline])
+    
+    # One duration per scene: archived logs have write_scene_N_M_start/_success
+    # pairs, current ones a single write_scene_N_M step timed from the step before
+    scene_seconds = []
+    stages = {}
+    starts = {}
+    previous = timeline[0][1]
+    for name, ts in timeline:
+        if name.startswith("write_scene_"):
+            if name.endswith("_start"):
+                starts[name] = ts
+            elif name.endswith("_success"):
+                start = starts.pop(name[:-len("_success")] + "_start", previous)
+                scene_seconds.append((ts - start).total_seconds())
+            elif not name.endswith("_error"):
+                scene_seconds.append((ts - previous).total_seconds())
+        elif name.endswith("_start"):
+            starts[name[:-len("_start")]] = ts
+        elif name.endswith("_success") and name[:-len("_success")] in starts:
+            stage = name[:-len("_success")]
+            stages[stage] = round((ts - starts.pop(stage)).total_seconds(), 3)
+        previous = ts
+    scene_seconds = np.array(scene_seconds)
+    if scene_seconds.size:
+        stages["write_scenes"] = round(float(scene_seconds.sum()), 3)
+    return round(float(times[-1] - times[0]), 3), stages, [round(float(x), 3) for x in scene_seconds]
+
+
+def parse_judge_value(value):
+    """Judge outputs are often JSON documents stored as strings, maybe fenced"""
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        text = text[len("json"):].strip() if text.startswith("json") else text
+    if text[:1] not in ("{", "["):
+        return value
+    try:
+        return json.loads(text)
+    except ValueError:
+        return value
+
+
+def extract_judge_scores(judges):
+    """Flatten numeric score fields of all judge outputs into {"judge.path": value}"""
+    scores = {}
+    
+    def walk(value, path, depth):
+        value = parse_judge_value(value)
+        if isinstance(value, dict) and depth < 3:
+            for key, item in value.items():
+                walk(item, path + [str(key)], depth + 1)
+        elif (isinstance(value, (int, float)) and not isinstance(value, bool)
+              and SCORE_KEY_RE.search(path[-1])):
+            scores[".".join(path)] = value
+    
+    for judge_name, data in judges.items():
+        walk(data, [judge_name], 0)
+    return scores
+
+
+def compute_session_stats(items):
+    """Compute stats for many sessions at once
+
+    Parameters
+    ----------
+    items : List[Tuple[dict, List[Dict], list]]
+        (session data, split scenes, step timeline) per session
+
+    Returns
+    -------
+    List[Dict]
+        Stats per session, in the same order. 'scene_words' holds the
+        per-scene word counts, everything else is small enough for the index.
+    """
+    n = len(items)
+    scene_words = [[len(scene["text"].split()) for scene in scenes] for _, scenes, _ in items]
+    scene_chars = [[len(scene["text"]) for scene in scenes] for _, scenes, _ in items]
+    
+    # Per-scene values of all sessions in one flat array, reduced per owner session
+    counts = np.array([len(words) for words in scene_words], dtype=np.int64)
+    owner = np.repeat(np.arange(n), counts)
+    words = np.fromiter(chain.from_iterable(scene_words), dtype=np.int64, count=int(counts.sum()))
+    chars = np.fromiter(chain.from_iterable(scene_chars), dtype=np.int64, count=int(counts.sum()))
+    word_totals = np.bincount(owner, weights=words, minlength=n)
+    char_totals = np.bincount(owner, weights=chars, minlength=n)
+    word_max = np.zeros(n, dtype=np.int64)
+    np.maximum.at(word_max, owner, words)
+    word_min = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(word_min, owner, words)
+    word_min[counts == 0] = 0
+    word_mean = np.divide(word_totals, counts, out=np.zeros(n), where=counts > 0)
+    
+    all_stats = []
+    for i, (session_data, _, timeline) in enumerate(items):
+        duration, stages, scene_seconds = timeline_durations(timeline)
+        all_stats.append({
+            "scene_count": int(counts[i]),
+            "word_count": int(word_totals[i]),
+            "char_count": int(char_totals[i]),
+            "avg_scene_words": round(float(word_mean[i]), 1),
+            "min_scene_words": int(word_min[i]),
+            "max_scene_words": int(word_max[i]),
+            "generation_seconds": duration,
+            "stage_seconds": stages,
+            "scene_seconds": scene_seconds,
+            "judge_scores": extract_judge_scores(session_data["judges"]),
+            "text_metrics": (session_data["text_metrics"] or {}).get("summary"),
+            "scene_words": scene_words[i]
+        })
+    return all_stats
+
+
+def load_scenes(session_dir):
+    """Scenes of a session's final_story.txt, sliced through its scene index"""
+    try:
+        return read_scenes(session_dir / "final_story.txt")
+    except Exception as e:
+        print(f"Warning: Could not read story for {session_dir.name.replace('session_', '')}: {e}")
+        return []
+
+
+def write_session_shards(session_data, scenes, stats, public_dir):
+    """Write the shard and per-scene files of a session, return its index entry"""
+    session_id = session_data["id"]
+    session_rel = f"sessions/{session_id}"
+    
+    scene_entries = []
+    for scene, words in zip(scenes, stats["scene_words"]):
+        data = scene["text"].encode('utf-8')
+        url = write_asset(public_dir, f"{session_rel}/scene_{scene['scene']:04d}", ".txt", data)
+        scene_entries.append({
+            "scene": scene["scene"],
+            "chapter": scene["chapter"],
+            "chars": len(scene["text"]),
+            "words": words,
+            "url": url
+        })
+    summary_stats = {key: value for key, value in stats.items()
+                     if key not in ("scene_words", "scene_seconds")}
+    
+    shard = dict(session_data)
+    shard["scenes"] = scene_entries
+    shard["stats"] = {key: value for key, value in stats.items() if key != "scene_words"}
+    shard_data = json.dumps(shard, ensure_ascii=False).encode('utf-8')
+    shard_url = write_asset(public_dir, f"{session_rel}/session", ".json", shard_data)
+    
+    # Drop assets of previous versions of this session
+    keep = {shard_url, *(scene["url"] for scene in scene_entries)}
+    for path in (public_dir / session_rel).iterdir():
+        rel_path = f"{session_rel}/{path.name}"
+        if rel_path.removesuffix(".gz").removesuffix(".br") not in keep:
+            path.unlink()
+    
+    return {
+        "id": session_id,
+        "title": session_data["title"],
+        "seed": session_data["seed"],
+        "scene_count": len(scene_entries),
+        "plans_count": len(session_data["plans"]),
+        "judges": sorted(session_data["judges"]),
+        "stats": summary_stats,
+        "shard": shard_url
+    }
+
+
+def export_sessions(full=False, workers=DEFAULT_WORKERS):
+    """Export all sessions to frontend/public/sessions/
+
+    Parameters
+    ----------
+    full : bool
+        Ignore the manifest and re-read every session
+    workers : int
+        Size of the worker pool used to fingerprint and load sessions
+    """
     
     project_root = Path(__file__).parent
     logs_dir = project_root / "story_generation_logs"
-    output_file = project_root / "frontend" / "public" / "data.json"
+    public_dir = project_root / "frontend" / "public"
+    output_dir = public_dir / "sessions"
+    index_file = output_dir / "index.json"
+    manifest_file = output_dir / ".export_manifest.json"
     
-    sessions = []
+    manifest = {"version": MANIFEST_VERSION, "sessions": {}} if full else load_manifest(manifest_file)
+    previous_index = {} if full else load_previous_index(index_file)
     
     # Scan all session directories
+    session_dirs = []
     if logs_dir.exists():
-        for session_dir in sorted(logs_dir.iterdir()):
-            if not session_dir.is_dir() or not session_dir.name.startswith("session_"):
-                continue
-            
-            session_id = session_dir.name.replace("session_", "")
-            session_data = {
-                "id": session_id,
-                "title": "Untitled Story",
-                "story": "",
-                "seed": {},
-                "plans": {},
-                "judges": {}
-            }
-            
-            # Load seed.json if exists (new format)
-            seed_path = session_dir / "seed.json"
-            if seed_path.exists():
-                try:
-                    with open(seed_path, 'r', encoding='utf-8') as f:
-                        session_data["seed"] = json.load(f)
-                        session_data["title"] = session_data["seed"].get("topic", "Untitled Story")
-                except Exception as e:
-                    print(f"Warning: Could not read seed for {session_id}: {e}")
-            
-            # Load story text
-            story_path = session_dir / "final_story.txt"
-            if story_path.exists():
-                try:
-                    with open(story_path, 'r', encoding='utf-8') as f:
-                        session_data["story"] = f.read()
-                except Exception as e:
-                    print(f"Warning: Could not read story for {session_id}: {e}")
-            
-            # Load plans from plans/ folder (new format)
-            plans_dir = session_dir / "plans"
-            if plans_dir.exists():
-                plan_files = {
-                    "initial_book_spec": "1_initial_book_spec.txt",
-                    "enhanced_book_spec": "2_enhanced_book_spec.txt",
-                    "initial_plot": "3_initial_plot.json",
-                    "enhanced_plot": "4_enhanced_plot.json",
-                    "scene_plan": "5_scene_plan.json"
-                }
-                
-                for key, filename in plan_files.items():
-                    plan_path = plans_dir / filename
-                    if plan_path.exists():
-                        try:
-                            with open(plan_path, 'r', encoding='utf-8') as f:
-                                if filename.endswith('.json'):
-                                    session_data["plans"][key] = json.load(f)
-                                else:
-                                    session_data["plans"][key] = f.read()
-                        except Exception as e:
-                            print(f"Warning: Could not read {filename} for {session_id}: {e}")
-            
-            # Fallback: extract plans from generation_log.json if plans/ doesn't exist
-            if not session_data["plans"]:
-                gen_log_path = session_dir / "generation_log.json"
-                if gen_log_path.exists():
-                    try:
-                        with open(gen_log_path, 'r', encoding='utf-8') as f:
-                            gen_log = json.load(f)
-                            
-                            # Get title from topic
-                            topic = gen_log.get("topic", "")
-                            if not topic:
-                                for step in gen_log.get("steps", []):
-                                    if step.get("step") == "generate_story_start":
-                                        topic = step.get("data", {}).get("topic", "")
-                                        break
-                            if topic and not session_data["seed"]:
-                                session_data["title"] = topic
-                            
-                            # Extract plan data from steps (old format)
-                            for step in gen_log.get("steps", []):
-                                step_name = step.get("step", "")
-                                data = step.get("data", {})
-                                
-                                if step_name == "enhance_book_spec_success":
-                                    session_data["plans"]["enhanced_book_spec"] = data.get("enhanced_spec", "")
-                                elif step_name == "enhance_plot_chapters_success":
-                                    session_data["plans"]["enhanced_plot"] = data.get("enhanced_plan", [])
-                                elif step_name == "split_chapters_into_scenes_success":
-                                    session_data["plans"]["scene_plan"] = data.get("scene_plan", [])
-                    except Exception as e:
-                        print(f"Warning: Could not read generation log for {session_id}: {e}")
-            
-            # Load judge evaluations from evaluations/ folder (new format)
-            evaluations_dir = session_dir / "evaluations"
-            if evaluations_dir.exists():
-                for eval_file in evaluations_dir.glob("*.json"):
-                    judge_name = eval_file.stem
-                    try:
-                        with open(eval_file, 'r', encoding='utf-8') as f:
-                            session_data["judges"][judge_name] = json.load(f)
-                    except Exception as e:
-                        print(f"Warning: Could not read {judge_name} for {session_id}: {e}")
-            
-            # Fallback: load judges from root (old format)
-            if not session_data["judges"]:
-                judge_files = {
-                    "gpa": "gpa_evaluation.json",
-                    "structure": "structure_analysis.json",
-                    "structure_simple": "structure_analysis_simple.json",
-                    "character": "character_analysis.json"
-                }
-                
-                for judge_name, filename in judge_files.items():
-                    judge_path = session_dir / filename
-                    if judge_path.exists():
-                        try:
-                            with open(judge_path, 'r', encoding='utf-8') as f:
-                                session_data["judges"][judge_name] = json.load(f)
-                        except Exception as e:
-                            print(f"Warning: Could not read {judge_name} for {session_id}: {e}")
-            
-            sessions.append(session_data)
-    
-    # Create output directory if needed
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Write to JSON
-    output = {
+        session_dirs = [d for d in sorted(logs_dir.iterdir())
+                        if d.is_dir() and d.name.startswith("session_")]
+    
+    # Cheap text metrics of changed stories (process pool, cached per story hash)
+    updated_metrics = update_metrics(session_dirs)
+    if updated_metrics:
+        print(f"📏 Updated text metrics of {len(updated_metrics)} sessions")
+    
+    def refresh(session_dir):
+        session_id = session_dir.name.replace("session_", "")
+        stats = scan_session_files(session_dir)
+        previous = manifest["sessions"].get(session_id, {})
+        fingerprints, changed = fingerprint_session(session_dir, stats, previous.get("files"))
+        manifest_entry = {"files": fingerprints, "metrics": metrics_fingerprint(session_dir)}
+        changed = changed or manifest_entry["metrics"] != previous.get("metrics")
+        entry = previous_index.get(session_id)
+        if not changed and entry and (public_dir / entry["shard"]).exists():
+            return session_id, entry, manifest_entry, None
+        session_data = load_session(session_dir)
+        loaded = (session_data, load_scenes(session_dir), load_step_timeline(session_dir))
+        return session_id, entry, manifest_entry, loaded
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(refresh, session_dirs))
+        
+        # Stats of all changed sessions are computed in one vectorized pass
+        changed = [loaded for _, _, _, loaded in results if loaded]
+        changed_stats = compute_session_stats(changed)
+        new_entries = dict(zip(
+            [session_data["id"] for session_data, _, _ in changed],
+            pool.map(lambda item, stats: write_session_shards(item[0], item[1], stats, public_dir),
+                     changed, changed_stats)))
+    
+    sessions = [new_entries.get(session_id, entry) for session_id, entry, _, _ in results]
+    reloaded = list(new_entries)
+    new_manifest = {
+        "version": MANIFEST_VERSION,
+        "sessions": {session_id: manifest_entry for session_id, _, manifest_entry, _ in results}
+    }
+    
+    # Remove shards of sessions that no longer exist
+    removed = exported_session_ids(output_dir) - {entry["id"] for entry in sessions}
+    for session_id in removed:
+        shutil.rmtree(output_dir / session_id, ignore_errors=True)
+    
+    index = {
         "sessions": sessions,
         "total": len(sessions)
     }
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    if reloaded or removed or not index_file.exists():
+        index_data = json.dumps(index, indent=2, ensure_ascii=False).encode('utf-8')
+        atomic_write_bytes(index_file, index_data)
+        write_compressed_variants(index_file, index_data)
+    atomic_write_json(manifest_file, new_manifest, indent=2)
     
-    print(f"✅ Exported {len(sessions)} sessions to {output_file}")
-    for session in sessions:
-        judges_count = len(session["judges"])
-        plans_count = len(session["plans"])
-        has_seed = "✓" if session["seed"] else "✗"
-        print(f"  - {session['id']}: {session['title'][:50]}... (seed:{has_seed} plans:{plans_count} judges:{judges_count})")
+    print(f"✅ Exported {len(sessions)} sessions to {output_dir}")
+    print(f"   ♻️  {len(sessions) - len(reloaded)} unchanged, 🔄 {len(reloaded)} reloaded, 🗑️  {len(removed)} removed")
+    for entry in sessions:
+        if entry["id"] not in reloaded:
+            continue
+        has_seed = "✓" if entry["seed"] else "✗"
+        print(f"  - {entry['id']}: {entry['title'][:50]}... (seed:{has_seed} plans:{entry['plans_count']} "
+              f"judges:{len(entry['judges'])} scenes:{entry['scene_count']} words:{entry['stats']['word_count']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export story sessions for the frontend viewer")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the change manifest and re-read every session")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"worker pool size (default: {DEFAULT_WORKERS})")
+    args = parser.parse_args()
+    export_sessions(full=args.full, workers=args.workers)
+
 
 if __name__ == "__main__":
-    export_sessions()
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import SessionList from './components/SessionList';
 import StoryViewer from './components/StoryViewer';
@@ -8,19 +8,21 @@ import StoryPlanPanel from './components/StoryPlanPanel';
 
 function App() {
   const [sessions, setSessions] = useState([]);
+  const [selectedEntry, setSelectedEntry] = useState(null);
   const [selectedSession, setSelectedSession] = useState(null);
+  const shardCache = useRef(new Map());
   const [selectedJudge, setSelectedJudge] = useState(null);
   const [loading, setLoading] = useState(true);
   const [viewMode, setViewMode] = useState('story'); // 'story' or 'plans'
 
   useEffect(() => {
-    // Load data from public/data.json
-    fetch('/data.json')
+    // Load the session index from public/sessions/index.json
+    fetch('/sessions/index.json', { cache: 'no-cache' })
       .then(res => res.json())
       .then(data => {
         setSessions(data.sessions);
         if (data.sessions.length > 0) {
-          setSelectedSession(data.sessions[0]);
+          setSelectedEntry(data.sessions[0]);
         }
         setLoading(false);
       })
@@ -30,6 +32,30 @@ function App() {
       });
   }, []);
 
+  useEffect(() => {
+    // Lazily load the shard of the selected session (shards are content-hashed)
+    if (!selectedEntry) {
+      setSelectedSession(null);
+      return;
+    }
+    const cached = shardCache.current.get(selectedEntry.shard);
+    if (cached) {
+      setSelectedSession(cached);
+      return;
+    }
+    let cancelled = false;
+    fetch(`/${selectedEntry.shard}`)
+      .then(res => res.json())
+      .then(shard => {
+        shardCache.current.set(selectedEntry.shard, shard);
+        if (!cancelled) {
+          setSelectedSession(shard);
+        }
+      })
+      .catch(err => console.error(`Error loading session ${selectedEntry.id}:`, err));
+    return () => { cancelled = true; };
+  }, [selectedEntry]);
+
   if (loading) {
     return (
       <div className="App loading">
@@ -48,8 +74,8 @@ function App() {
       <div className="app-layout">
         <SessionList
           sessions={sessions}
-          selectedSession={selectedSession}
-          onSelectSession={setSelectedSession}
+          selectedSession={selectedEntry}
+          onSelectSession={setSelectedEntry}
         />
         
         <div className="main-content">
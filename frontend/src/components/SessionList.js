@@ -22,7 +22,7 @@ function SessionList({ sessions, selectedSession, onSelectSession }) {
             </div>
             <div className="session-title">{session.title}</div>
             <div className="session-meta">
-              {Object.keys(session.judges).length} judges · {Object.keys(session.plans || {}).length} plans
+              {session.judges.length} judges · {session.plans_count} plans · {session.scene_count} scenes · {session.stats?.word_count ?? 0} words
             </div>
           </div>
         ))}
@@ -1,7 +1,34 @@
-import React from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './StoryViewer.css';
 
+const SCENES_PER_PAGE = 5;
+
 function StoryViewer({ session }) {
+  const [sceneTexts, setSceneTexts] = useState({});
+  const [visibleCount, setVisibleCount] = useState(SCENES_PER_PAGE);
+  const requested = useRef(new Set());
+
+  useEffect(() => {
+    setSceneTexts({});
+    setVisibleCount(SCENES_PER_PAGE);
+    requested.current = new Set();
+  }, [session]);
+
+  useEffect(() => {
+    // Fetch only the scenes that are on screen
+    if (!session) return;
+    (session.scenes || [])
+      .slice(0, visibleCount)
+      .filter(scene => !requested.current.has(scene.url))
+      .forEach(scene => {
+        requested.current.add(scene.url);
+        fetch(`/${scene.url}`)
+          .then(res => res.text())
+          .then(text => setSceneTexts(prev => ({ ...prev, [scene.url]: text })))
+          .catch(err => console.error(`Error loading scene ${scene.scene}:`, err));
+      });
+  }, [session, visibleCount]);
+
   if (!session) {
     return (
       <div className="story-viewer empty">
@@ -10,15 +37,36 @@ function StoryViewer({ session }) {
     );
   }
 
+  const scenes = session.scenes || [];
+
   return (
     <div className="story-viewer">
       <div className="story-header">
         <h2>{session.title}</h2>
-        <div className="story-meta">Session {session.id}</div>
+        <div className="story-meta">Session {session.id} · {scenes.length} scenes</div>
       </div>
       <div className="story-content">
-        {session.story ? (
-          <pre className="story-text">{session.story}</pre>
+        {scenes.length > 0 ? (
+          <>
+            {scenes.slice(0, visibleCount).map(scene => (
+              <div key={scene.url} className="story-scene">
+                <div className="scene-label">
+                  {scene.chapter ? `Chapter ${scene.chapter} · ` : ''}Scene {scene.scene}
+                </div>
+                <pre className="story-text">
+                  {sceneTexts[scene.url] ?? 'Loading scene...'}
+                </pre>
+              </div>
+            ))}
+            {visibleCount < scenes.length && (
+              <button
+                className="load-more-btn"
+                onClick={() => setVisibleCount(count => count + SCENES_PER_PAGE)}
+              >
+                Load more scenes ({scenes.length - visibleCount} remaining)
+              </button>
+            )}
+          </>
         ) : (
           <p className="no-story">No story text available</p>
         )}
@@ -28,4 +76,3 @@ function StoryViewer({ session }) {
 }
 
 export default StoryViewer;
-
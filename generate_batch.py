@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+GOAT Storytelling Agent - Batch Story Generation
+Generates one story per topic through a worker pool, with per-job status and resume
+
+Topics file formats:
+- plain text: one topic per line (blank lines and # comments are skipped)
+- JSONL (.jsonl): one job per line, e.g.
+  {"topic": "a heist on a moon base", "form": "short story", "preset": "short",
+   "options": {"model": "gpt-5", "max_tokens": 2000, "extra_options": {"temperature": 1.0}}}
+  "options" are StoryAgent keyword arguments and override the defaults of
+  generate_story.py; an optional "id" names the job. The preset (short,
+  medium or long, see goat_storytelling_agent/presets.py) sets the story
+  length and the token budget of each stage. "routes" sends stages to other
+  backends or models (see goat_storytelling_agent/routing.py).
+
+Every job gets a status file in <run dir>/jobs/<job id>.json (pending,
+running, done or failed, with its session ID, timings and error) and its
+console output in <run dir>/logs/<job id>.log. Running the same topics
+file with the same run dir again resumes: finished jobs are skipped,
+interrupted ones run again (failed ones too with --retry-failed). Each
+session gets a seed.json with the job it was generated from.
+
+Usage:
+    python generate_batch.py topics.txt --workers 4
+    python generate_batch.py jobs.jsonl --mode process --workers 8 --max-requests 16
+    python generate_batch.py jobs.jsonl --status
+    python generate_batch.py topics.txt --degeneration truncate
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import threading
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from generate_story import LoggingStoryAgent
+from goat_storytelling_agent import routing
+from goat_storytelling_agent.presets import STORY_PRESETS
+from goat_storytelling_agent.storytelling_agent import DEGENERATION_ACTIONS, SUPPORTED_BACKENDS
+
+MODES = ["thread", "process", "asyncio"]
+DEFAULT_RUN_DIR = "batch_runs"
+
+# Same agent configuration as generate_story.main
+AGENT_DEFAULTS = {
+    "model": "gpt-5",
+    "max_tokens": 2000,
+    "extra_options": {
+        # GPT-5 only supports default temperature (1.0) and top_p (1.0)
+        "temperature": 1.0,
+        "top_p": 1.0,
+    },
+}
+AGENT_OPTIONS = {"model", "max_tokens", "request_timeout", "n_crop_previous",
+                 "extra_options", "scene_extra_options", "degeneration", "structured",
+                 "routes", "balance"}
+
+# Limits model calls in flight across all workers of this process tree (None = unlimited),
+# set by init_worker
+_request_slots = None
+
+
+class _JobOutput:
+    """sys.stdout replacement that sends each worker thread's prints to its job log"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        return (getattr(self.local, "log", None) or self.stream).write(text)
+
+    def flush(self):
+        (getattr(self.local, "log", None) or self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+_output_lock = threading.Lock()
+
+
+@contextmanager
+def job_output(log_path: str):
+    """Send the current thread's prints to log_path while the block runs"""
+    with _output_lock:
+        if not isinstance(sys.stdout, _JobOutput):
+            sys.stdout = _JobOutput(sys.stdout)
+    with open(log_path, "a", encoding="utf-8") as log:
+        sys.stdout.local.log = log
+        try:
+            yield
+        finally:
+            sys.stdout.local.log = None
+
+
+def init_worker(request_slots=None):
+    global _request_slots
+    _request_slots = request_slots
+
+
+class BatchStoryAgent(LoggingStoryAgent):
+    """LoggingStoryAgent that waits for a global request slot before each model call"""
+
+    def query_chat(self, messages, retries=3, **kwargs):
+        if _request_slots is None:
+            return super().query_chat(messages, retries, **kwargs)
+        with _request_slots:
+            return super().query_chat(messages, retries, **kwargs)
+
+
+# === Jobs ===
+
+def load_jobs(topics_file: str) -> list:
+    """Jobs of a topics file, each with a stable ID so reruns can resume"""
+    with open(topics_file, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    jobs = []
+    for line_num, line in enumerate(lines, start=1):
+        if not line or line.startswith("#"):
+            continue
+        job = json.loads(line) if topics_file.endswith(".jsonl") else {"topic": line}
+        error = job_error(job)
+        if error:
+            raise ValueError(f"{topics_file}:{line_num}: {error}")
+        if not job.get("id"):
+            digest = hashlib.sha1(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+            job["id"] = f"{len(jobs) + 1:04d}-{digest}"
+        jobs.append(job)
+    ids = [job["id"] for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"{topics_file}: duplicate job IDs")
+    return jobs
+
+
+def job_error(job) -> str:
+    """What is wrong with a job spec (None if it can be run)"""
+    if not isinstance(job, dict) or not isinstance(job.get("topic"), str) or not job["topic"].strip():
+        return "job without a topic"
+    if not isinstance(job.get("options", {}), dict):
+        return "options must be an object"
+    unknown = set(job.get("options", {})) - AGENT_OPTIONS
+    if unknown:
+        return f"unknown options {', '.join(sorted(unknown))}"
+    if job.get("preset") and job["preset"] not in STORY_PRESETS:
+        return f"unknown preset {job['preset']}"
+    return None
+
+
+def agent_kwargs(job: dict, backend: str, backend_uri: str) -> dict:
+    options = {**AGENT_DEFAULTS, **job.get("options", {})}
+    if job.get("form"):
+        options["form"] = job["form"]
+    if job.get("preset"):
+        options["preset"] = job["preset"]
+    return {"backend_uri": backend_uri, "backend": backend, **options}
+
+
+def write_json(path: str, data: dict) -> None:
+    """Write JSON atomically (a status file is never seen half written)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def seed_model(agent: LoggingStoryAgent) -> str:
+    """Model that writes the scenes: the model name on openai, the route description
+    (backend and endpoint) on hf and llama.cpp, which ignore the model option"""
+    route = agent.route("write_a_scene")
+    return route["model"] if route["backend"] == "openai" else routing.describe(route)
+
+
+def write_seed(agent: LoggingStoryAgent, job: dict, kwargs: dict) -> None:
+    """seed.json: the job a session was generated from (backend URI left out, it may be a key)
+
+    The top-level fields are the ones export_sessions.py and the frontend show.
+    """
+    write_json(os.path.join(agent.session_dir, "seed.json"), {
+        "topic": job["topic"],
+        "length_preset": job.get("preset"),
+        "model": seed_model(agent),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "job": job,
+        "agent": {key: value for key, value in kwargs.items() if key != "backend_uri"},
+    })
+
+
+def status_path(run_dir: str, job_id: str) -> str:
+    return os.path.join(run_dir, "jobs", f"{job_id}.json")
+
+
+def load_status(run_dir: str, job: dict) -> dict:
+    try:
+        with open(status_path(run_dir, job["id"]), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"job_id": job["id"], "topic": job["topic"], "state": "pending", "attempts": 0}
+
+
+def run_job(job: dict, run_dir: str, backend: str, backend_uri: str) -> dict:
+    """Generate the story of one job, return its final status
+
+    Runs inside a worker thread or process; exceptions end up in the status.
+    """
+    status = load_status(run_dir, job)
+    status.update(state="running", attempts=status.get("attempts", 0) + 1,
+                  started=time.strftime("%Y-%m-%dT%H:%M:%S"), finished=None, error=None)
+    write_json(status_path(run_dir, job["id"]), status)
+    started = time.monotonic()
+
+    with job_output(os.path.join(run_dir, "logs", f"{job['id']}.log")):
+        try:
+            kwargs = agent_kwargs(job, backend, backend_uri)
+            writer = BatchStoryAgent(**kwargs)
+            status["session_id"] = writer.session_id
+            write_json(status_path(run_dir, job["id"]), status)
+            write_seed(writer, job, kwargs)
+            scenes = writer.generate_story_with_logging(job["topic"])
+            status.update(state="done", scenes=len(scenes))
+        except Exception as e:
+            traceback.print_exc(file=sys.stdout)
+            status.update(state="failed", error=f"{type(e).__name__}: {e}")
+
+    status.update(finished=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  seconds=round(time.monotonic() - started, 1))
+    write_json(status_path(run_dir, job["id"]), status)
+    return status
+
+
+# === Worker pools ===
+
+def run_pool(jobs, run_dir, backend, backend_uri, mode="thread", workers=4, max_requests=None):
+    """Run jobs with at most `workers` stories and `max_requests` model calls at once
+
+    Yields each job's final status as it finishes.
+    """
+    args = (run_dir, backend, backend_uri)
+    if mode == "asyncio":
+        # The agent is synchronous: the event loop only schedules, each job runs in a thread
+        init_worker(threading.BoundedSemaphore(max_requests) if max_requests else None)
+        results = []
+
+        async def run_all():
+            slots = asyncio.Semaphore(workers)
+
+            async def run_one(job):
+                async with slots:
+                    return await asyncio.to_thread(run_job, job, *args)
+
+            for future in asyncio.as_completed([run_one(job) for job in jobs]):
+                results.append(await future)
+                print(progress_line(len(results), len(jobs), results[-1]))
+
+        asyncio.run(run_all())
+        yield from results
+        return
+
+    if mode == "process":
+        request_slots = multiprocessing.BoundedSemaphore(max_requests) if max_requests else None
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(request_slots,))
+    else:
+        init_worker(threading.BoundedSemaphore(max_requests) if max_requests else None)
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool:
+        futures = [pool.submit(run_job, job, *args) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            status = future.result()
+            print(progress_line(done, len(jobs), status))
+            yield status
+
+
+def progress_line(done: int, total: int, status: dict) -> str:
+    if status["state"] == "done":
+        return (f"[{done}/{total}] ✅ {status['job_id']} → session {status.get('session_id')} "
+                f"({status.get('scenes')} scenes, {status.get('seconds')}s)")
+    return f"[{done}/{total}] ❌ {status['job_id']}: {status.get('error')}"
+
+
+def print_status(jobs, run_dir):
+    statuses = [load_status(run_dir, job) for job in jobs]
+    counts = {}
+    for status in statuses:
+        counts[status["state"]] = counts.get(status["state"], 0) + 1
+    print(f"📊 {len(jobs)} jobs: " + ", ".join(f"{count} {state}" for state, count in sorted(counts.items())))
+    for status in statuses:
+        if status["state"] != "done":
+            detail = f" - {status['error']}" if status.get("error") else ""
+            print(f"  {status['state']:8} {status['job_id']} {status['topic'][:60]}{detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate one story per topic through a worker pool")
+    parser.add_argument("topics_file", help="one topic per line, or JSONL with per-job form/preset/options")
+    parser.add_argument("--run-dir", default=None,
+                        help=f"status and job logs (default: {DEFAULT_RUN_DIR}/<topics file name>)")
+    parser.add_argument("--mode", choices=MODES, default="thread", help="worker pool type (default: thread)")
+    parser.add_argument("--workers", type=int, default=4, help="stories generated at once (default: 4)")
+    parser.add_argument("--max-requests", type=int, default=None,
+                        help="model calls in flight across all workers (default: unlimited)")
+    parser.add_argument("--backend", choices=SUPPORTED_BACKENDS, default="openai")
+    parser.add_argument("--backend-uri", default=None,
+                        help="endpoint of the hf / llama.cpp server, or comma-separated replicas to "
+                             "balance over (default for openai: OPENAI_API_KEY)")
+    parser.add_argument("--degeneration", choices=DEGENERATION_ACTIONS, default=None,
+                        help="stop degenerate scene generations early, then truncate or retry them "
+                             "(default: off; a job's own degeneration option wins)")
+    parser.add_argument("--retry-failed", action="store_true", help="run failed jobs again")
+    parser.add_argument("--status", action="store_true", help="only show the status of the jobs")
+    args = parser.parse_args()
+
+    load_dotenv()
+    jobs = load_jobs(args.topics_file)
+    if args.degeneration:
+        for job in jobs:
+            job.setdefault("options", {}).setdefault("degeneration", args.degeneration)
+    run_dir = args.run_dir or os.path.join(DEFAULT_RUN_DIR, os.path.splitext(os.path.basename(args.topics_file))[0])
+    os.makedirs(os.path.join(run_dir, "jobs"), exist_ok=True)
+    os.makedirs(os.path.join(run_dir, "logs"), exist_ok=True)
+    if args.status:
+        print_status(jobs, run_dir)
+        return
+
+    backend_uri = args.backend_uri
+    if args.backend == "openai" and not backend_uri:
+        backend_uri = os.getenv("OPENAI_API_KEY")
+    if not backend_uri:
+        raise ValueError("Please set OPENAI_API_KEY (you can use a .env file) or pass --backend-uri")
+    if args.backend != "openai" and "," in backend_uri:
+        backend_uri = [uri.strip() for uri in backend_uri.split(",") if uri.strip()]
+
+    skip = {"done"} if args.retry_failed else {"done", "failed"}
+    todo = [job for job in jobs if load_status(run_dir, job)["state"] not in skip]
+    print("🎭 GOAT Storytelling Agent - Batch Generation")
+    print("=" * 80)
+    print(f"📚 {len(jobs)} jobs, {len(jobs) - len(todo)} already finished, running {len(todo)} "
+          f"with {args.workers} {args.mode} workers")
+    print(f"📁 Status and job logs: {run_dir}")
+    if not todo:
+        print_status(jobs, run_dir)
+        return
+
+    started = time.monotonic()
+    results = list(run_pool(todo, run_dir, args.backend, backend_uri, args.mode, args.workers, args.max_requests))
+    failed = sum(1 for status in results if status["state"] != "done")
+    print(f"\n🏁 {len(results) - failed} stories generated, {failed} failed in {time.monotonic() - started:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
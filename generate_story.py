@@ -10,6 +10,7 @@ import os
 from typing import Dict, List, Tuple, Any
 from dotenv import load_dotenv
 from goat_storytelling_agent.storytelling_agent import StoryAgent
+from goat_storytelling_agent.story_file import StoryWriter
 
 def get_next_session_id(logs_dir: str) -> int:
     """Get the next available session ID (numeric, starting from 1)"""
@@ -32,21 +33,64 @@ def get_next_session_id(logs_dir: str) -> int:
     
     return max(existing_sessions) + 1
 
+def allocate_session_dir(logs_dir: str) -> Tuple[str, str]:
+    """Create the next numeric session directory, return (session_id, session_dir)
+
+    os.mkdir fails if the directory already exists, so concurrent agents
+    (threads or processes) never end up sharing a session.
+    """
+    session_num = get_next_session_id(logs_dir)
+    while True:
+        session_dir = os.path.join(logs_dir, f"session_{session_num}")
+        try:
+            os.mkdir(session_dir)
+            return str(session_num), session_dir
+        except FileExistsError:
+            session_num += 1
+
+
+def write_session_logs(session_dir: str, session_id: str, log_data: Dict) -> None:
+    """Write a session's generation_log.json and its human-readable generation_log.txt"""
+    # Save JSON log
+    json_file = os.path.join(session_dir, "generation_log.json")
+    with open(json_file, "w") as f:
+        json.dump(log_data, f, indent=2)
+    
+    # Save human-readable log
+    txt_file = os.path.join(session_dir, "generation_log.txt")
+    with open(txt_file, "w") as f:
+        f.write(f"GOAT Storytelling Agent - Session {session_id}\n")
+        f.write(f"Generated: {log_data['timestamp']}\n")
+        f.write(f"Topic: {log_data.get('topic', 'N/A')}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        for step in log_data["steps"]:
+            f.write(f"\n[{step['timestamp']}] {step['step'].upper()} ({step['status']})\n")
+            f.write("-" * 40 + "\n")
+            
+            # Write main data
+            if isinstance(step['data'], str):
+                f.write(step['data'])
+            elif isinstance(step['data'], dict):
+                f.write(json.dumps(step['data'], indent=2))
+            else:
+                f.write(str(step['data']))
+            
+            f.write("\n\n")
+
+
 class LoggingStoryAgent(StoryAgent):
     """Enhanced StoryAgent with comprehensive logging"""
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, logs_dir="story_generation_logs", **kwargs):
         super().__init__(*args, **kwargs)
         
         # Create logs directory
-        self.logs_dir = "story_generation_logs"
+        self.logs_dir = logs_dir
         os.makedirs(self.logs_dir, exist_ok=True)
         
-        # Get next numeric session ID
-        session_num = get_next_session_id(self.logs_dir)
-        self.session_id = str(session_num)
-        self.session_dir = os.path.join(self.logs_dir, f"session_{self.session_id}")
-        os.makedirs(self.session_dir, exist_ok=True)
+        # Claim the next numeric session ID
+        self.session_id, self.session_dir = allocate_session_dir(self.logs_dir)
         
         # Initialize log data
         self.log_data = {
@@ -76,32 +120,7 @@ class LoggingStoryAgent(StoryAgent):
     
     def save_logs(self):
         """Save current log data to files"""
-        # Save JSON log
-        json_file = os.path.join(self.session_dir, "generation_log.json")
-        with open(json_file, "w") as f:
-            json.dump(self.log_data, f, indent=2)
-        
-        # Save human-readable log
-        txt_file = os.path.join(self.session_dir, "generation_log.txt")
-        with open(txt_file, "w") as f:
-            f.write(f"GOAT Storytelling Agent - Session {self.session_id}\n")
-            f.write(f"Generated: {self.log_data['timestamp']}\n")
-            f.write(f"Topic: {self.log_data.get('topic', 'N/A')}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for step in self.log_data["steps"]:
-                f.write(f"\n[{step['timestamp']}] {step['step'].upper()} ({step['status']})\n")
-                f.write("-" * 40 + "\n")
-                
-                # Write main data
-                if isinstance(step['data'], str):
-                    f.write(step['data'])
-                elif isinstance(step['data'], dict):
-                    f.write(json.dumps(step['data'], indent=2))
-                else:
-                    f.write(str(step['data']))
-                
-                f.write("\n\n")
+        write_session_logs(self.session_dir, self.session_id, self.log_data)
     
     def write_a_scene_with_logging(self, scene, sc_num, ch_num, plan, 
                                     previous_scene=None):
@@ -109,21 +128,26 @@ class LoggingStoryAgent(StoryAgent):
         print(f"\n📝 Generating scene {sc_num} of chapter {ch_num}...")
         
         # Generate scene using base StoryAgent
+        n_stopped = len(self.degeneration_events)
         messages, generated_scene = super(LoggingStoryAgent, self).write_a_scene(
             scene, sc_num, ch_num, plan, previous_scene)
         
-        # Log the scene generation
-        self.log_step(f"write_scene_{ch_num}_{sc_num}", {
-            "final_scene": generated_scene,
-            "scene_length": len(generated_scene)
-        }, "success")
+        # Log the scene generation (the text itself is streamed to final_story.txt)
+        scene_log = {"scene_length": len(generated_scene)}
+        if len(self.degeneration_events) > n_stopped:
+            scene_log["degeneration"] = self.degeneration_events[n_stopped:]
+        self.log_step(f"write_scene_{ch_num}_{sc_num}", scene_log, "success")
         
         return messages, generated_scene
     
     def generate_story_with_logging(self, topic):
-        """Story generation with comprehensive logging"""
+        """Story generation with comprehensive logging
+
+        Scenes are streamed to final_story.txt as they complete. Returns the
+        scene offset index of the written story (see story_file.StoryReader).
+        """
         self.log_data["topic"] = topic
-        self.log_step("generate_story_start", {"topic": topic})
+        self.log_step("generate_story_start", {"topic": topic, "structured": self.structured})
         
         try:
             print(f"\n🎭 Starting story generation for: '{topic}'")
@@ -165,58 +189,68 @@ class LoggingStoryAgent(StoryAgent):
             
             # Step 6: Scene Text Generation
             print(f"\n📋 STEP 6: Generating scene text...")
-            form_text = []
+            # Scenes are appended to the story file (and its scene index) as soon
+            # as they are written; only the previous scene is kept in memory
+            story_file = os.path.join(self.session_dir, "final_story.txt")
+            previous_scene = None
             total_scenes = 0
             
-            for act_idx, act in enumerate(plan):
-                print(f"\n🔍 Processing Act {act_idx + 1}...")
-                if 'chapter_scenes' not in act:
-                    print(f"⚠️  Act {act_idx + 1} missing 'chapter_scenes' key")
-                    continue
-                    
-                chapter_scenes = act['chapter_scenes']
-                
-                for ch_num, chapter in chapter_scenes.items():
-                    sc_num = 1
-                    for scene_idx, scene in enumerate(chapter):
-                        previous_scene = form_text[-1] if form_text else None
+            with StoryWriter(story_file) as story:
+                for act_idx, act in enumerate(plan):
+                    print(f"\n🔍 Processing Act {act_idx + 1}...")
+                    if 'chapter_scenes' not in act:
+                        print(f"⚠️  Act {act_idx + 1} missing 'chapter_scenes' key")
+                        continue
                         
-                        try:
-                            _, generated_scene = self.write_a_scene_with_logging(
-                                scene, sc_num, ch_num, plan,
-                                previous_scene=previous_scene
-                            )
-                            form_text.append(generated_scene)
-                            total_scenes += 1
-                            print(f"✅ Scene {sc_num} completed (length: {len(generated_scene)})")
-                        except Exception as e:
-                            print(f"❌ ERROR writing scene {sc_num}: {e}")
-                            self.log_step(f"write_scene_{ch_num}_{sc_num}_error", {"error": str(e)}, "error")
-                            form_text.append(f"[ERROR: Could not generate scene {sc_num}]")
-                        sc_num += 1
-            
-            # Save final story
-            story_file = os.path.join(self.session_dir, "final_story.txt")
-            with open(story_file, "w") as f:
-                for i, scene in enumerate(form_text, 1):
-                    f.write(f"\n{'='*20} SCENE {i} {'='*20}\n")
-                    f.write(scene)
-                    f.write("\n\n")
+                    chapter_scenes = act['chapter_scenes']
+                    
+                    for ch_num, chapter in chapter_scenes.items():
+                        sc_num = 1
+                        for scene_idx, scene in enumerate(chapter):
+                            try:
+                                _, generated_scene = self.write_a_scene_with_logging(
+                                    scene, sc_num, ch_num, plan,
+                                    previous_scene=previous_scene
+                                )
+                                total_scenes += 1
+                                print(f"✅ Scene {sc_num} completed (length: {len(generated_scene)})")
+                            except Exception as e:
+                                print(f"❌ ERROR writing scene {sc_num}: {e}")
+                                self.log_step(f"write_scene_{ch_num}_{sc_num}_error", {"error": str(e)}, "error")
+                                generated_scene = f"[ERROR: Could not generate scene {sc_num}]"
+                            story.append(generated_scene, chapter=ch_num, chapter_scene=sc_num)
+                            previous_scene = generated_scene
+                            sc_num += 1
             
             # Final logging
+            degeneration = self.degeneration_report()
             final_stats = {
                 "num_scenes": total_scenes,
-                "total_length": sum(len(scene) for scene in form_text),
-                "story_file": story_file
+                "total_length": story.total_chars,
+                "story_file": story_file,
+                "degeneration": degeneration,
+                "requeries": dict(self.requeries),
+                "route_calls": dict(self.route_calls),
+                "escalations": dict(self.escalations)
             }
             
             self.log_step("generate_story_success", final_stats)
             
             print(f"\n🎉 STORY GENERATION COMPLETE!")
             print(f"📊 Generated {total_scenes} scenes total")
-            print(f"📊 Total text length: {sum(len(scene) for scene in form_text)} characters")
+            print(f"📊 Total text length: {story.total_chars} characters")
+            if degeneration["stopped"]:
+                print(f"🛑 Stopped {degeneration['stopped']} degenerate generations early, "
+                      f"saving up to {degeneration['max_tokens_saved']} tokens "
+                      f"(~{degeneration['est_seconds_saved']}s)")
+            if any(self.requeries.values()):
+                print(f"🔁 Calls wasted on unusable spec/plan replies: {sum(self.requeries.values())} "
+                      f"({', '.join(f'{stage}: {n}' for stage, n in self.requeries.items() if n)})")
+            if self.escalations:
+                print(f"⬆️  Cascade escalations: "
+                      f"{', '.join(f'{stage}: {n}' for stage, n in self.escalations.items())}")
             
-            return form_text
+            return story.index
             
         except Exception as e:
             self.log_step("generate_story_error", {"error": str(e)}, "error")
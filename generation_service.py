@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Story generation service
+Long-running process that accepts generation jobs over HTTP, keeps them in a
+local SQLite queue and works through them with a pool of StoryAgent workers,
+so frontends can submit stories without starting a Python process (and
+reloading tokenizers and clients) per story. Standard library only.
+
+Endpoints (JSON):
+    POST   /api/jobs                  submit {"topic", "form"?, "preset"?, "options"?}
+                                      (same job format as generate_batch.py)
+    GET    /api/jobs?state=&page=     paginated jobs, newest first
+    GET    /api/jobs/<id>             one job with its state and progress
+    GET    /api/jobs/<id>/events      progress as Server-Sent Events until the job ends
+    POST   /api/jobs/<id>/cancel      cancel (DELETE /api/jobs/<id> does the same)
+
+Jobs write regular sessions to story_generation_logs/session_<id>/ (plus a
+seed.json and the job's console output in console.log), so log_viewer.py,
+export_sessions.py and the judges work on them as usual. A running job is
+cancelled before its next model call. Jobs that were running when the
+service stopped are queued again on startup; the partial session they
+left behind gets a generate_story_interrupted step, and the job starts
+over in a new session.
+
+Usage: python generation_service.py [--workers 2] [--port 8766] [--backend openai]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import traceback
+from contextlib import closing
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, str(Path(__file__).parent))
+from dotenv import load_dotenv
+
+from generate_batch import agent_kwargs, job_error, job_output, write_seed
+from generate_story import LoggingStoryAgent, write_session_logs
+from goat_storytelling_agent.storytelling_agent import SUPPORTED_BACKENDS
+from session_server import paginate
+
+DEFAULT_PORT = 8766
+DEFAULT_DB = str(Path(__file__).parent / "generation_jobs.db")
+DEFAULT_LOGS_DIR = str(Path(__file__).parent / "story_generation_logs")
+POLL_SECONDS = 0.5       # how often workers and event streams look at the queue
+HEARTBEAT_SECONDS = 15   # comment line on idle event streams so proxies keep them open
+MAX_BODY_BYTES = 64 * 1024
+
+STATES = ["queued", "running", "done", "failed", "cancelled"]
+FINAL_STATES = {"done", "failed", "cancelled"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    session_id TEXT,
+    progress TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created TEXT NOT NULL,
+    started TEXT,
+    finished TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+ROUTES = [
+    (re.compile(r'^/api/jobs/?$'), 'jobs'),
+    (re.compile(r'^/api/jobs/(?P<job_id>\d+)/?$'), 'job'),
+    (re.compile(r'^/api/jobs/(?P<job_id>\d+)/events/?$'), 'events'),
+    (re.compile(r'^/api/jobs/(?P<job_id>\d+)/cancel/?$'), 'cancel'),
+]
+
+
+class NotFound(Exception):
+    pass
+
+
+class JobCancelled(BaseException):
+    """Raised inside a worker when its job is cancelled
+
+    A BaseException so the agent's per-scene error handling does not
+    swallow it and carry on with the next scene.
+    """
+
+
+def now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """Generation jobs in a SQLite database, safe to use from many threads
+
+    Every operation opens its own short-lived connection; claiming a job
+    takes the database write lock, so two workers never get the same job.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.wakeup = threading.Event()  # set on submit so idle workers start right away
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        """Autocommit connection, closed when the with block ends"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
+    @staticmethod
+    def _job(row):
+        spec = json.loads(row["spec"])
+        return {
+            "id": row["id"],
+            "topic": spec["topic"],
+            "state": row["state"],
+            "session_id": row["session_id"],
+            "progress": json.loads(row["progress"]),
+            "error": row["error"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+            "spec": spec,
+            "url": f"/api/jobs/{row['id']}",
+            "events_url": f"/api/jobs/{row['id']}/events",
+        }
+
+    def submit(self, spec):
+        with self._connect() as conn:
+            cursor = conn.execute("INSERT INTO jobs (spec, created) VALUES (?, ?)",
+                                  (json.dumps(spec, ensure_ascii=False), now()))
+        self.wakeup.set()
+        return self.get(cursor.lastrowid)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise NotFound(f"Unknown job: {job_id}")
+        return self._job(row)
+
+    def list(self, state=None):
+        query, params = "SELECT * FROM jobs", ()
+        if state:
+            query, params = query + " WHERE state = ?", (state,)
+        with self._connect() as conn:
+            return [self._job(row) for row in conn.execute(query + " ORDER BY id DESC", params)]
+
+    def claim(self):
+        """Mark the oldest queued job as running and return it (None if the queue is empty)"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET state = 'running', started = ? WHERE id = ?", (now(), row["id"]))
+            conn.execute("COMMIT")
+        return self.get(row["id"]) if row else None
+
+    def update(self, job_id, **fields):
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"], ensure_ascii=False)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def cancel(self, job_id):
+        """Queued jobs are cancelled at once, running ones before their next model call"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET state = 'cancelled', cancel_requested = 1, finished = ? "
+                         "WHERE id = ? AND state = 'queued'", (now(), job_id))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def requeue_interrupted(self):
+        """Queue jobs again that were running when the service stopped, return them
+
+        Returned as they were before requeueing, with the session they left behind.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            jobs = [self._job(row) for row in conn.execute("SELECT * FROM jobs WHERE state = 'running'")]
+            conn.execute("UPDATE jobs SET state = 'queued', started = NULL, session_id = NULL, "
+                         "progress = '{}' WHERE state = 'running'")
+            conn.execute("COMMIT")
+        return jobs
+
+
+def mark_interrupted(session_dir, job):
+    """Log a generate_story_interrupted step in the partial session of an interrupted job
+
+    The job runs again in a new session; the step tells readers of the logs
+    that this one's story stops where the service did.
+    """
+    json_file = os.path.join(session_dir, "generation_log.json")
+    try:
+        with open(json_file, "r") as f:
+            log_data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    log_data["steps"].append({
+        "step": "generate_story_interrupted",
+        "timestamp": datetime.now().isoformat(),
+        "status": "interrupted",
+        "data": {"job_id": job["id"], "progress": job["progress"]},
+    })
+    write_session_logs(session_dir, log_data["session_id"], log_data)
+    return True
+
+
+class ServiceStoryAgent(LoggingStoryAgent):
+    """LoggingStoryAgent that reports progress to the job queue and honours cancellation"""
+
+    def __init__(self, *args, queue, job_id, **kwargs):
+        self.queue = queue
+        self.job_id = job_id
+        self.progress = {"step": None, "scenes_done": 0, "scenes_total": None}
+        super().__init__(*args, **kwargs)
+
+    def query_chat(self, messages, retries=3, **kwargs):
+        if self.queue.cancel_requested(self.job_id):
+            raise JobCancelled()
+        return super().query_chat(messages, retries, **kwargs)
+
+    def log_step(self, step_name, data, status="info"):
+        super().log_step(step_name, data, status)
+        if step_name == "split_chapters_into_scenes_success":
+            self.progress["scenes_total"] = sum(
+                len(scenes) for act in data["scene_plan"] for scenes in act.get("chapter_scenes", {}).values())
+        elif step_name.startswith("write_scene_"):
+            self.progress["scenes_done"] += 1
+        self.progress["step"] = step_name
+        self.queue.update(self.job_id, progress=self.progress)
+
+
+class GenerationService:
+    """Pool of worker threads generating the stories of a JobQueue"""
+
+    def __init__(self, queue, logs_dir, backend, backend_uri, workers=2):
+        self.queue = queue
+        self.logs_dir = logs_dir
+        self.backend = backend
+        self.backend_uri = backend_uri
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"generation-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.queue.wakeup.set()
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self.queue.wakeup.wait(POLL_SECONDS)
+                self.queue.wakeup.clear()
+                continue
+            self.run(job)
+
+    def run(self, job):
+        print(f"🎬 Job {job['id']}: {job['topic']}")
+        started = time.monotonic()
+        writer = None
+        try:
+            kwargs = agent_kwargs(job["spec"], self.backend, self.backend_uri)
+            writer = ServiceStoryAgent(queue=self.queue, job_id=job["id"], logs_dir=self.logs_dir, **kwargs)
+            self.queue.update(job["id"], session_id=writer.session_id)
+            write_seed(writer, job["spec"], kwargs)
+            with job_output(os.path.join(writer.session_dir, "console.log")):
+                writer.generate_story_with_logging(job["spec"]["topic"])
+            self.queue.update(job["id"], state="done", finished=now())
+            print(f"✅ Job {job['id']} → session {writer.session_id} ({time.monotonic() - started:.1f}s)")
+        except JobCancelled:
+            if writer:
+                writer.log_step("generate_story_cancelled", {}, "cancelled")
+            self.queue.update(job["id"], state="cancelled", finished=now())
+            print(f"🛑 Job {job['id']} cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            self.queue.update(job["id"], state="failed", error=f"{type(e).__name__}: {e}", finished=now())
+            print(f"❌ Job {job['id']}: {e}")
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    queue = None  # set by make_server
+
+    def route(self):
+        url = urlparse(self.path)
+        for pattern, name in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                return name, match.groupdict(), parse_qs(url.query)
+        raise NotFound("Not found")
+
+    def dispatch(self, method):
+        try:
+            name, params, query = self.route()
+            handler = getattr(self, f"{method}_{name}", None)
+            if handler is None:
+                return self.send_json({"error": "Method not allowed"}, status=405)
+            handler(query=query, **params)
+        except NotFound as e:
+            self.send_json({"error": str(e)}, status=404)
+
+    def do_GET(self):
+        self.dispatch("get")
+
+    def do_POST(self):
+        self.dispatch("post")
+
+    def do_DELETE(self):
+        self.dispatch("delete")
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def get_jobs(self, query):
+        state = query.get("state", [None])[0]
+        if state and state not in STATES:
+            return self.send_json({"error": f"Unknown state: {state}"}, status=400)
+        jobs, meta = paginate(self.queue.list(state), query)
+        self.send_json({"jobs": jobs, **meta})
+
+    def post_jobs(self, query):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self.send_json({"error": "Request too large"}, status=413)
+        try:
+            spec = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            return self.send_json({"error": "Invalid JSON"}, status=400)
+        error = job_error(spec)
+        if error:
+            return self.send_json({"error": error}, status=400)
+        self.send_json(self.queue.submit(spec), status=201)
+
+    def get_job(self, job_id, query):
+        self.send_json(self.queue.get(int(job_id)))
+
+    def post_cancel(self, job_id, query):
+        self.send_json(self.queue.cancel(int(job_id)))
+
+    def delete_job(self, job_id, query):
+        self.post_cancel(job_id, query)
+
+    def get_events(self, job_id, query):
+        """Stream the job's state and progress until it ends"""
+        job = self.queue.get(int(job_id))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_cors_headers()
+        self.end_headers()
+        last, last_write = None, time.monotonic()
+        try:
+            while True:
+                snapshot = (job["state"], job["session_id"], job["progress"])
+                if snapshot != last:
+                    event = "end" if job["state"] in FINAL_STATES else "progress"
+                    self.wfile.write(f"event: {event}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    last, last_write = snapshot, time.monotonic()
+                if job["state"] in FINAL_STATES:
+                    return
+                if time.monotonic() - last_write > HEARTBEAT_SECONDS:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    last_write = time.monotonic()
+                time.sleep(POLL_SECONDS)
+                job = self.queue.get(int(job_id))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away
+
+    def send_cors_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_cors_headers()
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(queue, host="127.0.0.1", port=DEFAULT_PORT):
+    """Create a threaded HTTP server for the jobs API of queue"""
+    handler = type("Handler", (JobRequestHandler,), {"queue": queue})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a story generation job queue over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"SQLite job database (default: {DEFAULT_DB})")
+    parser.add_argument("--logs-dir", default=DEFAULT_LOGS_DIR)
+    parser.add_argument("--workers", type=int, default=2, help="stories generated at once (default: 2)")
+    parser.add_argument("--backend", choices=SUPPORTED_BACKENDS, default="openai")
+    parser.add_argument("--backend-uri", default=None,
+                        help="endpoint of the hf / llama.cpp server, or comma-separated replicas to "
+                             "balance over (default for openai: OPENAI_API_KEY)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    backend_uri = args.backend_uri
+    if args.backend == "openai" and not backend_uri:
+        backend_uri = os.getenv("OPENAI_API_KEY")
+    if not backend_uri:
+        raise ValueError("Please set OPENAI_API_KEY (you can use a .env file) or pass --backend-uri")
+    if args.backend != "openai" and "," in backend_uri:
+        backend_uri = [uri.strip() for uri in backend_uri.split(",") if uri.strip()]
+
+    queue = JobQueue(args.db)
+    requeued = queue.requeue_interrupted()
+    for job in requeued:
+        if job["session_id"]:
+            mark_interrupted(os.path.join(args.logs_dir, f"session_{job['session_id']}"), job)
+    if requeued:
+        print(f"🔁 Queued {len(requeued)} interrupted jobs again")
+    service = GenerationService(queue, args.logs_dir, args.backend, backend_uri, args.workers)
+    service.start()
+    server = make_server(queue, args.host, args.port)
+    print(f"📡 Accepting generation jobs on http://{args.host}:{args.port}/api/jobs "
+          f"({args.workers} workers, {args.backend} backend)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down (running jobs are queued again on the next start)")
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Online detection of degenerate generations
+
+A DegenerationMonitor is fed the text of one streamed model call chunk by
+chunk and tells the backend when to stop reading: the model is looping
+(repeated n-grams, a short stuck pattern) or has started a new Chapter /
+Scene header that StoryAgent.prepare_scene_text would cut off anyway.
+"""
+
+import re
+
+NGRAM = 5                 # words per n-gram of the loop check
+WINDOW_WORDS = 120        # recent words the loop check looks at
+MIN_DISTINCT_RATIO = 0.5  # below this share of distinct n-grams the window is a loop
+MAX_PERIOD_CHARS = 20     # longest character pattern of the stuck-pattern check
+PERIOD_SPAN_CHARS = 120   # how much trailing text must repeat that pattern
+CHECK_EVERY_CHARS = 64    # checks run at most once per this many new characters
+# prepare_scene_text strips headers in the first lines (5 + 5 at most), any
+# later line starting with one of these cuts the scene
+HEADER_MIN_LINE = 10
+HEADER_PREFIXES = ('Chapter ', 'Scene ')
+
+WORD_RE = re.compile(r'\S+')
+
+
+class DegenerationMonitor:
+    """Watches one streamed generation for loops and stray headers
+
+    Attributes
+    ----------
+    text : str
+        Everything fed so far
+    chunks : int
+        Number of chunks fed (tokens for the llama.cpp and hf backends)
+    reason : str
+        'stray_header', 'stuck_pattern' or 'repeated_ngrams' once tripped,
+        None before
+    cut : int
+        Length of the useful prefix of text once tripped
+    """
+
+    def __init__(self, ngram=NGRAM, window_words=WINDOW_WORDS,
+                 min_distinct_ratio=MIN_DISTINCT_RATIO):
+        self.ngram = ngram
+        self.window_words = window_words
+        self.min_distinct_ratio = min_distinct_ratio
+        self.reset()
+
+    def reset(self):
+        """Forget the text fed so far (the backend restarted the request)"""
+        self.text = ''
+        self.chunks = 0
+        self.reason = None
+        self.cut = None
+        self._checked_chars = 0
+        self._line_start = 0  # offset of the first line not checked for a header
+        self._line_num = 0
+
+    @property
+    def tripped(self):
+        return self.reason is not None
+
+    def feed(self, chunk):
+        """Adds a chunk of generated text, returns True when generation should stop"""
+        if self.tripped:
+            return True
+        self.text += chunk
+        self.chunks += 1
+        if '\n' not in chunk and len(self.text) - self._checked_chars < CHECK_EVERY_CHARS:
+            return False
+        self._checked_chars = len(self.text)
+        for reason, check in (('stray_header', self._stray_header),
+                              ('stuck_pattern', self._stuck_pattern),
+                              ('repeated_ngrams', self._repeated_ngrams)):
+            cut = check()
+            if cut is not None:
+                self.reason, self.cut = reason, cut
+                return True
+        return False
+
+    def kept(self):
+        """The text worth keeping: everything before the degenerate part"""
+        return self.text[:self.cut] if self.tripped else self.text
+
+    def _stray_header(self):
+        while True:
+            end = self.text.find('\n', self._line_start)
+            line = self.text[self._line_start:] if end < 0 else self.text[self._line_start:end]
+            # A partial line already decides it once the prefix is complete
+            if self._line_num >= HEADER_MIN_LINE and line.startswith(HEADER_PREFIXES):
+                return max(0, self._line_start - 1)
+            if end < 0:
+                return None
+            self._line_start = end + 1
+            self._line_num += 1
+
+    def _stuck_pattern(self):
+        text = self.text
+        if len(text) < PERIOD_SPAN_CHARS + MAX_PERIOD_CHARS:
+            return None
+        tail = text[-PERIOD_SPAN_CHARS:]
+        for period in range(1, MAX_PERIOD_CHARS + 1):
+            if tail == text[-PERIOD_SPAN_CHARS - period:-period]:
+                # Keep one repetition of the pattern
+                start = len(text) - PERIOD_SPAN_CHARS - period
+                while start > 0 and text[start - 1] == text[start - 1 + period]:
+                    start -= 1
+                return start + period
+        return None
+
+    def _repeated_ngrams(self):
+        # Enough trailing characters for the window, offsets relative to base
+        base = max(0, len(self.text) - self.window_words * 40)
+        words = list(WORD_RE.finditer(self.text, base))[-self.window_words:]
+        if len(words) < self.window_words:
+            return None
+        tokens = [word.group().lower() for word in words]
+        grams = [tuple(tokens[i:i + self.ngram])
+                 for i in range(len(tokens) - self.ngram + 1)]
+        if len(set(grams)) >= self.min_distinct_ratio * len(grams):
+            return None
+        # The loop starts with the first n-gram after the last new one,
+        # everything before it is one copy of the loop at most
+        seen, last_new = set(), 0
+        for i, gram in enumerate(grams):
+            if gram not in seen:
+                seen.add(gram)
+                last_new = i
+        return words[last_new + 1].start()
@@ -0,0 +1,178 @@
+"""Parsers for the model's spec, plan and scene text
+
+Every parser makes one pass over its document with precompiled patterns.
+Diagnostics go to the goat_storytelling_agent.parsers logger at DEBUG
+level instead of stdout; enable them with
+
+    logging.getLogger("goat_storytelling_agent.parsers").setLevel(logging.DEBUG)
+
+plus a handler (logging.basicConfig does both).
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# An "Act " with a newline up to 5 characters before it ("\n## Act 2")
+ACT_SPLIT_RE = re.compile(r'\n.{0,5}?Act ')
+# A chapter line of an act ("- Chapter 3: ..."), up to its last colon
+CHAPTER_SPLIT_RE = re.compile(r'\n.{0,20}?Chapter .+:')
+# Chapter markers of a scene breakdown, the number is captured
+SCENES_CHAPTER_RE = re.compile(r'Chapter (\d+)')
+# Scene headers of a chapter's scene breakdown ("Scene 2 (night):")
+SCENE_SPLIT_RE = re.compile(r'Scene \d+.{0,10}?:')
+ACT_HEADER_RE = re.compile(r'Act \d')
+
+
+def _has_words(text, n):
+    """Whether text has more than n words, without splitting all of it"""
+    return len(text.split(None, n)) > n
+
+
+def book_spec(text_spec, fields):
+    """Parses "Field: value" lines into a dict with an entry per field
+
+    A line continues the previous field when it has no colon. A key that
+    is not one of fields (matching case-insensitively, contained in a key
+    less than twice its length) starts an ignored field.
+    """
+    spec_dict = {field: '' for field in fields}
+    lowered = [(field.lower().strip(), field) for field in fields]
+
+    def match(pseudokey):
+        matched = [field for key, field in lowered
+                   if key in pseudokey and len(pseudokey) < 2 * len(key)]
+        return matched[0] if len(matched) == 1 else None
+
+    # Most keys are a field verbatim, only the others need the scan
+    exact = {key: match(key) for key, field in lowered}
+    last_field = None
+    if "\"\"\"" in text_spec[:int(len(text_spec)/2)]:
+        header, sep, text_spec = text_spec.partition("\"\"\"")
+    text_spec = text_spec.strip()
+
+    for line in text_spec.split('\n'):
+        pseudokey, sep, value = line.partition(':')
+        if not sep:
+            if last_field:
+                # If line does not contain ':' it should be
+                # the continuation of the last field's value
+                spec_dict[last_field] += ' ' + line.strip()
+            continue
+        pseudokey = pseudokey.lower().strip()
+        field = exact[pseudokey] if pseudokey in exact else match(pseudokey)
+        if field is not None:
+            last_field = field
+            spec_dict[field] += value.strip()
+        else:
+            last_field = 'other'
+            spec_dict[last_field] = ''
+    spec_dict.pop('other', None)
+    return spec_dict
+
+
+def split_by_act(original_plan):
+    """Splits a by-chapter plan into the text of its 3 acts, [] when it cannot"""
+    # removes only Act texts with newline prepended somewhere near
+    parts = ACT_SPLIT_RE.split(original_plan)
+    # remove random short garbage from re split
+    acts = [text.strip() for text in parts
+            if text and _has_words(text, 3)]
+
+    if len(acts) == 4:
+        acts = acts[1:]
+    elif len(acts) != 3:
+        logger.debug("split_by_act: %d parts after the first split, "
+                     "%d kept", len(parts), len(acts))
+        acts = original_plan.split('Act ')
+        if len(acts) == 4:
+            acts = acts[-3:]
+        elif len(acts) != 3:
+            logger.debug("split_by_act: %d parts after the second split, "
+                         "giving up", len(acts))
+            return []
+
+    # [act1, act2, act3], [Act + act1, act2, act3]
+    if acts[0].startswith('Act '):
+        return [acts[0]] + ['Act ' + act for act in acts[1:]]
+    return ['Act ' + act for act in acts]
+
+
+def act(text_act):
+    """Parses an act into its description and chapter summaries"""
+    parts = CHAPTER_SPLIT_RE.split(text_act.strip())
+    chapters = [text.strip() for text in parts[1:]
+                if text and _has_words(text, 3)]
+    return {'act_descr': parts[0].strip(), 'chapters': chapters}
+
+
+def text_plan(text):
+    """Parses a by-chapter plan into acts with chapters, [] when it cannot"""
+    plan = [act(text_act) for text_act in split_by_act(text) if text_act]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("text_plan: %d chars, %d acts with chapters %s",
+                     len(text), len(plan), [len(a['chapters']) for a in plan])
+    return [parsed for parsed in plan if parsed['chapters']]
+
+
+def act_scenes(text, act_chapters):
+    """Splits the scene breakdown of an act into scene descriptions per chapter
+
+    Parameters
+    ----------
+    text : str
+        Model reply with "Chapter N" and "Scene M:" headers
+    act_chapters : List[int]
+        Chapter numbers of the act, used instead of the numbers in text
+        when text mentions more chapters than that
+
+    Returns
+    -------
+    Dict[int, List[str]]
+        Scene descriptions of each chapter with at least one scene
+    """
+    # The text after the last "Chapter N" marker of each number counts
+    chapter_texts = {}
+    ch_num = None
+    for snippet in SCENES_CHAPTER_RE.split(text.strip()):
+        snippet = snippet.strip()
+        if not snippet:
+            continue
+        if snippet.isnumeric():
+            ch_num = int(snippet)
+            chapter_texts[ch_num] = ''
+        elif chapter_texts:
+            chapter_texts[ch_num] += snippet
+    if len(chapter_texts) > len(act_chapters):
+        chapter_texts = {ch_num: chapter_texts[ch_num] for ch_num in act_chapters}
+
+    chapter_scenes = {}
+    for ch_num, chapter in chapter_texts.items():
+        scenes = [scene.strip() for scene in SCENE_SPLIT_RE.split(chapter)[1:]
+                  if scene and _has_words(scene, 3)]
+        if scenes:
+            chapter_scenes[ch_num] = scenes
+        else:
+            logger.debug("act_scenes: no scenes found for chapter %d", ch_num)
+    return chapter_scenes
+
+
+def scene_text(text):
+    """Drops the Chapter / Scene headers the model repeats at the start of
+    a scene, and everything from the next header on"""
+    lines = text.split('\n')
+    ch_ids = [i for i in range(min(5, len(lines)))
+              if 'Chapter ' in lines[i]]
+    if ch_ids:
+        lines = lines[ch_ids[-1]+1:]
+    sc_ids = [i for i in range(min(5, len(lines)))
+              if 'Scene ' in lines[i]]
+    if sc_ids:
+        lines = lines[sc_ids[-1]+1:]
+
+    for i, line in enumerate(lines):
+        if line.startswith(('Chapter ', 'Scene ')):
+            lines = lines[:i]
+            break
+    return '\n'.join(lines)
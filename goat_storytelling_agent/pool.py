@@ -0,0 +1,208 @@
+"""Load balancing over replicas of a TGI or llama.cpp backend
+
+StoryAgent turns a list of backend_uris into a BackendPool, shared by
+all agents and threads of a process that use the same replicas:
+
+    writer = StoryAgent(['http://gpu1:8080', 'http://gpu2:8080'],
+                        backend='llama.cpp')
+
+Each call goes to the available replica with the fewest calls in flight
+('least_outstanding', ties to the one with fewer calls so far) or with
+the lowest expected wait, calls in flight times its average seconds per
+generated token ('latency'). A call that fails moves on to another
+replica. A replica is ejected for cooldown seconds after max_failures
+failed calls in a row, and while its /health endpoint (served by both
+TGI and llama.cpp) does not answer 200.
+"""
+
+import threading
+import time
+
+import requests
+
+POLICIES = ["least_outstanding", "latency"]
+
+
+class Replica:
+    """State of one endpoint of a BackendPool"""
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.outstanding = 0
+        self.calls = 0
+        self.errors = 0
+        # Failed calls in a row, reset by a successful one
+        self.failures = 0
+        # Average seconds per generated token (or per call when the
+        # backend reports no tokens), None before the first call
+        self.latency = None
+        self.healthy = True
+        self.ejected_until = 0.0
+
+    def available(self, now):
+        return self.healthy and self.ejected_until <= now
+
+
+class BackendPool:
+    """Spreads calls over replicas of one backend
+
+    Parameters
+    ----------
+    endpoints : List[str]
+        Replica URIs
+    policy : str, optional
+        'least_outstanding' or 'latency', see the module docstring
+    max_failures : int, optional
+        Failed calls in a row that eject a replica
+    cooldown : float, optional
+        Seconds an ejected replica gets no calls
+    check_interval : float, optional
+        Seconds between health checks of every replica, None for none
+    health_path : str, optional
+        Endpoint path of the health check
+    smoothing : float, optional
+        Weight of the latest call in the latency average
+    """
+
+    def __init__(self, endpoints, policy="least_outstanding", max_failures=3,
+                 cooldown=30, check_interval=10, health_path="/health",
+                 smoothing=0.2):
+        if not endpoints:
+            raise ValueError("Empty backend pool")
+        if policy not in POLICIES:
+            raise ValueError("Unknown balancing policy")
+        self.replicas = [Replica(uri.rstrip('/')) for uri in endpoints]
+        self.policy = policy
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.check_interval = check_interval
+        self.health_path = health_path
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        if check_interval:
+            threading.Thread(target=self._check_health_loop, daemon=True,
+                             name="backend-pool-health").start()
+
+    def _pick(self):
+        """Takes the replica for the next call and counts it as in flight"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.replicas if r.available(now)]
+            if not candidates:
+                # Every replica is out: try the one due back first
+                # rather than failing the call outright
+                candidates = [min(self.replicas,
+                                  key=lambda r: (not r.healthy, r.ejected_until))]
+            if self.policy == "latency":
+                known = [r.latency for r in candidates if r.latency is not None]
+                # Replicas without a measurement yet are tried first
+                default = min(known) if known else 0.0
+                key = lambda r: ((r.outstanding + 1) * (
+                    default if r.latency is None else r.latency), r.calls)
+            else:
+                key = lambda r: (r.outstanding, r.calls)
+            replica = min(candidates, key=key)
+            replica.outstanding += 1
+            replica.calls += 1
+            return replica
+
+    def _release(self, replica, ok, seconds, tokens=None):
+        """Records the outcome of a call, ejecting a replica that keeps failing
+
+        ok is None for a call that was interrupted (KeyboardInterrupt, say):
+        it is no longer in flight but says nothing about the replica.
+        """
+        with self._lock:
+            replica.outstanding -= 1
+            if ok is None:
+                return
+            if not ok:
+                replica.errors += 1
+                replica.failures += 1
+                if replica.failures >= self.max_failures:
+                    replica.ejected_until = time.monotonic() + self.cooldown
+                    replica.failures = 0
+                    print(f"⚠️  Ejected backend replica {replica.uri} for {self.cooldown}s")
+                return
+            replica.failures = 0
+            sample = seconds / tokens if tokens else seconds
+            if replica.latency is None:
+                replica.latency = sample
+            else:
+                replica.latency += self.smoothing * (sample - replica.latency)
+
+    def call(self, query, attempts=3, usage=None, accept=bool):
+        """Runs query(uri) on a replica, on another one when it fails
+
+        Parameters
+        ----------
+        query : Callable[[str], str]
+            Sends the request to the given replica URI
+        attempts : int, optional
+            Replicas to try at most
+        usage : Dict, optional
+            Filled by query with output_tokens, used for the latency average
+        accept : Callable[[str], bool], optional
+            Whether a result is a success; by default a non-empty one
+
+        Returns
+        -------
+        str
+            Result of the first accepted call, else of the last one; the
+            last call's exception is raised if it failed with one
+        """
+        result = ''
+        for attempt in range(attempts):
+            replica = self._pick()
+            started = time.monotonic()
+            ok = None
+            try:
+                result = query(replica.uri)
+                ok = accept(result)
+            except Exception:
+                ok = False
+                if attempt == attempts - 1:
+                    raise
+                continue
+            finally:
+                # Also runs when query raises a BaseException, so the
+                # replica never stays counted as in flight
+                self._release(replica, ok, time.monotonic() - started,
+                              (usage or {}).get("output_tokens") if ok else None)
+            if ok:
+                break
+        return result
+
+    def check_health(self):
+        """Asks every replica's health endpoint once"""
+        for replica in self.replicas:
+            try:
+                response = requests.get(f"{replica.uri}{self.health_path}",
+                                        timeout=5)
+                healthy = response.status_code == 200
+            except requests.RequestException:
+                healthy = False
+            with self._lock:
+                if replica.healthy != healthy:
+                    print(f"{'✅' if healthy else '⚠️ '} Backend replica {replica.uri} "
+                          f"{'is back' if healthy else 'failed its health check'}")
+                replica.healthy = healthy
+
+    def _check_health_loop(self):
+        while not self._stopped.wait(self.check_interval):
+            self.check_health()
+
+    def close(self):
+        """Stops the health checks"""
+        self._stopped.set()
+
+    def stats(self):
+        """Per-replica calls, errors, calls in flight and state"""
+        now = time.monotonic()
+        with self._lock:
+            return {r.uri: {"calls": r.calls, "errors": r.errors,
+                            "outstanding": r.outstanding,
+                            "latency": r.latency,
+                            "available": r.available(now)}
+                    for r in self.replicas}
@@ -0,0 +1,88 @@
+"""
+Story length presets for controlling generation parameters
+
+A preset's instructions go into the chapter, scene-breakdown and scene
+prompts, and its target_words sets how many tokens each stage may
+generate (see stage_max_tokens).
+"""
+
+import math
+
+STORY_PRESETS = {
+    'short': {
+        'target_words': 1000,
+        'reading_time': '5 minutes',
+        'acts': 3,
+        'scene_words': 200,
+        'chapters_instruction': 'Come up with a plot for a bestseller-grade {form} in 3 acts with 2-3 chapters total',
+        'scenes_instruction': 'Break each chapter in Act {act_num} into 1 scene',
+        'scene_length_instruction': 'Write a concise scene for a {form} (aim for 150-200 words)'
+    },
+    'medium': {
+        'target_words': 2000,
+        'reading_time': '10 minutes',
+        'acts': 3,
+        'scene_words': 300,
+        'chapters_instruction': 'Come up with a plot for a bestseller-grade {form} in 3 acts with 6-9 chapters total',
+        'scenes_instruction': 'Break each chapter in Act {act_num} into 1-2 scenes (number depends on how packed a chapter is)',
+        'scene_length_instruction': 'Write a scene for a {form} (aim for 200-300 words)'
+    },
+    'long': {
+        'target_words': 3000,
+        'reading_time': '15 minutes',
+        'acts': 3,
+        'scene_words': 350,
+        'chapters_instruction': 'Come up with a plot for a bestseller-grade {form} in 3 acts with 9-12 chapters total',
+        'scenes_instruction': 'Break each chapter in Act {act_num} into 2-3 scenes (number depends on how packed a chapter is)',
+        'scene_length_instruction': 'Write a detailed scene for a {form} (aim for 250-350 words)'
+    }
+}
+
+TOKENS_PER_WORD = 1.4  # English prose with some markdown
+SLACK = 1.5            # headroom so a reply near its aim is not cut mid-sentence
+JSON_OVERHEAD = 1.3    # keys and quotes of a structured reply
+MIN_STAGE_WORDS = 100
+# Share of target_words a single reply of each stage may take; the scene
+# stages get the story's words spread over its scenes instead
+STAGE_SHARES = {
+    'init_book_spec': 0.25,
+    'enhance_book_spec': 0.25,
+    'missing_book_spec': 0.05,       # one field
+    'create_plot_chapters': 0.3,
+    'enhance_plot_chapters': 0.1,    # one act, one sentence per chapter
+    'split_chapters_into_scenes': 0.3,  # scene specs of one act
+}
+SCENE_STAGES = ('write_a_scene', 'continue_a_scene')
+
+
+def get_preset(length='medium'):
+    """Get a story preset by name"""
+    return STORY_PRESETS.get(length, STORY_PRESETS['medium'])
+
+
+def stage_max_tokens(preset, stage, n_scenes=None):
+    """Tokens a reply of stage may take for a story of this preset
+
+    Parameters
+    ----------
+    preset : Dict
+        Length config (see STORY_PRESETS)
+    stage : str
+        StoryAgent method making the call, e.g. 'create_plot_chapters'
+    n_scenes : int, optional
+        Scenes in the plan, for the scene stages
+
+    Returns
+    -------
+    int
+        Token budget of the reply, None for unknown stages
+    """
+    if stage in SCENE_STAGES:
+        words = preset.get('scene_words', 0)
+        if n_scenes:
+            words = max(words, preset['target_words'] / n_scenes)
+    elif stage in STAGE_SHARES:
+        words = preset['target_words'] * STAGE_SHARES[stage]
+    else:
+        return None
+    return math.ceil(max(words, MIN_STAGE_WORDS) * TOKENS_PER_WORD * SLACK)
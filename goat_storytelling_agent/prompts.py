@@ -16,12 +16,16 @@ book_spec_format = (
     "Characters: use specific names already\n"
     "Premise: describe some concrete events already")
 
+scene_spec_fields = ['Characters', 'Place', 'Time', 'Event', 'Conflict', 'Story value',
+                     'Story value charge', 'Mood', 'Outcome']
+
 scene_spec_format = (
     "Chapter [number]:\nScene [number]:\nCharacters: character list\nPlace: place\nTime: absolute or relative time\nEvent: what happens\nConflict: scene micro-conflict\n"
     "Story value: story value affected by the scene\nStory value charge: the charge of story value by the end of the scene (positive or negative)\nMood: mood\nOutcome: the result.")
 
 prev_scene_intro = "\n\nHere is the ending of the previous scene:\n"
 cur_scene_intro = "\n\nHere is the last written snippet of the current scene:\n"
+structured_output_intro = "\n\nAnswer with a JSON object."
 
 
 def init_book_spec_messages(topic, form):
@@ -0,0 +1,57 @@
+"""Per-stage backend routing for StoryAgent
+
+A routing table maps pipeline stages to the backend, endpoint, model and
+options their calls go to, e.g. cheap structural stages to a fast local
+model and scene prose to a large one:
+
+    routes = {
+        'split_chapters_into_scenes': {'backend': 'llama.cpp',
+                                       'backend_uri': 'http://localhost:8080'},
+        'enhance_plot_chapters': [{'backend': 'llama.cpp',
+                                   'backend_uri': 'http://localhost:8080'},
+                                  {}],
+    }
+
+A route is a dict of ROUTE_OPTIONS; options it leaves out are the
+agent's own, so {} is the agent's default backend. A list of routes is a
+cascade: a stage's first call goes to the first route, and each repeat
+of that call after a reply failed parsing or a quality check goes one
+route further (staying on the last).
+"""
+
+STAGES = ['init_book_spec', 'missing_book_spec', 'enhance_book_spec',
+          'create_plot_chapters', 'enhance_plot_chapters',
+          'split_chapters_into_scenes', 'write_a_scene', 'continue_a_scene']
+ROUTE_OPTIONS = {'backend', 'backend_uri', 'model', 'max_tokens',
+                 'request_timeout', 'extra_options'}
+
+
+def route_list(stage, routes, backends):
+    """Checks a stage's entry of a routing table, returns it as a cascade list
+
+    Raises ValueError on unknown stages, options or backends.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage {stage}")
+    cascade = routes if isinstance(routes, list) else [routes]
+    if not cascade:
+        raise ValueError(f"Empty cascade for {stage}")
+    for route in cascade:
+        unknown = set(route) - ROUTE_OPTIONS
+        if unknown:
+            raise ValueError(f"Unknown route options for {stage}: "
+                             f"{', '.join(sorted(unknown))}")
+        if 'backend' in route and route['backend'].lower() not in backends:
+            raise ValueError(f"Unknown backend for {stage}: {route['backend']}")
+    return cascade
+
+
+def describe(route):
+    """Name of a resolved route for stats, e.g. 'openai:gpt-5' or
+    'llama.cpp:http://localhost:8080' (an OpenAI backend_uri is a key and
+    never shown, replicas of a pool are joined by commas)"""
+    if route['backend'] == 'openai':
+        return f"openai:{route['model']}"
+    if not isinstance(route['backend_uri'], str):
+        return f"{route['backend']}:{','.join(route['backend_uri'])}"
+    return f"{route['backend']}:{route['backend_uri']}"
@@ -0,0 +1,172 @@
+"""JSON schemas for the structured (constrained decoding) mode of StoryAgent
+
+With structured=True the spec, plan and scene-breakdown stages ask the
+backend for JSON that follows one of these schemas instead of free text:
+OpenAI gets the schema as a strict json_schema response format, TGI as a
+json grammar and llama.cpp as a GBNF grammar built by to_gbnf. The parsed
+objects are turned into the same spec dicts, acts and scene descriptions
+the text parsers produce.
+
+Only the subset of JSON schema used here is supported: objects whose
+properties are all required, arrays with minItems / maxItems and strings,
+which must not be empty (OpenAI's strict mode has no minLength, so this
+is checked by conforms and by the GBNF grammar rather than the schema).
+"""
+
+import json
+
+
+def json_schema(name, schema):
+    """Named schema, in the shape of OpenAI's json_schema response format"""
+    return {"name": name, "schema": schema, "strict": True}
+
+
+def _object(properties):
+    return {"type": "object", "properties": properties,
+            "required": list(properties), "additionalProperties": False}
+
+
+def _text():
+    return {"type": "string"}
+
+
+def _array(items, min_items=None, max_items=None):
+    schema = {"type": "array", "items": items}
+    if min_items is not None:
+        schema["minItems"] = min_items
+    if max_items is not None:
+        schema["maxItems"] = max_items
+    return schema
+
+
+def book_spec(fields):
+    """Book specification: one string per spec field"""
+    return json_schema("book_spec", _object({field: _text() for field in fields}))
+
+
+def _act(min_chapters):
+    return _object({"title": _text(),
+                    "chapters": _array(_text(), min_items=min_chapters)})
+
+
+def plan(n_acts=3):
+    """By-chapter outline: n_acts acts with a title and chapter summaries"""
+    return json_schema("plan", _object({
+        "acts": _array(_act(1), min_items=n_acts, max_items=n_acts)}))
+
+
+def act(min_chapters=2):
+    """One rewritten act (enhance_plot_chapters wants two chapters at least)"""
+    return json_schema("act", _act(min_chapters))
+
+
+def act_scenes(n_chapters, fields):
+    """Scene breakdown of an act: the scenes of each of its n_chapters chapters"""
+    chapter = _object({"scenes": _array(
+        _object({field: _text() for field in fields}), min_items=1)})
+    return json_schema("act_scenes", _object({
+        "chapters": _array(chapter, min_items=n_chapters, max_items=n_chapters)}))
+
+
+def loads(text, schema):
+    """Parses a reply against a json_schema, None when it does not conform"""
+    try:
+        obj = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    return obj if conforms(obj, schema["schema"]) else None
+
+
+def conforms(obj, schema):
+    """Checks obj against the supported JSON schema subset"""
+    kind = schema["type"]
+    if kind == "object":
+        return (isinstance(obj, dict)
+                and all(key in obj and conforms(obj[key], sub)
+                        for key, sub in schema["properties"].items()))
+    if kind == "array":
+        return (isinstance(obj, list)
+                and len(obj) >= schema.get("minItems", 0)
+                and len(obj) <= schema.get("maxItems", len(obj))
+                and all(conforms(item, schema["items"]) for item in obj))
+    if kind == "string":
+        return isinstance(obj, str) and bool(obj.strip())
+    raise ValueError(f"Unsupported schema type: {kind}")
+
+
+def plan_from_json(obj):
+    """Plan (list of acts) from a plan schema object"""
+    return [act_from_json(act_obj, act_num)
+            for act_num, act_obj in enumerate(obj["acts"], start=1)]
+
+
+def act_from_json(obj, act_num):
+    """Plan act from an act schema object"""
+    return {"act_descr": f"Act {act_num}: {obj['title'].strip()}",
+            "chapters": [chapter.strip() for chapter in obj["chapters"]]}
+
+
+def scene_to_str(obj):
+    """Scene description text, as split_chapters_into_scenes produces it"""
+    return "\n".join(f"{field}: {value.strip()}" for field, value in obj.items())
+
+
+# === GBNF ===
+
+# Whitespace is bounded as in llama.cpp's json grammar, so a model cannot
+# stall the generation on endless newlines
+GBNF_BASE = r'''ws ::= | " " | "\n" [ \t]{0,20}
+char ::= [^"\\\x7F\x00-\x1F] | "\\" (["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F])
+string ::= "\"" char+ "\"" ws'''
+
+
+def _literal(text):
+    # GBNF literals escape like JSON strings
+    return json.dumps(text)
+
+
+def to_gbnf(schema):
+    """GBNF grammar (llama.cpp) accepting exactly the JSON of schema
+
+    Properties are generated in schema order, whitespace between tokens is
+    free.
+    """
+    rules = []
+
+    def rule(schema):
+        kind = schema["type"]
+        if kind == "string":
+            return "string"
+        name = f"{kind}{len(rules)}"
+        rules.append(None)
+        index = len(rules) - 1
+        if kind == "object":
+            members = [f'{_literal(json.dumps(key))} ws ":" ws {rule(sub)}'
+                       for key, sub in schema["properties"].items()]
+            body = '"{" ws ' + ' "," ws '.join(members) + ' "}" ws'
+        elif kind == "array":
+            item = rule(schema["items"])
+            body = '"[" ws ' + _repeat(item, schema.get("minItems", 0),
+                                      schema.get("maxItems")) + ' "]" ws'
+        else:
+            raise ValueError(f"Unsupported schema type: {kind}")
+        rules[index] = f"{name} ::= {body}"
+        return name
+
+    root = rule(schema)
+    return "\n".join([f"root ::= ws {root}", *rules, GBNF_BASE])
+
+
+def _repeat(item, min_items, max_items):
+    """GBNF for min_items..max_items comma separated items (no max when None)"""
+    parts = [item] + [f'"," ws {item}'] * max(0, min_items - 1)
+    if max_items is None:
+        tail = f'("," ws {item})*'
+    else:
+        # Nested optionals, one per item above min_items
+        tail = ''
+        for _ in range(max_items - max(min_items, 1)):
+            tail = f'("," ws {item} {tail})?' if tail else f'("," ws {item})?'
+    if min_items == 0:
+        return f'({item} {tail})?' if max_items != 0 else ''
+    return ' '.join(parts + ([tail] if tail else []))
@@ -0,0 +1,255 @@
+"""Reading and indexing helpers for the final_story.txt files written by generate_story.py."""
+import os
+import re
+import json
+import mmap
+from pathlib import Path
+
+
+# "==================== SCENE 3 ====================" separators
+SCENE_MARKER_RE = re.compile(r'^=+ SCENE (\d+) =+[ \t]*$', re.MULTILINE)
+# "Chapter 2, Scene 1" headings used by stories written without separators
+SCENE_HEADING_RE = re.compile(r'^Chapter (\d+), Scene (\d+)[ \t]*$', re.MULTILINE)
+CHAPTER_RE = re.compile(r'Chapter (\d+)')
+
+
+def _leading_chapter(text):
+    """Chapter number from a 'Chapter N' heading in the first lines of a scene"""
+    for line in text.lstrip().split('\n', 5)[:5]:
+        match = CHAPTER_RE.match(line.strip())
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def split_scenes(text):
+    """Splits a story into scenes
+
+    Parameters
+    ----------
+    text : str
+        Full story text
+
+    Returns
+    -------
+    List[Dict]
+        One dict per scene with 'scene' (1-based story-wide number),
+        'chapter' (int or None if unknown) and 'text'
+    """
+    markers = list(SCENE_MARKER_RE.finditer(text))
+    if markers:
+        scenes = []
+        for i, match in enumerate(markers):
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+            scene_text = text[match.end():end].strip('\n')
+            scenes.append({'scene': int(match.group(1)),
+                           'chapter': _leading_chapter(scene_text),
+                           'text': scene_text})
+        return scenes
+
+    headings = list(SCENE_HEADING_RE.finditer(text))
+    if headings:
+        scenes = []
+        for i, match in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            scenes.append({'scene': i + 1,
+                           'chapter': int(match.group(1)),
+                           'text': text[match.end():end].strip('\n')})
+        return scenes
+
+    text = text.strip('\n')
+    return [{'scene': 1, 'chapter': None, 'text': text}] if text else []
+
+
+SCENE_MARKER_BYTES_RE = re.compile(rb'^=+ SCENE (\d+) =+[ \t]*$', re.MULTILINE)
+SCENE_HEADING_BYTES_RE = re.compile(rb'^Chapter (\d+), Scene (\d+)[ \t]*$', re.MULTILINE)
+INDEX_VERSION = 1
+
+
+def scene_marker(scene_num):
+    """Separator line written before each scene of final_story.txt"""
+    return f"\n{'='*20} SCENE {scene_num} {'='*20}\n"
+
+
+def index_path(story_path):
+    """final_story.txt -> final_story.index.json"""
+    story_path = Path(story_path)
+    return story_path.with_name(f"{story_path.stem}.index.json")
+
+
+def write_scene_index(story_path, scenes, story_bytes):
+    """Atomically writes the scene offset index next to a story file
+
+    Parameters
+    ----------
+    story_path : str or Path
+        Path of the story file the index describes
+    scenes : List[Dict]
+        Entries with 'scene', 'chapter', 'chapter_scene', 'start' and 'end'
+        (byte offsets of the scene text, end exclusive)
+    story_bytes : int
+        Story file size the offsets are valid for
+    """
+    path = index_path(story_path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as fp:
+        json.dump({'version': INDEX_VERSION, 'story_bytes': story_bytes,
+                   'scenes': scenes}, fp, indent=1)
+    os.replace(tmp_path, path)
+
+
+class StoryWriter:
+    """Streams scenes to a story file as they are generated
+
+    Every appended scene is flushed to disk as it is written, and the scene
+    offset index is written once on close(). Only the (small) index is kept
+    in memory. A partial story without a matching index is still readable:
+    StoryReader rescans it.
+
+    Usage:
+        with StoryWriter(story_path) as story:
+            story.append(scene_text, chapter=1, chapter_scene=1)
+    """
+
+    def __init__(self, story_path):
+        self.story_path = Path(story_path)
+        self.index = []
+        self.total_chars = 0
+        self._fp = open(self.story_path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, text, chapter=None, chapter_scene=None):
+        """Writes one scene and flushes it; returns its index entry"""
+        text = text.strip('\n')
+        scene_num = len(self.index) + 1
+        self._fp.write(scene_marker(scene_num).encode('utf-8'))
+        start = self._fp.tell()
+        self._fp.write(text.encode('utf-8'))
+        entry = {'scene': scene_num,
+                 'chapter': int(chapter) if chapter is not None else None,
+                 'chapter_scene': chapter_scene, 'start': start, 'end': self._fp.tell()}
+        self._fp.write(b'\n\n')
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self.index.append(entry)
+        self.total_chars += len(text)
+        return entry
+
+    def close(self):
+        if not self._fp.closed:
+            story_bytes = self._fp.tell()
+            self._fp.close()
+            write_scene_index(self.story_path, self.index, story_bytes)
+
+
+def _trim_newlines(buf, start, end):
+    while start < end and buf[start] == 0x0A:
+        start += 1
+    while end > start and buf[end - 1] == 0x0A:
+        end -= 1
+    return start, end
+
+
+def build_scene_index(buf):
+    """Scans a story buffer (bytes or mmap) for scene boundaries
+
+    Used for stories written before the index existed. Matches the
+    splitting rules of split_scenes.
+    """
+    markers = list(SCENE_MARKER_BYTES_RE.finditer(buf))
+    headings = [] if markers else list(SCENE_HEADING_BYTES_RE.finditer(buf))
+    entries = []
+    for i, match in enumerate(markers or headings):
+        bounds = markers or headings
+        end = bounds[i + 1].start() if i + 1 < len(bounds) else len(buf)
+        start, end = _trim_newlines(buf, match.end(), end)
+        if markers:
+            head = bytes(buf[start:min(end, start + 400)]).decode('utf-8', 'ignore')
+            entries.append({'scene': int(match.group(1)), 'chapter': _leading_chapter(head),
+                            'chapter_scene': None, 'start': start, 'end': end})
+        else:
+            entries.append({'scene': i + 1, 'chapter': int(match.group(1)),
+                            'chapter_scene': int(match.group(2)), 'start': start, 'end': end})
+    if not entries:
+        start, end = _trim_newlines(buf, 0, len(buf))
+        if end > start:
+            entries.append({'scene': 1, 'chapter': None, 'chapter_scene': None,
+                            'start': start, 'end': end})
+    return entries
+
+
+class StoryReader:
+    """Random access to the scenes of a story file through mmap
+
+    Uses the scene offset index written next to the story when it is present
+    and matches the file size, otherwise scans the mapped file once.
+    Slices are taken from the mapping, so only requested scenes are paged in.
+
+    Usage:
+        with StoryReader(story_path) as story:
+            text = story.scene_text(3)
+    """
+
+    def __init__(self, story_path):
+        self.story_path = Path(story_path)
+        self._fp = open(self.story_path, 'rb')
+        size = os.fstat(self._fp.fileno()).st_size
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.index = self._load_index(size)
+        self._by_scene = {entry['scene']: entry for entry in self.index}
+
+    def _load_index(self, size):
+        try:
+            with open(index_path(self.story_path), 'r', encoding='utf-8') as fp:
+                data = json.load(fp)
+            if data.get('version') == INDEX_VERSION and data.get('story_bytes') == size:
+                return data['scenes']
+        except (OSError, ValueError):
+            pass
+        return build_scene_index(self._mm)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fp.close()
+
+    def scene_bytes(self, scene_num):
+        """Raw bytes of a scene
+
+        Copied out of the mapping, so they stay valid after close().
+        """
+        entry = self._by_scene.get(scene_num)
+        if entry is None:
+            raise KeyError(f"No scene {scene_num} in {self.story_path}")
+        return self._mm[entry['start']:entry['end']]
+
+    def scene_text(self, scene_num):
+        return self.scene_bytes(scene_num).decode('utf-8')
+
+    def scenes(self, start=None, stop=None):
+        """Yields split_scenes-style dicts for index entries [start:stop]"""
+        for entry in self.index[start:stop]:
+            yield {'scene': entry['scene'], 'chapter': entry['chapter'],
+                   'text': self.scene_text(entry['scene'])}
+
+
+def read_scenes(story_path):
+    """All scenes of a story file as split_scenes-style dicts ([] if missing)"""
+    if not os.path.exists(story_path):
+        return []
+    with StoryReader(story_path) as story:
+        return list(story.scenes())
@@ -1,15 +1,45 @@
 import sys
+import math
 import time
-import re
 import json
+import asyncio
 import requests
+import threading
 import traceback
+from functools import lru_cache
 
-from goat_storytelling_agent import utils
+from goat_storytelling_agent import parsers, presets, routing, schemas, utils
+from goat_storytelling_agent.degeneration import DegenerationMonitor
+from goat_storytelling_agent.pool import POLICIES, BackendPool
 from goat_storytelling_agent.plan import Plan
 
 
 SUPPORTED_BACKENDS = ["hf", "llama.cpp", "openai"]
+# What to do with a scene generation that degenerates (see degeneration.py):
+# keep the text before the degenerate part, or ask again (once) and
+# truncate if that degenerates too. Off by default, since it streams the
+# scene calls
+DEGENERATION_ACTIONS = ["truncate", "retry"]
+
+
+@lru_cache(maxsize=None)
+def _hf_tokenizer():
+    """Tokenizer of the hf backend, loaded once per process"""
+    from transformers import LlamaTokenizerFast
+    return LlamaTokenizerFast.from_pretrained("GOAT-AI/GOAT-70B-Storytelling")
+
+
+@lru_cache(maxsize=None)
+def _openai_client(api_key):
+    """OpenAI client per API key, shared by all agents and threads of a process"""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+
+@lru_cache(maxsize=None)
+def _backend_pool(endpoints, policy):
+    """BackendPool per set of replicas, shared by all agents and threads of a process"""
+    return BackendPool(endpoints, policy=policy)
 
 
 def generate_prompt_parts(
@@ -31,9 +61,15 @@ def generate_prompt_parts(
         yield '\n### ASSISTANT:'
 
 
+def _generation_budget(available, max_new_tokens):
+    """Tokens to let a backend generate: what fits, capped at max_new_tokens"""
+    return available if max_new_tokens is None else min(available, max_new_tokens)
+
+
 def _query_chat_hf(endpoint, messages, tokenizer, retries=3,
                    request_timeout=120, max_tokens=4096,
-                   extra_options={'do_sample': True}):
+                   extra_options={'do_sample': True}, usage=None,
+                   monitor=None, schema=None, max_new_tokens=None):
     endpoint = endpoint.rstrip('/')
     prompt = ''.join(generate_prompt_parts(messages))
     tokens = tokenizer(prompt, add_special_tokens=True,
@@ -41,35 +77,69 @@ def _query_chat_hf(endpoint, messages, tokenizer, retries=3,
     data = {
         "inputs": prompt,
         "parameters": {
-            'max_new_tokens': max_tokens - len(tokens),
+            'max_new_tokens': _generation_budget(
+                max_tokens - len(tokens), max_new_tokens),
             **extra_options
         }
     }
+    if schema is not None:
+        data["parameters"]["grammar"] = {"type": "json", "value": schema["schema"]}
     headers = {'Content-Type': 'application/json'}
 
     while retries > 0:
         try:
-            response = requests.post(
-                f"{endpoint}/generate", headers=headers, data=json.dumps(data),
-                timeout=request_timeout)
             if messages and messages[-1]["role"] == "assistant":
                 result_prefix = messages[-1]["content"]
             else:
                 result_prefix = ''
-            generated_text = result_prefix + json.loads(
-                response.text)['generated_text']
-            return generated_text
+            if monitor is not None:
+                completion, n_generated = _stream_hf(
+                    endpoint, headers, data, request_timeout, monitor)
+            else:
+                response = requests.post(
+                    f"{endpoint}/generate", headers=headers,
+                    data=json.dumps(data), timeout=request_timeout)
+                completion = json.loads(response.text)['generated_text']
+                n_generated = len(tokenizer(
+                    completion, add_special_tokens=False)['input_ids'])
+            if usage is not None:
+                usage.update(input_tokens=len(tokens),
+                             output_tokens=n_generated)
+            return result_prefix + completion
         except Exception:
             traceback.print_exc()
             print('Timeout error, retrying...')
             retries -= 1
-            time.sleep(5)
+            if retries > 0:
+                time.sleep(5)
     else:
         return ''
 
 
+def _stream_hf(endpoint, headers, data, request_timeout, monitor):
+    """Streams a TGI generation into monitor, stops early when it trips
+
+    Returns the kept completion and the number of generated tokens.
+    """
+    monitor.reset()
+    response = requests.post(
+        f"{endpoint}/generate_stream", headers=headers, data=json.dumps(data),
+        timeout=request_timeout, stream=True)
+    with response:
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            token = json.loads(line[5:]).get("token") or {}
+            if token.get("special"):
+                continue
+            if monitor.feed(token.get("text", "")):
+                break
+    return monitor.kept(), monitor.chunks
+
+
 def _query_chat_llamacpp(endpoint, messages, retries=3, request_timeout=120,
-                         max_tokens=4096, extra_options={}):
+                         max_tokens=4096, extra_options={}, usage=None,
+                         monitor=None, schema=None, max_new_tokens=None):
     endpoint = endpoint.rstrip('/')
     headers = {'Content-Type': 'application/json'}
     prompt = ''.join(generate_prompt_parts(messages))
@@ -83,9 +153,11 @@ def _query_chat_llamacpp(endpoint, messages, retries=3, request_timeout=120,
     data = {
         "prompt": tokens,
         "stream": True,
-        "n_predict": max_tokens - len(tokens),
+        "n_predict": _generation_budget(max_tokens - len(tokens), max_new_tokens),
         **extra_options,
     }
+    if schema is not None:
+        data["grammar"] = schemas.to_gbnf(schema["schema"])
     jdata = json.dumps(data)
     request_kwargs = dict(headers=headers, data=jdata,
                           timeout=request_timeout, stream=True)
@@ -93,7 +165,12 @@ def _query_chat_llamacpp(endpoint, messages, retries=3, request_timeout=120,
     result = bytearray()
     if messages and messages[-1]["role"] == "assistant":
         result += messages[-1]["content"].encode("utf-8")
+    result_prefix = bytes(result)
+    if monitor is not None:
+        monitor.reset()
     is_first = True
+    n_chunks = 0
+    tokens_predicted = None
     for line in response.iter_lines():
         line = line.strip()
         if not line:
@@ -101,19 +178,24 @@ def _query_chat_llamacpp(endpoint, messages, retries=3, request_timeout=120,
         if line.startswith(b"error:"):
             retries -= 1
             print(f"\nError(retry={retries}): {line!r}")
-            if retries < 0:
+            if retries <= 0:
                 break
             del response
             time.sleep(5)
             response = requests.post(f"{endpoint}/completion", **request_kwargs)
             is_first = True
             result.clear()
+            n_chunks = 0
+            if monitor is not None:
+                monitor.reset()
             continue
         if not line.startswith(b"data: "):
             raise ValueError(f"Got unexpected response: {line!r}")
         parsed = json.loads(line[6:])
         content = parsed.get("content", b"")
         result += bytes(content, encoding="utf-8")
+        n_chunks += 1
+        tokens_predicted = parsed.get("tokens_predicted", tokens_predicted)
         if is_first:
             is_first = False
             print("<<|", end="")
@@ -122,15 +204,59 @@ def _query_chat_llamacpp(endpoint, messages, retries=3, request_timeout=120,
         sys.stdout.flush()
         if parsed.get("stop") is True:
             break
+        if monitor is not None and monitor.feed(content):
+            # Closing the connection makes llama.cpp stop generating
+            response.close()
+            result = bytearray(result_prefix + monitor.kept().encode("utf-8"))
+            print(f"\n[stopped early: {monitor.reason}]", end="")
+            break
     print("\nDone reading response.")
+    if usage is not None:
+        # Every streamed chunk is one token unless the server reports the count
+        usage.update(input_tokens=len(tokens),
+                     output_tokens=tokens_predicted or n_chunks)
     return str(result, encoding="utf-8").strip()
 
 
+def _stream_openai(stream, monitor, usage):
+    """Reads an OpenAI response stream into monitor, closes it early when it trips
+
+    Handles both responses API events and chat completion chunks.
+    Returns the kept text.
+    """
+    monitor.reset()
+    with stream:
+        for event in stream:
+            if getattr(event, "type", None) == "response.output_text.delta":
+                delta = event.delta
+            elif getattr(event, "type", None) == "response.completed":
+                if usage is not None and event.response.usage is not None:
+                    usage.update(
+                        input_tokens=event.response.usage.input_tokens,
+                        output_tokens=event.response.usage.output_tokens)
+                continue
+            elif getattr(event, "choices", None):
+                delta = event.choices[0].delta.content or ""
+            else:
+                if usage is not None and getattr(event, "usage", None):
+                    usage.update(
+                        input_tokens=event.usage.prompt_tokens,
+                        output_tokens=event.usage.completion_tokens)
+                continue
+            if monitor.feed(delta):
+                break
+    if monitor.tripped and usage is not None:
+        # The provider reports no usage for a stream closed early
+        usage.update(input_tokens=None, output_tokens=None)
+    return monitor.kept()
+
+
 def _query_chat_openai(api_key, messages, retries=3, request_timeout=120,
-                       max_tokens=4096, extra_options={}, model="gpt-5"):
+                       max_tokens=4096, extra_options={}, model="gpt-5",
+                       usage=None, monitor=None, schema=None,
+                       max_new_tokens=None):
     """Query OpenAI API for chat completion"""
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
+    client = _openai_client(api_key)
     
     # Prepare parameters based on model
     params = {
@@ -140,11 +266,11 @@ def _query_chat_openai(api_key, messages, retries=3, request_timeout=120,
     
     # GPT-5 uses different parameter names
     if model.startswith("gpt-5"):
-        params["max_completion_tokens"] = max_tokens
+        params["max_completion_tokens"] = _generation_budget(max_tokens, max_new_tokens)
         params["temperature"] = extra_options.get("temperature", 1.0)
         params["top_p"] = extra_options.get("top_p", 1.0)
     else:
-        params["max_tokens"] = max_tokens
+        params["max_tokens"] = _generation_budget(max_tokens, max_new_tokens)
         params["temperature"] = extra_options.get("temperature", 0.7)
         params["top_p"] = extra_options.get("top_p", 1.0)
     
@@ -153,6 +279,8 @@ def _query_chat_openai(api_key, messages, retries=3, request_timeout=120,
         for key, value in extra_options.items():
             if key not in ["temperature", "top_p"]:
                 params[key] = value
+    if schema is not None:
+        params["response_format"] = {"type": "json_schema", "json_schema": schema}
     
     while retries > 0:
         try:
@@ -170,16 +298,38 @@ def _query_chat_openai(api_key, messages, retries=3, request_timeout=120,
                     elif role == "assistant":
                         input_text += f"Assistant: {content}\n\n"
                 
+                text = {"verbosity": "low"}
+                if schema is not None:
+                    text["format"] = {"type": "json_schema", **schema}
+                if monitor is not None:
+                    return _stream_openai(client.responses.create(
+                        model=model,
+                        input=input_text.strip(),
+                        reasoning={"effort": "low"},
+                        text=text,
+                        stream=True
+                    ), monitor, usage)
                 response = client.responses.create(
                     model=model,
                     input=input_text.strip(),
                     reasoning={"effort": "low"},
-                    text={"verbosity": "low"}
+                    text=text
                 )
+                if usage is not None and response.usage is not None:
+                    usage.update(input_tokens=response.usage.input_tokens,
+                                 output_tokens=response.usage.output_tokens)
                 return response.output_text
             else:
                 # Standard chat completions API for other models
+                if monitor is not None:
+                    return _stream_openai(client.chat.completions.create(
+                        **params, stream=True,
+                        stream_options={"include_usage": True}
+                    ), monitor, usage)
                 response = client.chat.completions.create(**params)
+                if usage is not None and response.usage is not None:
+                    usage.update(input_tokens=response.usage.prompt_tokens,
+                                 output_tokens=response.usage.completion_tokens)
                 return response.choices[0].message.content
         except Exception as e:
             traceback.print_exc()
@@ -194,16 +344,27 @@ class StoryAgent:
     def __init__(self, backend_uri, backend="hf", request_timeout=120,
                  max_tokens=4096, n_crop_previous=400,
                  prompt_engine=None, form='novel',
-                 extra_options={}, scene_extra_options={}, model="gpt-5"):
+                 extra_options={}, scene_extra_options={}, model="gpt-5",
+                 degeneration=None, structured=False, preset=None,
+                 routes=None, balance="least_outstanding"):
 
         self.backend = backend.lower()
         if self.backend not in SUPPORTED_BACKENDS:
             raise ValueError("Unknown backend")
+        if degeneration is not None and degeneration not in DEGENERATION_ACTIONS:
+            raise ValueError("Unknown degeneration action")
+        if balance not in POLICIES:
+            raise ValueError("Unknown balancing policy")
+        self.balance = balance
+        if isinstance(preset, str):
+            if preset not in presets.STORY_PRESETS:
+                raise ValueError("Unknown preset")
+            preset = presets.STORY_PRESETS[preset]
 
         if self.backend == "hf":
-            from transformers import LlamaTokenizerFast
-            self.tokenizer = LlamaTokenizerFast.from_pretrained(
-                "GOAT-AI/GOAT-70B-Storytelling")
+            self.tokenizer = _hf_tokenizer()
+        if not isinstance(backend_uri, str) and self.backend == "openai":
+            raise ValueError("Backend pools need the hf or llama.cpp backend")
         
         # Store model for OpenAI backend
         self.model = model if self.backend == "openai" else None
@@ -216,62 +377,298 @@ class StoryAgent:
 
         self.form = form
         self.max_tokens = max_tokens
+        # Story length config of the prompts and the per-stage token
+        # budgets (see presets.py); None keeps the defaults
+        self.length_config = preset
         self.extra_options = extra_options
         self.scene_extra_options = extra_options.copy()
         self.scene_extra_options.update(scene_extra_options)
         self.backend_uri = backend_uri
         self.n_crop_previous = n_crop_previous
         self.request_timeout = request_timeout
+        # Running totals over all calls of this agent: tokens over the calls
+        # whose usage the backend reported, the others counted apart (an
+        # OpenAI stream cut by the degeneration monitor reports none)
+        self.usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0,
+                      "unknown_usage_calls": 0}
+        self._usage_lock = threading.Lock()
+        self.degeneration = degeneration
+        self.degeneration_events = []
+        # Ask for JSON following schemas.py in the spec and plan stages
+        self.structured = structured
+        # Calls per stage wasted on replies the parsers could not use, or
+        # spent repairing them
+        self.requeries = {}
 
-    def query_chat(self, messages, retries=3):
-        if self.backend == "hf":
-            result = _query_chat_hf(
-                self.backend_uri, messages, self.tokenizer, retries=retries,
-                request_timeout=self.request_timeout,
-                max_tokens=self.max_tokens, extra_options=self.extra_options)
-        elif self.backend == "llama.cpp":
-            result = _query_chat_llamacpp(
-                self.backend_uri, messages, retries=retries,
-                request_timeout=self.request_timeout,
-                max_tokens=self.max_tokens, extra_options=self.extra_options)
-        elif self.backend == "openai":
-            result = _query_chat_openai(
-                self.backend_uri, messages, retries=retries,
-                request_timeout=self.request_timeout,
-                max_tokens=self.max_tokens, extra_options=self.extra_options,
-                model=self.model)
+        # Stage -> cascade of resolved routes (see routing.py); stages
+        # without one use the agent's own backend, scene stages with
+        # scene_extra_options
+        self.default_route = self._resolve_route({
+            "backend": self.backend, "backend_uri": backend_uri,
+            "model": model, "max_tokens": max_tokens,
+            "request_timeout": request_timeout, "extra_options": extra_options})
+        self.routes = {stage: [self.default_route] for stage in routing.STAGES}
+        for stage in ("write_a_scene", "continue_a_scene"):
+            self.routes[stage] = [{**self.default_route,
+                                   "extra_options": self.scene_extra_options}]
+        for stage, cascade in (routes or {}).items():
+            cascade = routing.route_list(stage, cascade, SUPPORTED_BACKENDS)
+            for route in cascade:
+                backend = route.get("backend", self.backend).lower()
+                if backend != self.backend and "backend_uri" not in route:
+                    raise ValueError(f"Route of {stage} to {route['backend']} "
+                                     f"needs a backend_uri")
+            self.routes[stage] = [
+                self._resolve_route({**self.routes[stage][0], **route})
+                for route in cascade]
+        # Calls per route (see routing.describe) and calls a cascade
+        # escalated past a stage's first route
+        self.route_calls = {}
+        self.escalations = {}
+
+    def _resolve_route(self, route):
+        # The tokenizer and pool of the route it was merged over belong to
+        # that route's backend and backend_uri
+        route = {key: value for key, value in route.items()
+                 if key not in ("tokenizer", "pool")}
+        route["backend"] = route["backend"].lower()
+        if (route["backend"] == "openai"
+                and not isinstance(route["backend_uri"], str)):
+            raise ValueError("Backend pools need the hf or llama.cpp backend")
+        if route["backend"] == "hf":
+            route["tokenizer"] = _hf_tokenizer()
+        if not isinstance(route["backend_uri"], str):
+            # A list of replicas (see pool.py)
+            route["backend_uri"] = tuple(route["backend_uri"])
+            route["pool"] = _backend_pool(route["backend_uri"], self.balance)
+        return route
+
+    def route(self, stage=None, attempt=0):
+        """Backend settings for a stage's call, attempt counting its repeats
+
+        A stage's cascade goes one route further per attempt and stays
+        on its last route. Calls without a stage use the agent's backend.
+        """
+        if stage is None:
+            return self.default_route
+        cascade = self.routes[stage]
+        return cascade[min(attempt, len(cascade) - 1)]
+
+    def query_chat(self, messages, retries=3, usage=None, monitor=None,
+                   schema=None, max_new_tokens=None, stage=None, attempt=0):
+        """Sends messages to the backend and returns the reply text
+
+        Parameters
+        ----------
+        messages : List[Dict]
+            Chat messages
+        retries : int, optional
+            Attempts on backend errors, by default 3; with a list of
+            replicas, each attempt goes to another replica (see pool.py)
+        usage : Dict, optional
+            Filled with input_tokens and output_tokens of the call
+            when the backend reports them
+        monitor : DegenerationMonitor, optional
+            Streams the reply through monitor and stops reading once it
+            trips; the reply is then cut to monitor.kept()
+        schema : Dict, optional
+            Constrains the reply to JSON following this schema (see
+            schemas.json_schema)
+        max_new_tokens : int, optional
+            Generates at most this many tokens (see stage_max_tokens);
+            by default as many as max_tokens allows
+        stage : str, optional
+            Pipeline stage making the call, picks its route (see route)
+        attempt : int, optional
+            Repeats of this call so far, moves along the stage's cascade
+        """
+        route = self.route(stage, attempt)
+        call_usage = {}
+        common = dict(retries=retries, request_timeout=route["request_timeout"],
+                      max_tokens=route["max_tokens"],
+                      extra_options=route["extra_options"], usage=call_usage,
+                      monitor=monitor, schema=schema,
+                      max_new_tokens=max_new_tokens)
+        if "pool" in route:
+            # One try per replica, a failed call moves on to the next one
+            common["retries"] = 1
+
+        def query(endpoint):
+            if route["backend"] == "hf":
+                return _query_chat_hf(
+                    endpoint, messages, route["tokenizer"], **common)
+            elif route["backend"] == "llama.cpp":
+                return _query_chat_llamacpp(endpoint, messages, **common)
+            elif route["backend"] == "openai":
+                return _query_chat_openai(
+                    endpoint, messages, model=route["model"], **common)
+
+        if "pool" in route:
+            # An empty reply is a failed call, unless the monitor cut it
+            result = route["pool"].call(
+                query, attempts=retries, usage=call_usage,
+                accept=lambda text: bool(text) or bool(monitor and monitor.tripped))
+        else:
+            result = query(route["backend_uri"])
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            name = routing.describe(route)
+            self.route_calls[name] = self.route_calls.get(name, 0) + 1
+            if stage is not None and attempt and len(self.routes[stage]) > 1:
+                self.escalations[stage] = self.escalations.get(stage, 0) + 1
+            if None in (call_usage.get("input_tokens"), call_usage.get("output_tokens")):
+                self.usage["unknown_usage_calls"] += 1
+            else:
+                self.usage["input_tokens"] += call_usage["input_tokens"]
+                self.usage["output_tokens"] += call_usage["output_tokens"]
+        if usage is not None:
+            usage.update(call_usage)
         return result
 
+    def query_json(self, messages, schema, stage, attempts=3):
+        """Asks for a reply following schema and returns it parsed
+
+        The prompt is told to answer in JSON and the backend constrains
+        decoding to the schema. A reply that still does not conform (cut
+        off at max_tokens, say) is asked again, up to attempts calls in
+        all; returns None when none conforms.
+        """
+        messages = [dict(message) for message in messages]
+        messages[-1]["content"] += self.prompt_engine.structured_output_intro
+        max_new_tokens = self.stage_max_tokens(stage, structured=True)
+        for attempt in range(attempts):
+            obj = schemas.loads(self.query_chat(
+                messages, schema=schema, max_new_tokens=max_new_tokens,
+                stage=stage, attempt=attempt), schema)
+            if obj is not None:
+                return obj
+            self._requery(stage)
+        return None
+
+    def _requery(self, stage):
+        """Counts one call of stage wasted on (or repairing) an unusable reply"""
+        with self._usage_lock:
+            self.requeries[stage] = self.requeries.get(stage, 0) + 1
+
+    def _length_kwargs(self):
+        """length_config argument of the prompt functions that take one
+        (left out without a preset, for prompt engines without it)"""
+        return {} if self.length_config is None else {'length_config': self.length_config}
+
+    def stage_max_tokens(self, stage, plan=None, structured=False):
+        """Generation budget of a stage's replies under the length preset
+
+        Parameters
+        ----------
+        stage : str
+            Method making the call, e.g. 'create_plot_chapters'
+        plan : Dict, optional
+            Book plan, the scene stages share the story's words among its
+            scenes
+        structured : bool, optional
+            Leaves room for the JSON syntax of a structured reply
+
+        Returns
+        -------
+        int
+            Token budget, never above the route's max_tokens; None
+            without a preset
+        """
+        if self.length_config is None:
+            return None
+        n_scenes = None
+        if plan is not None:
+            n_scenes = sum(len(chapter) for act in plan
+                           for chapter in act.get('chapter_scenes', {}).values())
+        budget = presets.stage_max_tokens(self.length_config, stage, n_scenes)
+        if budget is None:
+            return None
+        if structured:
+            budget = math.ceil(budget * presets.JSON_OVERHEAD)
+        return min(budget, self.route(stage)["max_tokens"])
+
+    def query_scene(self, messages, max_new_tokens=None, stage='write_a_scene'):
+        """query_chat for scene text, stopping degenerate generations early
+
+        With degeneration set (off by default), the reply is streamed
+        through a DegenerationMonitor; a generation that loops or starts a
+        new header is cut short and then truncated or retried (on the next
+        route of a cascade). Every stop is recorded in degeneration_events
+        (see degeneration_report).
+        """
+        if self.degeneration is None:
+            return self.query_chat(messages, max_new_tokens=max_new_tokens,
+                                   stage=stage)
+        attempts = 2 if self.degeneration == "retry" else 1
+        for attempt in range(1, attempts + 1):
+            monitor = DegenerationMonitor()
+            usage = {}
+            started = time.monotonic()
+            text = self.query_chat(messages, usage=usage, monitor=monitor,
+                                   max_new_tokens=max_new_tokens, stage=stage,
+                                   attempt=attempt - 1)
+            if not monitor.tripped:
+                return text
+            self.degeneration_events.append(self._degeneration_event(
+                monitor, usage, time.monotonic() - started,
+                "retried" if attempt < attempts else "truncated",
+                self.route(stage, attempt - 1), max_new_tokens))
+        return text
+
+    def _degeneration_event(self, monitor, usage, seconds, action, route,
+                            max_new_tokens=None):
+        """What stopping a generation early saved, as an upper bound
+
+        The model could have gone on until its token budget (max_tokens
+        minus the prompt for hf / llama.cpp, capped at max_new_tokens),
+        the time saved is that many tokens at the speed observed before
+        the stop.
+        """
+        generated = usage.get("output_tokens") or monitor.chunks
+        budget = route["max_tokens"]
+        if route["backend"] != "openai":
+            budget -= usage.get("input_tokens") or 0
+        budget = _generation_budget(budget, max_new_tokens)
+        saved = max(0, budget - generated)
+        return {
+            "reason": monitor.reason,
+            "action": action,
+            "generated_chars": len(monitor.text),
+            "kept_chars": len(monitor.kept()),
+            "output_tokens": generated,
+            "seconds": round(seconds, 3),
+            "max_tokens_saved": saved,
+            "est_seconds_saved": round(saved * seconds / generated, 1) if generated else None,
+        }
+
+    def degeneration_report(self, events=None):
+        """Totals over degeneration_events (or the given events)"""
+        events = self.degeneration_events if events is None else events
+        reasons = {}
+        for event in events:
+            reasons[event["reason"]] = reasons.get(event["reason"], 0) + 1
+        return {
+            "stopped": len(events),
+            "truncated": sum(1 for e in events if e["action"] == "truncated"),
+            "retried": sum(1 for e in events if e["action"] == "retried"),
+            "reasons": reasons,
+            "max_tokens_saved": sum(e["max_tokens_saved"] for e in events),
+            "est_seconds_saved": round(sum(e["est_seconds_saved"] or 0 for e in events), 1),
+        }
+
     def parse_book_spec(self, text_spec):
-        # Initialize book spec dict with empty fields
-        fields = self.prompt_engine.book_spec_fields
-        spec_dict = {field: '' for field in fields}
-        last_field = None
-        if "\"\"\"" in text_spec[:int(len(text_spec)/2)]:
-            header, sep, text_spec = text_spec.partition("\"\"\"")
-        text_spec = text_spec.strip()
-
-        # Process raw spec into dict
-        for line in text_spec.split('\n'):
-            pseudokey, sep, value = line.partition(':')
-            pseudokey = pseudokey.lower().strip()
-            matched_key = [key for key in fields
-                           if (key.lower().strip() in pseudokey)
-                           and (len(pseudokey) < (2 * len(key.strip())))]
-            if (':' in line) and (len(matched_key) == 1):
-                last_field = matched_key[0]
-                if last_field in spec_dict:
-                    spec_dict[last_field] += value.strip()
-            elif ':' in line:
-                last_field = 'other'
-                spec_dict[last_field] = ''
-            else:
-                if last_field:
-                    # If line does not contain ':' it should be
-                    # the continuation of the last field's value
-                    spec_dict[last_field] += ' ' + line.strip()
-        spec_dict.pop('other', None)
-        return spec_dict
+        return parsers.book_spec(text_spec, self.prompt_engine.book_spec_fields)
+
+    def _query_book_spec(self, messages, stage):
+        """Book spec dict from a reply to messages, as JSON when structured"""
+        if self.structured:
+            spec_dict = self.query_json(
+                messages, schemas.book_spec(self.prompt_engine.book_spec_fields),
+                stage)
+            if spec_dict is not None:
+                return {key: value.strip() for key, value in spec_dict.items()}
+        return self.parse_book_spec(self.query_chat(
+            messages, max_new_tokens=self.stage_max_tokens(stage), stage=stage))
 
     def init_book_spec(self, topic):
         """Creates initial book specification
@@ -289,17 +686,22 @@ class StoryAgent:
             Book specification text
         """
         messages = self.prompt_engine.init_book_spec_messages(topic, self.form)
-        text_spec = self.query_chat(messages)
-        spec_dict = self.parse_book_spec(text_spec)
+        spec_dict = self._query_book_spec(messages, 'init_book_spec')
 
         text_spec = "\n".join(f"{key}: {value}"
                               for key, value in spec_dict.items())
         # Check and fill in missing fields
         for field in self.prompt_engine.book_spec_fields:
+            attempt = 0
             while not spec_dict[field]:
                 messages = self.prompt_engine.missing_book_spec_messages(
                     field, text_spec)
-                missing_part = self.query_chat(messages)
+                missing_part = self.query_chat(
+                    messages,
+                    max_new_tokens=self.stage_max_tokens('missing_book_spec'),
+                    stage='missing_book_spec', attempt=attempt)
+                self._requery('missing_book_spec')
+                attempt += 1
                 key, sep, value = missing_part.partition(':')
                 if key.lower().strip() == field.lower().strip():
                     spec_dict[field] = value.strip()
@@ -324,9 +726,8 @@ class StoryAgent:
         """
         messages = self.prompt_engine.enhance_book_spec_messages(
             book_spec, self.form)
-        text_spec = self.query_chat(messages)
         spec_dict_old = self.parse_book_spec(book_spec)
-        spec_dict_new = self.parse_book_spec(text_spec)
+        spec_dict_new = self._query_book_spec(messages, 'enhance_book_spec')
 
         # Check and fill in missing fields
         for field in self.prompt_engine.book_spec_fields:
@@ -352,12 +753,24 @@ class StoryAgent:
         dict
             Dict with book plan
         """
-        messages = self.prompt_engine.create_plot_chapters_messages(book_spec, self.form)
+        messages = self.prompt_engine.create_plot_chapters_messages(
+            book_spec, self.form, **self._length_kwargs())
+        if self.structured:
+            plan = self.query_json(messages, schemas.plan(), 'create_plot_chapters')
+            if plan is not None:
+                return messages, schemas.plan_from_json(plan)
         plan = []
+        attempt = 0
         while not plan:
-            text_plan = self.query_chat(messages)
+            text_plan = self.query_chat(
+                messages,
+                max_new_tokens=self.stage_max_tokens('create_plot_chapters'),
+                stage='create_plot_chapters', attempt=attempt)
             if text_plan:
                 plan = Plan.parse_text_plan(text_plan)
+            if not plan:
+                self._requery('create_plot_chapters')
+                attempt += 1
         return messages, plan
 
     def enhance_plot_chapters(self, book_spec, plan):
@@ -379,17 +792,30 @@ class StoryAgent:
         """
         text_plan = Plan.plan_2_str(plan)
         all_messages = []
+        max_new_tokens = self.stage_max_tokens('enhance_plot_chapters')
         for act_num in range(3):
             messages = self.prompt_engine.enhance_plot_chapters_messages(
                 act_num, text_plan, book_spec, self.form)
-            act = self.query_chat(messages)
-            if act:
-                act_dict = Plan.parse_act(act)
-                while len(act_dict['chapters']) < 2:
-                    act = self.query_chat(messages)
+            act_dict = None
+            if self.structured:
+                act = self.query_json(messages, schemas.act(), 'enhance_plot_chapters')
+                if act is not None:
+                    act_dict = schemas.act_from_json(act, act_num + 1)
+            if act_dict is None:
+                act = self.query_chat(messages, max_new_tokens=max_new_tokens,
+                                      stage='enhance_plot_chapters')
+                if act:
                     act_dict = Plan.parse_act(act)
-                else:
-                    plan[act_num] = act_dict
+                    attempt = 0
+                    while len(act_dict['chapters']) < 2:
+                        self._requery('enhance_plot_chapters')
+                        attempt += 1
+                        act = self.query_chat(
+                            messages, max_new_tokens=max_new_tokens,
+                            stage='enhance_plot_chapters', attempt=attempt)
+                        act_dict = Plan.parse_act(act)
+            if act_dict is not None:
+                plan[act_num] = act_dict
                 text_plan = Plan.plan_2_str(plan)
             all_messages.append(messages)
         return all_messages, plan
@@ -410,69 +836,42 @@ class StoryAgent:
             Dict with updated book plan
         """
         all_messages = []
-        act_chapters = {}
         for i, act in enumerate(plan, start=1):
             text_act, chs = Plan.act_2_str(plan, i)
-            act_chapters[i] = chs
             messages = self.prompt_engine.split_chapters_into_scenes_messages(
-                i, text_act, self.form)
-            act_scenes = self.query_chat(messages)
-            act['act_scenes'] = act_scenes
+                i, text_act, self.form, **self._length_kwargs())
+            act_scenes = None
+            if self.structured:
+                act_scenes = self.query_json(
+                    messages, schemas.act_scenes(
+                        len(chs), self.prompt_engine.scene_spec_fields),
+                    'split_chapters_into_scenes')
+            if act_scenes is not None:
+                act['act_scenes'] = json.dumps(act_scenes, indent=2)
+                act['chapter_scenes'] = {
+                    ch_num: [schemas.scene_to_str(scene)
+                             for scene in chapter['scenes']]
+                    for ch_num, chapter in zip(chs, act_scenes['chapters'])}
+            else:
+                # With a cascade, a breakdown that leaves chapters without
+                # scenes is asked again on the next route
+                cascade = self.routes['split_chapters_into_scenes']
+                for attempt in range(len(cascade)):
+                    act['act_scenes'] = self.query_chat(
+                        messages, max_new_tokens=self.stage_max_tokens(
+                            'split_chapters_into_scenes'),
+                        stage='split_chapters_into_scenes', attempt=attempt)
+                    act['chapter_scenes'] = parsers.act_scenes(act['act_scenes'], chs)
+                    if (len(act['chapter_scenes']) >= len(chs)
+                            or attempt == len(cascade) - 1):
+                        break
+                    self._requery('split_chapters_into_scenes')
             all_messages.append(messages)
-
-        for i, act in enumerate(plan, start=1):
-            act_scenes = act['act_scenes']
-            act_scenes = re.split(r'Chapter (\d+)', act_scenes.strip())
-
-            act['chapter_scenes'] = {}
-            chapters = [text.strip() for text in act_scenes[:]
-                        if (text and text.strip())]
-            current_ch = None
-            merged_chapters = {}
-            for snippet in chapters:
-                if snippet.isnumeric():
-                    ch_num = int(snippet)
-                    if ch_num != current_ch:
-                        current_ch = snippet
-                        merged_chapters[ch_num] = ''
-                    continue
-                if merged_chapters:
-                    merged_chapters[ch_num] += snippet
-            ch_nums = list(merged_chapters.keys()) if len(
-                merged_chapters) <= len(act_chapters[i]) else act_chapters[i]
-            merged_chapters = {ch_num: merged_chapters[ch_num]
-                               for ch_num in ch_nums}
-            for ch_num, chapter in merged_chapters.items():
-                scenes = re.split(r'Scene \d+.{0,10}?:', chapter)
-                scenes = [text.strip() for text in scenes[1:]
-                          if (text and (len(text.split()) > 3))]
-                if not scenes:
-                    continue
-                act['chapter_scenes'][ch_num] = scenes
         return all_messages, plan
 
     @staticmethod
     def prepare_scene_text(text):
-        lines = text.split('\n')
-        ch_ids = [i for i in range(min(5, len(lines)))
-                  if 'Chapter ' in lines[i]]
-        if ch_ids:
-            lines = lines[ch_ids[-1]+1:]
-        sc_ids = [i for i in range(min(5, len(lines)))
-                  if 'Scene ' in lines[i]]
-        if sc_ids:
-            lines = lines[sc_ids[-1]+1:]
-
-        placeholder_i = None
-        for i in range(len(lines)):
-            if lines[i].startswith('Chapter ') or lines[i].startswith('Scene '):
-                placeholder_i = i
-                break
-        if placeholder_i is not None:
-            lines = lines[:i]
-
-        text = '\n'.join(lines)
-        return text
+        return parsers.scene_text(text)
 
     def write_a_scene(
             self, scene, sc_num, ch_num, plan, previous_scene=None):
@@ -500,12 +899,14 @@ class StoryAgent:
         """
         text_plan = Plan.plan_2_str(plan)
         messages = self.prompt_engine.scene_messages(
-            scene, sc_num, ch_num, text_plan, self.form)
+            scene, sc_num, ch_num, text_plan, self.form,
+            **self._length_kwargs())
         if previous_scene:
             previous_scene = utils.keep_last_n_words(previous_scene,
                                                      n=self.n_crop_previous)
             messages[1]['content'] += f'{self.prompt_engine.prev_scene_intro}\"\"\"{previous_scene}\"\"\"'
-        generated_scene = self.query_chat(messages)
+        generated_scene = self.query_scene(
+            messages, self.stage_max_tokens('write_a_scene', plan))
         generated_scene = self.prepare_scene_text(generated_scene)
         return messages, generated_scene
 
@@ -535,32 +936,121 @@ class StoryAgent:
         """
         text_plan = Plan.plan_2_str(plan)
         messages = self.prompt_engine.scene_messages(
-            scene, sc_num, ch_num, text_plan, self.form)
+            scene, sc_num, ch_num, text_plan, self.form,
+            **self._length_kwargs())
         if current_scene:
             current_scene = utils.keep_last_n_words(current_scene,
                                                     n=self.n_crop_previous)
             messages[1]['content'] += f'{self.prompt_engine.cur_scene_intro}\"\"\"{current_scene}\"\"\"'
-        generated_scene = self.query_chat(messages)
+        generated_scene = self.query_scene(
+            messages, self.stage_max_tokens('continue_a_scene', plan),
+            stage='continue_a_scene')
         generated_scene = self.prepare_scene_text(generated_scene)
         return messages, generated_scene
 
-    def generate_story(self, topic):
-        """Example pipeline for a novel creation"""
+    def _usage_since(self, snapshot, started):
+        """Time and tokens spent since snapshot (a copy of self.usage)"""
+        with self._usage_lock:
+            usage = dict(self.usage)
+        return {"seconds": round(time.monotonic() - started, 3),
+                **{key: usage[key] - snapshot[key]
+                   for key in ("calls", "input_tokens", "output_tokens", "unknown_usage_calls")}}
+
+    def generate_story_events(self, topic):
+        """Runs the novel pipeline, yielding an event as each part is ready
+
+        The pipeline only advances when the next event is requested, so a
+        slow consumer holds back generation instead of buffering scenes.
+
+        Parameters
+        ----------
+        topic : str
+            Story topic
+
+        Yields
+        ------
+        Dict
+            {"event": name, ...} with name one of
+            spec_ready (book_spec), plan_ready (plan, scenes),
+            scene_planned (index, chapter, scene, description),
+            scene_done (index, chapter, scene, text, degeneration) and
+            story_done (scenes, degeneration). spec_ready, plan_ready,
+            scene_done and story_done also carry seconds, calls,
+            input_tokens and output_tokens spent on that part (tokens of
+            the calls whose usage the backend reported) and
+            unknown_usage_calls, the calls without usage. degeneration lists the
+            generations stopped early for the scene, and totals them for
+            the story (see query_scene). story_done also carries requeries,
+            the calls per stage wasted on unusable replies (see _requery),
+            and escalations, the calls per stage that went further down
+            a cascade of routes (see routing).
+        """
+        story_started = time.monotonic()
+        story_usage = dict(self.usage)
+        story_events = len(self.degeneration_events)
+        story_requeries = dict(self.requeries)
+        story_escalations = dict(self.escalations)
+
+        started, snapshot = time.monotonic(), dict(self.usage)
         _, book_spec = self.init_book_spec(topic)
         _, book_spec = self.enhance_book_spec(book_spec)
+        yield {"event": "spec_ready", "book_spec": book_spec,
+               **self._usage_since(snapshot, started)}
+
+        started, snapshot = time.monotonic(), dict(self.usage)
         _, plan = self.create_plot_chapters(book_spec)
         _, plan = self.enhance_plot_chapters(book_spec, plan)
         _, plan = self.split_chapters_into_scenes(plan)
+        n_scenes = sum(len(chapter) for act in plan
+                       for chapter in act['chapter_scenes'].values())
+        yield {"event": "plan_ready", "plan": plan, "scenes": n_scenes,
+               **self._usage_since(snapshot, started)}
 
-        form_text = []
+        index = 0
+        previous_scene = None
         for act in plan:
             for ch_num, chapter in act['chapter_scenes'].items():
-                sc_num = 1
-                for scene in chapter:
-                    previous_scene = form_text[-1] if form_text else None
+                for sc_num, scene in enumerate(chapter, start=1):
+                    index += 1
+                    yield {"event": "scene_planned", "index": index,
+                           "chapter": ch_num, "scene": sc_num,
+                           "description": scene}
+                    started, snapshot = time.monotonic(), dict(self.usage)
+                    scene_events = len(self.degeneration_events)
                     _, generated_scene = self.write_a_scene(
                         scene, sc_num, ch_num, plan,
                         previous_scene=previous_scene)
-                    form_text.append(generated_scene)
-                    sc_num += 1
-        return form_text
+                    previous_scene = generated_scene
+                    yield {"event": "scene_done", "index": index,
+                           "chapter": ch_num, "scene": sc_num,
+                           "text": generated_scene,
+                           "degeneration": self.degeneration_events[scene_events:],
+                           **self._usage_since(snapshot, started)}
+
+        yield {"event": "story_done", "scenes": index,
+               "degeneration": self.degeneration_report(
+                   self.degeneration_events[story_events:]),
+               "requeries": {stage: n - story_requeries.get(stage, 0)
+                             for stage, n in self.requeries.items()},
+               "escalations": {stage: n - story_escalations.get(stage, 0)
+                               for stage, n in self.escalations.items()},
+               **self._usage_since(story_usage, story_started)}
+
+    async def agenerate_story_events(self, topic):
+        """Async iterator over generate_story_events
+
+        Each step of the pipeline runs in a worker thread, so the event
+        loop stays free while the backend is busy.
+        """
+        events = self.generate_story_events(topic)
+        done = object()
+        while True:
+            event = await asyncio.to_thread(next, events, done)
+            if event is done:
+                return
+            yield event
+
+    def generate_story(self, topic):
+        """Example pipeline for a novel creation"""
+        return [event["text"] for event in self.generate_story_events(topic)
+                if event["event"] == "scene_done"]
@@ -0,0 +1 @@
+"""Story judges. Run `python -m judges --help` to judge many sessions at once."""
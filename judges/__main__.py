@@ -0,0 +1,3 @@
+from judges.runner import main
+
+main()
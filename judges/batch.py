@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Offline batch mode for the judges
+Instead of calling the model while judging, the judge prompts are written to
+a JSONL file in the provider batch format (OpenAI Batch API, /v1/responses),
+submitted whenever convenient, and the results file is ingested back into
+the usual evaluation files (gpa_evaluation.json, writing_quality.json, ...).
+
+The judges run unchanged: they are replayed against the responses ingested
+so far, every model call they make that has no response yet is written to
+the next requests file. Single-call judges finish after one round; judges
+that map-reduce long stories need a second round for the merge call.
+
+Batch directory layout:
+    batch.json            judges, sessions, model and current round
+    requests_001.jsonl    requests of round 1 (upload these)
+    results_001.jsonl     results of round 1 (download or run-local)
+    responses.jsonl       every result ingested so far
+
+Examples:
+    python -m judges.batch prepare batches/nightly all --judges gpa,writing_quality
+    # upload requests_001.jsonl, download the output file as results_001.jsonl
+    python -m judges.batch ingest batches/nightly
+    # or process the requests with any configured backend, e.g. a local llama.cpp server
+    python -m judges.batch run-local batches/nightly --backend llama.cpp --backend-uri http://localhost:8080
+    python -m judges.batch ingest batches/nightly
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from judges import common
+from judges.runner import JUDGES, is_judgeable, is_up_to_date, list_session_ids, select_sessions
+
+BATCH_URL = "/v1/responses"
+STATE_FILE = "batch.json"
+RESPONSES_FILE = "responses.jsonl"
+
+
+class PendingRequest(Exception):
+    """Raised for a model call that has no response in the batch yet"""
+
+
+def request_id(body: dict) -> str:
+    """custom_id of a request: identical requests share one id (and one response)"""
+    return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+
+
+class ReplayClient:
+    """Stand-in for the OpenAI client that answers from ingested batch results
+
+    Calls without a result are recorded in .pending and raise PendingRequest.
+    """
+
+    def __init__(self, responses: dict):
+        self._responses = responses
+        self.pending = {}
+        self._lock = threading.Lock()
+        self.responses = self
+
+    def create(self, **body):
+        custom_id = request_id(body)
+        result = self._responses.get(custom_id)
+        if result is None:
+            with self._lock:
+                self.pending[custom_id] = body
+            raise PendingRequest(custom_id)
+        return SimpleNamespace(
+            output_text=result["text"],
+            usage=SimpleNamespace(input_tokens=result.get("input_tokens"),
+                                  output_tokens=result.get("output_tokens")),
+        )
+
+
+# === JSONL files ===
+
+def read_jsonl(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_jsonl(path: str, records) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def request_line(custom_id: str, body: dict) -> dict:
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_URL, "body": body}
+
+
+def result_line(custom_id: str, text: str = None, input_tokens=None, output_tokens=None, error: str = None) -> dict:
+    """A results file line shaped like the provider's batch output"""
+    if error is not None:
+        return {"id": f"batch_req_{custom_id}", "custom_id": custom_id, "response": None,
+                "error": {"code": "local_error", "message": error}}
+    return {
+        "id": f"batch_req_{custom_id}",
+        "custom_id": custom_id,
+        "response": {"status_code": 200, "body": {
+            "output": [{"type": "message", "role": "assistant",
+                        "content": [{"type": "output_text", "text": text}]}],
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }},
+        "error": None,
+    }
+
+
+def parse_result(line: dict):
+    """(custom_id, {"text", "input_tokens", "output_tokens"}) of a results line, or (custom_id, error)"""
+    custom_id = line.get("custom_id")
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or (response.get("body") or {}).get("error") or response.get("status_code")
+        return custom_id, str(error)
+    body = response.get("body") or {}
+    text = "".join(part.get("text", "")
+                   for item in body.get("output") or [] if item.get("type") == "message"
+                   for part in item.get("content") or [] if part.get("type") == "output_text")
+    usage = body.get("usage") or {}
+    return custom_id, {"text": text, "input_tokens": usage.get("input_tokens"),
+                       "output_tokens": usage.get("output_tokens")}
+
+
+# === Batch state ===
+
+def load_state(batch_dir: str) -> dict:
+    path = os.path.join(batch_dir, STATE_FILE)
+    if not os.path.exists(path):
+        raise SystemExit(f"❌ No batch in {batch_dir} (run prepare first)")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(batch_dir: str, state: dict) -> None:
+    tmp_path = os.path.join(batch_dir, STATE_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, os.path.join(batch_dir, STATE_FILE))
+
+
+def load_responses(batch_dir: str) -> dict:
+    path = os.path.join(batch_dir, RESPONSES_FILE)
+    return {record["custom_id"]: record for record in read_jsonl(path)} if os.path.exists(path) else {}
+
+
+def round_file(batch_dir: str, kind: str, round_number: int) -> str:
+    return os.path.join(batch_dir, f"{kind}_{round_number:03d}.jsonl")
+
+
+def replay(state: dict, responses: dict):
+    """Run every (judge, session) pair of the batch against the ingested responses
+
+    Pairs whose requests all have a response write their evaluation file.
+    Returns (completed pairs, pending pairs, {custom_id: body} still needed).
+    """
+    client = ReplayClient(responses)
+    previous_client = common._client
+    common.set_client(client)
+    completed, pending = [], []
+    try:
+        for name in state["judges"]:
+            module = importlib.import_module(JUDGES[name])
+            model = state["model"] or module.MODEL
+            for sid in state["sessions"]:
+                if not state.get("force") and is_up_to_date(sid, module, model):
+                    completed.append((name, sid))
+                    continue
+                try:
+                    # The judges report progress as if they were calling the model; keep that quiet
+                    with redirect_stdout(io.StringIO()):
+                        module.judge_session(sid, model, force=True)
+                    completed.append((name, sid))
+                except PendingRequest:
+                    pending.append((name, sid))
+    finally:
+        common.set_client(previous_client)
+    return completed, pending, client.pending
+
+
+def next_round(batch_dir: str, state: dict, responses: dict) -> None:
+    """Replay the batch, write the requests still needed as the next round"""
+    completed, pending, requests = replay(state, responses)
+    for name, sid in completed:
+        print(f"✅ {name} × session {sid}")
+    if requests:
+        state["round"] += 1
+        path = round_file(batch_dir, "requests", state["round"])
+        write_jsonl(path, (request_line(custom_id, body) for custom_id, body in sorted(requests.items())))
+        print(f"📝 {len(requests)} requests for {len(pending)} judge runs written to: {path}")
+    else:
+        print("🏁 Batch complete")
+    state["pending"] = [list(pair) for pair in pending]
+    save_state(batch_dir, state)
+
+
+# === Commands ===
+
+def prepare(batch_dir, selectors, judge_names, model=None, force=False):
+    """Collect the sessions and write the first requests file"""
+    os.makedirs(batch_dir, exist_ok=True)
+    if os.path.exists(os.path.join(batch_dir, STATE_FILE)):
+        raise SystemExit(f"❌ {batch_dir} already holds a batch, use another directory")
+    judge_modules = {name: importlib.import_module(JUDGES[name]) for name in judge_names}
+    session_ids = [sid for sid in select_sessions(selectors, list_session_ids(), judge_modules)
+                   if is_judgeable(sid)]
+    if not force:
+        # Sessions all of whose selected judges are up to date need no requests at all
+        session_ids = [sid for sid in session_ids
+                       if not all(is_up_to_date(sid, module, model or module.MODEL)
+                                  for module in judge_modules.values())]
+    if not session_ids:
+        print("✅ Nothing to judge")
+        return
+    state = {"judges": judge_names, "sessions": session_ids, "model": model, "force": force, "round": 0,
+             "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    print(f"📦 Batch of {len(judge_names)} judges × {len(session_ids)} sessions in {batch_dir}")
+    next_round(batch_dir, state, {})
+
+
+def run_local(batch_dir, backend="responses", backend_uri=None, workers=4):
+    """Process the latest requests file with a configured backend instead of the provider
+
+    backend "responses" sends the requests with the judges' own OpenAI client;
+    hf / llama.cpp / openai answer them through StoryAgent like a routed
+    judge would (see common.set_backend), which only gets the prompt.
+    """
+    state = load_state(batch_dir)
+    if not state["round"]:
+        raise SystemExit("❌ Nothing to run")
+    requests = read_jsonl(round_file(batch_dir, "requests", state["round"]))
+
+    if backend == "responses":
+        client = common.get_client()
+
+        def respond(body):
+            resp = client.responses.create(**body)
+            usage = getattr(resp, "usage", None)
+            return (resp.output_text, getattr(usage, "input_tokens", None),
+                    getattr(usage, "output_tokens", None))
+    else:
+        common.set_backend(backend, backend_uri)
+
+        def respond(body):
+            usage = {}
+            text = common.get_agent(body["model"]).query_chat([{"role": "user", "content": body["input"]}], usage=usage)
+            return text, usage.get("input_tokens"), usage.get("output_tokens")
+
+    def process(request):
+        common.rate_limiter.wait()
+        try:
+            return result_line(request["custom_id"], *respond(request["body"]))
+        except Exception as e:
+            return result_line(request["custom_id"], error=f"{type(e).__name__}: {e}")
+
+    print(f"🖥️  Processing {len(requests)} requests with the {backend} backend, {workers} at a time...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(process, requests))
+    path = round_file(batch_dir, "results", state["round"])
+    write_jsonl(path, results)
+    failed = sum(1 for line in results if line["error"])
+    print(f"✅ Saved {len(results)} results to: {path} in {time.monotonic() - started:.1f}s"
+          + (f" ({failed} failed)" if failed else ""))
+
+
+def ingest(batch_dir, results_path=None):
+    """Add a results file to the batch, write finished evaluations and the next round"""
+    state = load_state(batch_dir)
+    results_path = results_path or round_file(batch_dir, "results", state["round"])
+    if not os.path.exists(results_path):
+        raise SystemExit(f"❌ No results file: {results_path}")
+    responses = load_responses(batch_dir)
+    added, errors = 0, 0
+    for line in read_jsonl(results_path):
+        custom_id, result = parse_result(line)
+        if isinstance(result, str):
+            # Failed requests stay missing, so they are requested again next round
+            errors += 1
+            print(f"⚠️  Request {custom_id} failed: {result}")
+            continue
+        added += custom_id not in responses
+        responses[custom_id] = {"custom_id": custom_id, **result}
+    write_jsonl(os.path.join(batch_dir, RESPONSES_FILE), responses.values())
+    print(f"📥 Ingested {added} new results from {results_path}" + (f", {errors} failed" if errors else ""))
+    next_round(batch_dir, state, responses)
+
+
+def status(batch_dir):
+    state = load_state(batch_dir)
+    responses = load_responses(batch_dir)
+    print(f"📦 {len(state['judges'])} judges × {len(state['sessions'])} sessions, round {state['round']}, "
+          f"{len(responses)} responses ingested")
+    for name, sid in state.get("pending", []):
+        print(f"⏳ {name} × session {sid}")
+    if not state.get("pending"):
+        print("🏁 Batch complete")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m judges.batch", description="Offline batch mode for the judges")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("prepare", help="write the judge requests of a set of sessions")
+    p.add_argument("batch_dir")
+    p.add_argument("sessions", nargs="*", default=["unjudged"],
+                   help="session selectors as in python -m judges (default: unjudged)")
+    p.add_argument("--judges", default=",".join(JUDGES),
+                   help=f"comma separated judges (default: {','.join(JUDGES)})")
+    p.add_argument("--model", default=None, help="override the judges' default model")
+    p.add_argument("--force", action="store_true", help="include sessions whose results are up to date")
+
+    p = commands.add_parser("run-local", help="answer the latest requests file with a configured backend")
+    p.add_argument("batch_dir")
+    common.add_backend_arguments(p)
+    p.add_argument("--workers", type=int, default=4, help="concurrent requests (default: 4)")
+    p.add_argument("--rpm", type=float, default=None, help="max requests per minute (default: unlimited)")
+
+    p = commands.add_parser("ingest", help="ingest a results file and write finished evaluations")
+    p.add_argument("batch_dir")
+    p.add_argument("results", nargs="?", default=None,
+                   help="results JSONL (default: results file of the current round)")
+
+    p = commands.add_parser("status", help="show the judge runs still waiting for results")
+    p.add_argument("batch_dir")
+
+    args = parser.parse_args()
+    if args.command == "prepare":
+        judge_names = [name.strip() for name in args.judges.split(",") if name.strip()]
+        unknown = [name for name in judge_names if name not in JUDGES]
+        if unknown:
+            parser.error(f"unknown judges: {', '.join(unknown)} (available: {', '.join(JUDGES)})")
+        prepare(args.batch_dir, args.sessions, judge_names, args.model, args.force)
+    elif args.command == "run-local":
+        common.set_rate_limit(args.rpm)
+        run_local(args.batch_dir, args.backend, args.backend_uri, args.workers)
+    elif args.command == "ingest":
+        ingest(args.batch_dir, args.results)
+    else:
+        status(args.batch_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,12 +21,367 @@ Every good story is driven by good characters.
 4. Motivation & Drive:
    - Do characters have clear wants, fears, and stakes?
    - Are their motivations driving the story forward?
+
+The story is first analyzed locally, without the model:
+- Character names come from the Characters field of the book spec
+  (parsers.book_spec) and from the Characters lines of the scene specs
+- A per-scene mention matrix and a co-occurrence matrix are built with NumPy
+- Only excerpts around each main character's key appearances (first, peak
+  and last scene) are sent to the model, together with the presence stats
+
+Usage: python judges/character_judge.py [--session ID] [--model MODEL] [--local-only]
+(or run it over many sessions with python -m judges)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+
+import numpy as np
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from goat_storytelling_agent import parsers
+from goat_storytelling_agent.prompts import book_spec_fields
+from goat_storytelling_agent.story_file import read_scenes
+from judges.chunking import estimate_tokens, excerpt
+from judges.common import cache_key, gpt5_respond_with_usage, is_cached, judge_args, load_session, step_data
+
+# === Defaults for direct runs ===
+MODEL = "gpt-5"
+SESSION_ID = "1"  # Numeric session ID (e.g., "1", "2", "3") or old format (e.g., "20251028_121006")
+# ================================
+
+OUTPUT_FILE = "character_analysis.json"
+PROMPT_VERSION = "1"  # bump when the prompt or result handling change
+
+MAX_CHARACTERS = 8    # characters (by mentions) that get excerpts in the prompt
+EXCERPT_CHARS = 1200  # characters of story text around a key appearance
+MAX_PAIRS = 12        # co-occurrence pairs listed in the prompt
+
+TITLES = {"detective", "det", "sgt", "sergeant", "dr", "doctor", "mr", "mrs", "ms", "miss", "officer",
+          "captain", "capt", "father", "sister", "brother", "lady", "lord", "sir", "professor", "prof",
+          "inspector", "agent", "judge", "aunt", "uncle"}
+# Leading run of capitalized words, e.g. "Sgt. Ben Rourke" in "Sgt. Ben Rourke—Essex County detective"
+NAME_RE = re.compile(r"[A-Z][\w'’.-]*(?:\s+[A-Z][\w'’.-]*){0,3}")
+# Entries of a Characters field: "A—desc; B—desc" or "- A, 38, desc - B, 32, desc"
+DASH_LIST_RE = re.compile(r"(?:^|\s)-\s")
+SPEC_ENTRY_SPLIT_RE = re.compile(r";|\n")
+LOWERCASE_WORD_RE = re.compile(r"\b[a-z][a-z'’-]*\b")
+SCENE_ENTRY_SPLIT_RE = re.compile(r",|;|\band\b|&")
+PARENTHESES_RE = re.compile(r"\([^)]*\)")
+
+
+def extract_name(text: str):
+    """Character name at the start of text without titles, or None"""
+    match = NAME_RE.match(text.strip())
+    if not match:
+        return None
+    words = [w for w in match.group(0).split() if w.lower().strip(".") not in TITLES]
+    words = [w.rstrip(".") if len(w) > 2 else w for w in words]
+    return " ".join(words) or None
+
+
+def parse_characters(book_spec: str, scene_specs: list, scenes: list) -> list:
+    """Characters of a story with the aliases to search for
+
+    Returns a list of {"name", "description", "aliases"} dicts, book spec
+    characters first. Names only found in scene specs are kept if none of
+    their words is used in lowercase in the story ("Two guards", "Counsel").
+    A name part is an alias only if no other character shares it (so
+    "Greystone" never counts for one family member).
+    """
+    characters_field = parsers.book_spec(book_spec, book_spec_fields).get("Characters", "")
+    entry_split = DASH_LIST_RE if DASH_LIST_RE.match(characters_field) else SPEC_ENTRY_SPLIT_RE
+    characters = {}
+    for entry in entry_split.split(characters_field):
+        name = extract_name(entry)
+        if name and name not in characters:
+            characters[name] = entry.strip()[:300]
+
+    lowercase_words = set()
+    for scene in scenes:
+        lowercase_words.update(LOWERCASE_WORD_RE.findall(scene["text"]))
+
+    def known(name):
+        return any(name == other or name in other.split() for other in characters)
+
+    for spec in scene_specs:
+        line = next((l for l in spec.split("\n") if l.lower().startswith("characters:")), "")
+        for entry in SCENE_ENTRY_SPLIT_RE.split(PARENTHESES_RE.sub("", line.partition(":")[2])):
+            name = extract_name(entry)
+            if name and not known(name) and not any(w.lower() in lowercase_words for w in name.split()):
+                characters[name] = ""
+
+    token_owners = {}
+    for name in characters:
+        for token in set(name.split()):
+            token_owners.setdefault(token, set()).add(name)
+    return [{
+        "name": name,
+        "description": description,
+        "aliases": [name] + [token for token in name.split()
+                             if token != name and len(token) > 2 and len(token_owners[token]) == 1],
+    } for name, description in characters.items()]
+
+
+def flatten_scene_specs(scene_plan: list) -> list:
+    """Scene specs of all acts in story order (index i = story scene i + 1)
+
+    Acts saved without parsed chapter_scenes (plans/5_scene_plan.json) are
+    split from their act_scenes text.
+    """
+    specs = []
+    for act in scene_plan or []:
+        chapter_scenes = act.get("chapter_scenes")
+        if chapter_scenes is None:
+            text = act.get("act_scenes", "")
+            chapter_nums = sorted({int(n) for n in parsers.SCENES_CHAPTER_RE.findall(text)})
+            try:
+                chapter_scenes = parsers.act_scenes(text, chapter_nums)
+            except KeyError:
+                chapter_scenes = {}
+        for chapter in sorted(chapter_scenes, key=lambda c: int(c) if str(c).isdigit() else 0):
+            specs.extend(chapter_scenes[chapter])
+    return specs
+
+
+def mention_matrix(characters: list, scenes: list):
+    """Counts and first offsets of character mentions per scene
+
+    One alternation regex over all aliases (longest first) is run once per
+    scene; matches are accumulated with np.add.at.
+
+    Returns (counts, first_offsets) arrays of shape (characters, scenes);
+    first_offsets is -1 where a character is not mentioned.
+    """
+    alias_owner = {}
+    for i, character in enumerate(characters):
+        for alias in character["aliases"]:
+            alias_owner.setdefault(alias, i)
+    counts = np.zeros((len(characters), len(scenes)), dtype=np.int32)
+    first_offsets = np.full((len(characters), len(scenes)), -1, dtype=np.int64)
+    if not alias_owner:
+        return counts, first_offsets
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(a) for a in sorted(alias_owner, key=len, reverse=True)) + r")\b")
+    for j, scene in enumerate(scenes):
+        matches = list(pattern.finditer(scene["text"]))
+        if not matches:
+            continue
+        owners = np.fromiter((alias_owner[m.group(0)] for m in matches), dtype=np.int64, count=len(matches))
+        starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+        np.add.at(counts[:, j], owners, 1)
+        # matches are in text order, so the first occurrence of each owner is its first offset
+        owner_ids, first = np.unique(owners, return_index=True)
+        first_offsets[owner_ids, j] = starts[first]
+    return counts, first_offsets
+
+
+def longest_absence(present: np.ndarray) -> int:
+    """Longest run of scenes without the character between two appearances"""
+    idx = np.flatnonzero(present)
+    return int(np.diff(idx).max() - 1) if len(idx) > 1 else 0
+
+
+def analyze_characters(book_spec: str, scene_specs: list, scenes: list) -> dict:
+    """Local (no model) character analysis of a story
+
+    Returns {"characters": [...], "cooccurrence": [...]} with per-character
+    presence stats, sorted by mentions, and scene co-occurrence counts.
+    """
+    characters = parse_characters(book_spec, scene_specs, scenes)
+    counts, first_offsets = mention_matrix(characters, scenes)
+    present = counts > 0
+    cooccurrence = present.astype(np.int32) @ present.T.astype(np.int32)
+
+    planned = np.zeros_like(present)
+    for j, spec in enumerate(scene_specs[:len(scenes)]):
+        line = next((l for l in spec.split("\n") if l.lower().startswith("characters:")), "")
+        for i, character in enumerate(characters):
+            planned[i, j] = any(re.search(rf"\b{re.escape(a)}\b", line) for a in character["aliases"])
+
+    scene_numbers = np.array([scene["scene"] for scene in scenes], dtype=np.int64)
+    results = []
+    for i in np.argsort(-counts.sum(axis=1), kind="stable"):
+        character = characters[i]
+        scene_idx = np.flatnonzero(present[i])
+        results.append({
+            "name": character["name"],
+            "aliases": character["aliases"],
+            "description": character["description"],
+            "mentions": int(counts[i].sum()),
+            "scenes_present": int(len(scene_idx)),
+            "first_scene": int(scene_numbers[scene_idx[0]]) if len(scene_idx) else None,
+            "peak_scene": int(scene_numbers[counts[i].argmax()]) if len(scene_idx) else None,
+            "last_scene": int(scene_numbers[scene_idx[-1]]) if len(scene_idx) else None,
+            "longest_absence": longest_absence(present[i]),
+            "planned_but_absent": scene_numbers[planned[i] & ~present[i]].tolist(),
+            "mention_counts": counts[i].tolist(),
+            "first_offsets": first_offsets[i].tolist(),
+        })
+
+    upper = np.triu_indices(len(characters), k=1)
+    pair_counts = cooccurrence[upper]
+    order = np.argsort(-pair_counts, kind="stable")
+    pairs = [{"a": characters[upper[0][k]]["name"], "b": characters[upper[1][k]]["name"],
+              "scenes": int(pair_counts[k])} for k in order if pair_counts[k] > 0]
+    return {"characters": results, "cooccurrence": pairs}
+
+
+def key_excerpts(character: dict, scenes: list) -> list:
+    """(label, scene number, excerpt) for the first, peak and last appearance"""
+    scene_pos = {scene["scene"]: j for j, scene in enumerate(scenes)}
+    result = []
+    for label in ("first", "peak", "last"):
+        number = character[f"{label}_scene"]
+        if number is None or any(number == seen for _, seen, _ in result):
+            continue
+        j = scene_pos[number]
+        result.append((label, number, excerpt(scenes[j]["text"], character["first_offsets"][j], EXCERPT_CHARS)))
+    return result
+
+
+def build_prompt(analysis: dict, scenes: list) -> str:
+    main_characters = [c for c in analysis["characters"] if c["mentions"]][:MAX_CHARACTERS]
+    sheet = "\n".join(f"- {c['name']}: {c['description'] or '(not in the book spec)'}" for c in main_characters)
+    stats = "\n".join(
+        f"- {c['name']}: {c['mentions']} mentions in {c['scenes_present']}/{len(scenes)} scenes "
+        f"(first {c['first_scene']}, last {c['last_scene']}, longest absence {c['longest_absence']} scenes"
+        + (f", planned but absent in scenes {c['planned_but_absent']}" if c["planned_but_absent"] else "") + ")"
+        for c in main_characters)
+    main_names = {c["name"] for c in main_characters}
+    main_pairs = [p for p in analysis["cooccurrence"] if p["a"] in main_names and p["b"] in main_names]
+    pairs = "\n".join(f"- {p['a']} & {p['b']}: {p['scenes']} scenes" for p in main_pairs[:MAX_PAIRS])
+    excerpts = "\n\n".join(f"[{c['name']} - scene {number}, {label} appearance]\n{text}"
+                           for c in main_characters for label, number, text in key_excerpts(c, scenes))
+    return f"""
+You are a character judge. Evaluate the main characters of a story for consistency of motivation,
+psychological realism, depth and how their wants, fears and stakes drive the story.
+You are given the character sheet, presence statistics computed over all {len(scenes)} scenes,
+and excerpts around each character's first, peak and last appearance instead of the full story.
+Return JSON: {{characters:[{{name, motivation_clarity, consistency, psychological_realism, depth, issues:[], score}}], strengths, weaknesses, score}}
+
+Character sheet:
+{sheet}
+
+Presence:
+{stats}
+
+Scenes shared:
+{pairs}
+
+Excerpts:
+{excerpts}
 """
 
-# TODO: Implement character evaluation
-# - Extract character information from story and logs
-# - Evaluate consistency across scenes
-# - Assess psychological realism of character actions
-# - Evaluate character depth and nuance
-# - Return detailed character analysis
 
+def load_specs(sess_dir: str, log: dict):
+    """Book spec and scene specs of a session
+
+    Taken from the generation log steps, else from the plans/ files that
+    sessions saved without those steps keep them in.
+    """
+    book_spec = (step_data(log, "enhance_book_spec_success").get("enhanced_spec")
+                 or step_data(log, "init_book_spec_success").get("book_spec", ""))
+    scene_plan = step_data(log, "split_chapters_into_scenes_success").get("scene_plan")
+    plans_dir = os.path.join(sess_dir, "plans")
+    for filename in ("2_enhanced_book_spec.txt", "1_initial_book_spec.txt"):
+        path = os.path.join(plans_dir, filename)
+        if not book_spec and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                book_spec = f.read()
+    path = os.path.join(plans_dir, "5_scene_plan.json")
+    if not scene_plan and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            scene_plan = json.load(f)
+        if isinstance(scene_plan, dict):
+            scene_plan = scene_plan.get("acts", [])
+    return book_spec, flatten_scene_specs(scene_plan)
+
+
+def build_prompts(session_id: str):
+    """Load a session, run the local analysis and build the judge prompt
+
+    Returns (sess_dir, prompts, analysis, story_tokens).
+    """
+    sess_dir, log, story = load_session(session_id)
+    book_spec, scene_specs = load_specs(sess_dir, log)
+    scenes = read_scenes(os.path.join(sess_dir, "final_story.txt"))
+    analysis = analyze_characters(book_spec, scene_specs, scenes)
+    return sess_dir, {"character": build_prompt(analysis, scenes)}, analysis, estimate_tokens(story)
+
+
+def session_cache_key(session_id: str, model: str = MODEL) -> str:
+    return cache_key(build_prompts(session_id)[1], PROMPT_VERSION, model)
+
+
+def judge_session(session_id: str, model: str = MODEL, force: bool = False, local_only: bool = False) -> str:
+    """Run the character analysis of one session, return the output path
+
+    With local_only the model is not called and the output only holds the
+    local analysis. Skipped when the existing output was produced from the
+    same prompt, prompt version and model, unless force is set.
+    """
+    print(f"🎭 Character Judge - session {session_id}")
+    started = time.monotonic()
+    sess_dir, prompts, analysis, story_tokens = build_prompts(session_id)
+    local_seconds = time.monotonic() - started
+    prompt_tokens = estimate_tokens(prompts["character"])
+    print(f"- Local analysis: {len(analysis['characters'])} characters in {local_seconds:.2f}s, "
+          f"prompt ~{prompt_tokens} tokens instead of ~{story_tokens} for the full story")
+
+    out_path = os.path.join(sess_dir, OUTPUT_FILE)
+    key = None if local_only else cache_key(prompts, PROMPT_VERSION, model)
+    if key and not force and is_cached(out_path, key):
+        print(f"♻️  Up to date, skipping (use --force to rerun): {out_path}")
+        return out_path
+
+    metrics = {"local_seconds": round(local_seconds, 3),
+               "prompt_tokens_estimate": prompt_tokens,
+               "story_tokens_estimate": story_tokens}
+    analysis_text = None
+    skipped = None
+    if not analysis["characters"]:
+        # The prompt would have nothing to judge
+        skipped = "no characters found in the book spec, scene plan or story"
+        print(f"⚠️  Skipping the model call: {skipped}")
+        key = None
+    elif not local_only:
+        print("- Evaluating characters...")
+        analysis_text, call_metrics = gpt5_respond_with_usage(prompts["character"], model)
+        metrics.update(call_metrics)
+
+    result = {
+        "session_id": session_id,
+        "model": None if local_only or skipped else model,
+        "analysis": analysis_text,
+        "skipped": skipped,
+        "characters": [{k: v for k, v in c.items() if k not in ("mention_counts", "first_offsets")}
+                       for c in analysis["characters"]],
+        "mention_matrix": {c["name"]: c["mention_counts"] for c in analysis["characters"]},
+        "cooccurrence": analysis["cooccurrence"],
+        "metrics": metrics,
+        "cache_key": key,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"✅ Saved character analysis to: {out_path}")
+    return out_path
+
+
+def main():
+    def add_arguments(parser):
+        parser.add_argument("--local-only", action="store_true",
+                            help="only run the local mention analysis, without calling the model")
+
+    args = judge_args("Character & motivation judge", SESSION_ID, MODEL, add_arguments)
+    judge_session(args.session, args.model, args.force, args.local_only)
+
+
+if __name__ == "__main__":
+    main()
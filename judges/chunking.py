@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Map-reduce helpers for judging stories that do not fit in one prompt
+- Packs final_story.txt into chunks on scene boundaries under a token budget
+- Evaluates the chunks concurrently, then merges the partial results with one reduce call
+
+A story that fits the budget is a single chunk and costs a single call, so
+short stories are judged exactly as before.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from goat_storytelling_agent.story_file import StoryReader, scene_marker
+from judges.common import CHUNK_TOKENS, MAP_WORKERS, gpt5_respond_with_usage
+
+CHARS_PER_TOKEN = 4  # rough estimate for English prose
+
+REDUCE_PROMPT = """
+You are merging evaluations of consecutive parts of ONE story into a single evaluation of the whole story.
+Judge the story as a whole: merge lists without duplicates, keep observations that span several parts,
+and re-assess any scores for the complete story instead of averaging them.
+{instructions}
+
+{parts}
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_scenes(scenes, max_tokens: int, max_scenes: int = None) -> list:
+    """Groups consecutive scenes into lists of at most max_tokens (and max_scenes)
+
+    A scene larger than the budget becomes a group of its own; scenes are
+    never split.
+    """
+    groups, current, tokens = [], [], 0
+    for scene in scenes:
+        scene_tokens = estimate_tokens(scene["text"])
+        if current and (tokens + scene_tokens > max_tokens or (max_scenes and len(current) >= max_scenes)):
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(scene)
+        tokens += scene_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def scenes_text(scenes: list) -> str:
+    """Scenes joined with the SCENE separators of final_story.txt"""
+    return "".join(scene_marker(s["scene"]) + s["text"] + "\n" for s in scenes).strip("\n")
+
+
+def story_chunks(sess_dir: str, max_tokens: int = CHUNK_TOKENS):
+    """Packs consecutive scenes of a session's story into chunks of at most max_tokens
+
+    Always returns at least one chunk.
+
+    Returns a list of {"first_scene", "last_scene", "text"} dicts.
+    """
+    with StoryReader(os.path.join(sess_dir, "final_story.txt")) as story:
+        groups = pack_scenes(story.scenes(), max_tokens)
+    chunks = [{"first_scene": group[0]["scene"], "last_scene": group[-1]["scene"],
+               "text": scenes_text(group)} for group in groups]
+    return chunks or [{"first_scene": None, "last_scene": None, "text": ""}]
+
+
+def excerpt(text: str, offset: int, size: int) -> str:
+    """About size characters of text around offset, cut at whitespace"""
+    start = max(0, offset - size // 3)
+    end = min(len(text), start + size)
+    if start > 0:
+        start = text.find(" ", start) + 1 or start
+    if end < len(text):
+        cut = text.rfind(" ", start, end)
+        end = cut if cut > start else end
+    return ("…" if start > 0 else "") + text[start:end].strip() + ("…" if end < len(text) else "")
+
+
+def part_header(index: int, chunks: list) -> str:
+    """Note prepended to map prompts when a story spans several chunks ('' otherwise)"""
+    if len(chunks) == 1:
+        return ""
+    chunk = chunks[index]
+    return (f"NOTE: This is part {index + 1} of {len(chunks)} of the story "
+            f"(scenes {chunk['first_scene']}-{chunk['last_scene']}). Evaluate only this part; "
+            f"the evaluations of all parts are merged afterwards.\n\n")
+
+
+def _total(metrics: list, key: str):
+    values = [m.get(key) for m in metrics]
+    return sum(values) if values and all(v is not None for v in values) else None
+
+
+def map_reduce(map_prompts: list, reduce_instructions: str, model: str, workers: int = MAP_WORKERS):
+    """Runs one prompt per chunk concurrently and merges the responses
+
+    Parameters
+    ----------
+    map_prompts : list of str
+        One prompt per chunk, in story order
+    reduce_instructions : str
+        What the merged result must look like (usually the map output schema)
+    model : str
+    workers : int
+        Max concurrent map calls
+
+    Returns
+    -------
+    (str, dict)
+        Merged response and metrics (wall time, summed token usage,
+        number of chunks and calls)
+    """
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(map_prompts)))) as pool:
+        # Submitted up front so every chunk is requested even if one fails
+        # (batch mode records all map calls of a round this way, see judges/batch.py)
+        futures = [pool.submit(gpt5_respond_with_usage, prompt, model) for prompt in map_prompts]
+        responses = [future.result() for future in futures]
+    call_metrics = [metrics for _, metrics in responses]
+
+    if len(responses) == 1:
+        text = responses[0][0]
+    else:
+        parts = "\n\n".join(f"=== Evaluation of part {i} of {len(responses)} ===\n{response}"
+                            for i, (response, _) in enumerate(responses, start=1))
+        reduce_prompt = REDUCE_PROMPT.format(instructions=reduce_instructions, parts=parts)
+        text, metrics = gpt5_respond_with_usage(reduce_prompt, model)
+        call_metrics.append(metrics)
+
+    return text, {
+        "latency_seconds": round(time.monotonic() - started, 3),
+        "input_tokens": _total(call_metrics, "input_tokens"),
+        "output_tokens": _total(call_metrics, "output_tokens"),
+        "chunks": len(map_prompts),
+        "calls": len(call_metrics),
+    }
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the judge scripts
+- Lazy OpenAI client (the API key is only required once a judge actually runs)
+- Optional routing through the StoryAgent backends (hf, llama.cpp, openai)
+- Process-wide rate limiting of model calls
+- Session loading and command line arguments
+- Result caching keyed by the prompts sent, the prompt version and the model
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+LOGS_DIR = os.path.join(PROJECT_ROOT, "story_generation_logs")
+
+# Long stories are judged in chunks (see judges/chunking.py)
+CHUNK_TOKENS = 24000  # story tokens per chunk prompt (estimated, template not included)
+MAP_WORKERS = 8       # concurrent model calls per judge run
+
+# Context size for the hf and llama.cpp backends, which generate up to this
+# many tokens minus the prompt, so it has to fit a full chunk prompt. The
+# openai backend sends max_tokens as the output cap, so it keeps the StoryAgent
+# default there (models like gpt-4o reject 32768).
+BACKEND_MAX_TOKENS = 32768
+CONTEXT_SIZE_BACKENDS = ("hf", "llama.cpp")
+JUDGE_BACKENDS = ["responses", "hf", "llama.cpp", "openai"]
+
+_client = None
+_client_lock = threading.Lock()
+_backend = None   # {"backend", "backend_uri", "max_tokens"} when routed through StoryAgent
+_agents = {}      # model -> StoryAgent
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `per_minute` start in any minute"""
+
+    def __init__(self, per_minute=None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = RateLimiter()
+
+
+def set_rate_limit(per_minute):
+    """Limit model calls of all judges in this process to per_minute (None = unlimited)"""
+    global rate_limiter
+    rate_limiter = RateLimiter(per_minute)
+
+
+def set_client(client):
+    """Route all judge model calls of this process through client (e.g. batch replay)"""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("Please set OPENAI_API_KEY environment variable (you can use a .env file)")
+            from openai import OpenAI
+            _client = OpenAI(api_key=api_key)
+    return _client
+
+
+def set_backend(backend: str = None, backend_uri: str = None, max_tokens: int = None):
+    """Send judge prompts through a StoryAgent backend instead of the OpenAI responses API
+
+    Parameters
+    ----------
+    backend : str
+        hf, llama.cpp or openai; None or "responses" restores the default
+    backend_uri : str
+        Endpoint of the hf / llama.cpp server, API key for openai
+        (default: OPENAI_API_KEY)
+    max_tokens : int
+        max_tokens passed to StoryAgent (default: BACKEND_MAX_TOKENS for hf and
+        llama.cpp, the StoryAgent default for openai)
+    """
+    global _backend
+    with _client_lock:
+        _agents.clear()
+        if backend in (None, "responses"):
+            _backend = None
+            return
+        if backend not in JUDGE_BACKENDS:
+            raise ValueError(f"Unknown judge backend: {backend}")
+        if backend == "openai" and not backend_uri:
+            backend_uri = os.getenv("OPENAI_API_KEY")
+        if not backend_uri:
+            raise ValueError(f"The {backend} judge backend needs a backend URI")
+        if max_tokens is None and backend in CONTEXT_SIZE_BACKENDS:
+            max_tokens = BACKEND_MAX_TOKENS
+        _backend = {"backend": backend, "backend_uri": backend_uri, "max_tokens": max_tokens}
+
+
+def backend_name():
+    """Name of the StoryAgent backend judges are routed through (None = responses API)"""
+    return _backend["backend"] if _backend else None
+
+
+def get_agent(model: str):
+    """StoryAgent of the configured backend for model, created on first use"""
+    with _client_lock:
+        if model not in _agents:
+            from goat_storytelling_agent.storytelling_agent import StoryAgent
+            options = {"max_tokens": _backend["max_tokens"]} if _backend["max_tokens"] else {}
+            _agents[model] = StoryAgent(_backend["backend_uri"], backend=_backend["backend"],
+                                        model=model, **options)
+        return _agents[model]
+
+
+def request_body(prompt: str, model: str) -> dict:
+    """Parameters of the Responses API request a judge prompt is sent with"""
+    return {
+        "model": model,
+        "input": prompt.strip(),
+        "reasoning": {"effort": "low"},
+        "text": {"verbosity": "low"},
+    }
+
+
+def gpt5_respond_with_usage(prompt: str, model: str):
+    """Like gpt5_respond, also returns latency and token usage of the call"""
+    rate_limiter.wait()
+    started = time.monotonic()
+    if _backend is not None:
+        # StoryAgent retries failed calls itself
+        usage = {}
+        text = get_agent(model).query_chat([{"role": "user", "content": prompt.strip()}], usage=usage)
+        return text, {"latency_seconds": round(time.monotonic() - started, 3),
+                      "input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")}
+    resp = get_client().responses.create(**request_body(prompt, model))
+    usage = getattr(resp, "usage", None)
+    metrics = {
+        "latency_seconds": round(time.monotonic() - started, 3),
+        "input_tokens": getattr(usage, "input_tokens", None),
+        "output_tokens": getattr(usage, "output_tokens", None),
+    }
+    return resp.output_text, metrics
+
+
+def gpt5_respond(prompt: str, model: str) -> str:
+    return gpt5_respond_with_usage(prompt, model)[0]
+
+
+def session_dir(session_id: str) -> str:
+    return os.path.join(LOGS_DIR, f"session_{session_id}")
+
+
+def load_session(session_id: str):
+    """Load a session by ID (supports both numeric and old timestamp formats)"""
+    sess_dir = session_dir(session_id)
+    log_path = os.path.join(sess_dir, "generation_log.json")
+    story_path = os.path.join(sess_dir, "final_story.txt")
+    with open(log_path, "r", encoding="utf-8") as f:
+        log = json.load(f)
+    with open(story_path, "r", encoding="utf-8") as f:
+        story = f.read()
+    return sess_dir, log, story
+
+
+def step_data(log: dict, step: str) -> dict:
+    """Data of the last generation log step with this name ({} if absent)"""
+    data = {}
+    for s in log.get("steps", []):
+        if s.get("step") == step:
+            data = s.get("data", {})
+    return data
+
+
+def cache_key(prompts: dict, prompt_version: str, model: str) -> str:
+    """Hash of everything that determines a judge's output
+
+    The prompts embed the session inputs the judge consumed (story, specs,
+    plans) as well as the template text; prompt_version covers changes in
+    how responses are post-processed. Results from a StoryAgent backend
+    are keyed by its name as well, the same model name can mean a
+    different model there.
+    """
+    fields = {"prompts": prompts, "prompt_version": prompt_version, "model": model}
+    if backend_name():
+        fields["backend"] = backend_name()
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cached(output_path: str, key: str) -> bool:
+    """True if output_path holds a result produced for exactly this cache key"""
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("cache_key") == key
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def parse_json_response(text: str):
+    """Parse a model response that should be a JSON object (fences and chatter tolerated)"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("No JSON object in response")
+    return json.loads(text[start:end + 1])
+
+
+def add_backend_arguments(parser):
+    """--backend / --backend-uri options, defaults from JUDGE_BACKEND / JUDGE_BACKEND_URI"""
+    parser.add_argument("--backend", choices=JUDGE_BACKENDS, default=os.getenv("JUDGE_BACKEND", "responses"),
+                        help="responses = OpenAI responses API, or a StoryAgent backend (default: responses)")
+    parser.add_argument("--backend-uri", default=os.getenv("JUDGE_BACKEND_URI"),
+                        help="endpoint of the hf / llama.cpp server, API key for openai")
+
+
+def judge_args(description: str, default_session: str, default_model: str, add_arguments=None):
+    """Parse the arguments shared by all judge scripts and configure the backend
+
+    add_arguments(parser) can register judge specific options.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--session", default=default_session,
+                        help=f"session ID, e.g. 1 or 20251028_121006 (default: {default_session})")
+    parser.add_argument("--model", default=default_model,
+                        help=f"model to judge with (default: {default_model})")
+    parser.add_argument("--force", action="store_true",
+                        help="judge again even if the cached result is up to date")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS,
+                        help=f"story tokens per chunk for long stories (default: {CHUNK_TOKENS})")
+    parser.add_argument("--workers", type=int, default=MAP_WORKERS,
+                        help=f"concurrent model calls per judge run (default: {MAP_WORKERS})")
+    add_backend_arguments(parser)
+    if add_arguments:
+        add_arguments(parser)
+    args = parser.parse_args()
+    set_backend(args.backend, args.backend_uri)
+    return args
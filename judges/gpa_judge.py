@@ -2,53 +2,35 @@
 """
 Simple GPA evaluation script in the same style as example_openai.py
 - Reads a given session's generation_log.json and final_story.txt
-- Runs three GPT-5 evaluations: Goal, Plan, Action
+- Runs three GPT-5 evaluations concurrently: Goal, Plan, Action
+- Long stories are judged for Action in scene-aligned chunks and merged (judges/chunking.py)
 - Saves results to story_generation_logs/session_<id>/gpa_evaluation.json
+
+Usage: python judges/gpa_judge.py [--session ID] [--model MODEL]
+(or run it over many sessions with python -m judges)
 """
 
 import os
+import sys
 import json
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Get project root (one level up from judges/)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
 
-# === Configure here ===
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("Please set OPENAI_API_KEY environment variable (you can use a .env file)")
+from judges.chunking import map_reduce, part_header, story_chunks
+from judges.common import CHUNK_TOKENS, MAP_WORKERS, cache_key, gpt5_respond_with_usage, is_cached, judge_args, load_session
 
+# === Defaults for direct runs ===
 MODEL = "gpt-5"
 SESSION_ID = "1"  # Numeric session ID (e.g., "1", "2", "3") or old format (e.g., "20251028_121006")
-# =======================
-
-
-def gpt5_respond(prompt: str) -> str:
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.responses.create(
-        model=MODEL,
-        input=prompt.strip(),
-        reasoning={"effort": "low"},
-        text={"verbosity": "low"},
-    )
-    return resp.output_text
+# ================================
 
-
-def load_session(session_id: str):
-    """Load a session by ID (supports both numeric and old timestamp formats)"""
-    sess_dir = os.path.join(PROJECT_ROOT, "story_generation_logs", f"session_{session_id}")
-    log_path = os.path.join(sess_dir, "generation_log.json")
-    story_path = os.path.join(sess_dir, "final_story.txt")
-    with open(log_path, "r", encoding="utf-8") as f:
-        log = json.load(f)
-    with open(story_path, "r", encoding="utf-8") as f:
-        story = f.read()
-    return sess_dir, log, story
+OUTPUT_FILE = "gpa_evaluation.json"
+PROMPT_VERSION = "2"  # bump when the prompts or result handling change
 
 
 def extract_artifacts(log: dict):
@@ -103,48 +85,94 @@ ScenePlan:
 """
 
 
-def build_action_prompt(scene_plan: str, story_text: str) -> str:
-    return f"""
+ACTION_SCHEMA = "{scene_function_pass_rate, stakes_clarity, friction, uncashed_setups:[], procedure_issues:[], motif_payoffs:{}, suggestions:[], score}"
+
+
+def build_action_prompt(scene_plan: str, story_text: str, header: str = "") -> str:
+    return header + f"""
 You are a trajectory judge. Evaluate the ACTION (written scenes) for decision pressure, stakes escalation, and plot friction.
-Return JSON: {{scene_function_pass_rate, stakes_clarity, friction, uncashed_setups:[], procedure_issues:[], motif_payoffs:{{}}, suggestions:[], score}}
+Return JSON: {ACTION_SCHEMA}
 
 ScenePlan:
 {scene_plan}
 
-Story (excerpt OK if long):
-{story_text[:24000]}
+Story:
+{story_text}
 """
 
 
-def main():
-    print("🧪 GPA Evaluation (Goal / Plan / Action)")
-    sess_dir, log, story = load_session(SESSION_ID)
+def build_prompts(session_id: str, chunk_tokens: int = CHUNK_TOKENS):
+    """Load a session and build its Goal / Plan / Action prompts
+
+    "action" is a list with one prompt per story chunk.
+    """
+    sess_dir, log, story = load_session(session_id)
 
     topic = log.get("topic") or next((s.get("data", {}).get("topic") for s in log.get("steps", []) if s.get("step") == "generate_story_start"), "")
     book_spec, enhanced_spec, enhanced_plan_text, scene_plan_text = extract_artifacts(log)
+    chunks = story_chunks(sess_dir, chunk_tokens)
 
-    goal_prompt = build_goal_prompt(topic, book_spec, enhanced_spec)
-    plan_prompt = build_plan_prompt(enhanced_plan_text, scene_plan_text)
-    action_prompt = build_action_prompt(scene_plan_text, story)
-
-    print("- Evaluating Goal...")
-    goal_json = gpt5_respond(goal_prompt)
-    print("- Evaluating Plan...")
-    plan_json = gpt5_respond(plan_prompt)
-    print("- Evaluating Action...")
-    action_json = gpt5_respond(action_prompt)
+    prompts = {
+        "goal": build_goal_prompt(topic, book_spec, enhanced_spec),
+        "plan": build_plan_prompt(enhanced_plan_text, scene_plan_text),
+        "action": [build_action_prompt(scene_plan_text, chunk["text"], part_header(i, chunks))
+                   for i, chunk in enumerate(chunks)],
+    }
+    return sess_dir, prompts
+
+
+def session_cache_key(session_id: str, model: str = MODEL, chunk_tokens: int = CHUNK_TOKENS) -> str:
+    return cache_key(build_prompts(session_id, chunk_tokens)[1], PROMPT_VERSION, model)
+
+
+def judge_session(session_id: str, model: str = MODEL, force: bool = False,
+                  chunk_tokens: int = CHUNK_TOKENS, workers: int = MAP_WORKERS) -> str:
+    """Run the GPA evaluation of one session, return the output path
+
+    Skipped when the existing output was produced from the same prompts,
+    prompt version and model, unless force is set.
+    """
+    print(f"🧪 GPA Evaluation (Goal / Plan / Action) - session {session_id}")
+    sess_dir, prompts = build_prompts(session_id, chunk_tokens)
+    key = cache_key(prompts, PROMPT_VERSION, model)
+    out_path = os.path.join(sess_dir, OUTPUT_FILE)
+    if not force and is_cached(out_path, key):
+        print(f"♻️  Up to date, skipping (use --force to rerun): {out_path}")
+        return out_path
+
+    # The three evaluations are independent, so they run concurrently;
+    # Action additionally fans out over the story chunks
+    print(f"- Evaluating Goal, Plan and Action ({len(prompts['action'])} story chunks)...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        futures = {name: pool.submit(gpt5_respond_with_usage, prompts[name], model)
+                   for name in ("goal", "plan")}
+        futures["action"] = pool.submit(map_reduce, prompts["action"],
+                                        f"Return JSON: {ACTION_SCHEMA}", model, workers)
+        responses = {name: future.result() for name, future in futures.items()}
 
     result = {
-        "session_id": SESSION_ID,
-        "goal": goal_json,
-        "plan": plan_json,
-        "action": action_json,
+        "session_id": session_id,
+        "goal": responses["goal"][0],
+        "plan": responses["plan"][0],
+        "action": responses["action"][0],
+        "metrics": {
+            "wall_seconds": round(time.monotonic() - started, 3),
+            **{name: metrics for name, (_, metrics) in responses.items()},
+        },
+        "model": model,
+        "cache_key": key,
     }
 
-    out_path = os.path.join(sess_dir, "gpa_evaluation.json")
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
     print(f"✅ Saved GPA evaluation to: {out_path}")
+    return out_path
+
+
+def main():
+    args = judge_args("GPA (Goal / Plan / Action) judge", SESSION_ID, MODEL)
+    judge_session(args.session, args.model, args.force, args.chunk_tokens, args.workers)
 
 
 if __name__ == "__main__":
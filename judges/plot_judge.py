@@ -19,12 +19,283 @@ Evaluates plot structure, context management, and cliché usage.
    - Could benefit from story templates and instructions to neatly deviate from them
    - Are there fresh takes on familiar tropes?
    - Is the structure too formulaic or does it have unique elements?
+
+Setups and payoffs are first tracked locally, without the model:
+- Every scene becomes a sparse TF-IDF vector over words and names
+- Terms introduced with weight in a scene that come back after a gap are
+  payoff candidates; terms that vanish right after their introduction are
+  dangling setup candidates
+- The model only verifies these candidates from short excerpts and the scene
+  plan instead of reading the whole book
+
+Usage: python judges/plot_judge.py [--session ID] [--model MODEL] [--local-only]
+(or run it over many sessions with python -m judges)
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+from collections import Counter, defaultdict
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from goat_storytelling_agent.story_file import read_scenes
+from judges.chunking import estimate_tokens, excerpt
+from judges.common import cache_key, gpt5_respond_with_usage, is_cached, judge_args, load_session, step_data
+
+# === Defaults for direct runs ===
+MODEL = "gpt-5"
+SESSION_ID = "1"  # Numeric session ID (e.g., "1", "2", "3") or old format (e.g., "20251028_121006")
+# ================================
+
+OUTPUT_FILE = "plot_analysis.json"
+PROMPT_VERSION = "1"  # bump when the prompt or result handling change
+
+MAX_CANDIDATES = 20      # payoff and dangling candidates each
+MAX_DF_FRACTION = 0.3    # terms in more scenes than this are background, not setups
+MIN_SETUP_COUNT = 2      # occurrences in the introducing scene
+EXCERPT_CHARS = 400
+
+# Words without possessive 's; contractions ("I’ll") keep their apostrophe so
+# that is_contraction can drop them, capitalized or not
+WORD_RE = re.compile(r"[A-Za-z][a-z'’-]*?[a-z](?=['’]s\b)|[A-Za-z][a-z'’-]*[a-z]|[A-Z]{2,}")
+STOPWORDS = set("""
+about above after again against all almost along already also although always among and another any
+anything are around as at away back be because been before behind being below between both but by
+came can could did does doing done down during each either else enough even ever every everything few
+for from further get gets getting go goes going gone got had has have having he her here hers herself
+him himself his how however if in into is it its itself just keep kept know knew known last least less
+let like little look looked looking made make many may maybe me might more most much must my myself
+near need never next no nor not nothing now of off often on once one only onto or other others our ours
+out over own perhaps put rather really right said same saw say says see seemed seen she should since so
+some something still such take taken than that the their theirs them themselves then there these they
+thing things this those though through thought to together too took toward towards under until up upon
+us very was way we well went were what when where whether which while who whom whose why will with
+within without would yet you your yours
+""".split())
+
+
+def is_contraction(word: str) -> bool:
+    return "'" in word or "’" in word
+
+
+def word_term(word: str, proper_nouns: set):
+    """Term a word counts as: lowercased content word or proper noun, None when it is skipped"""
+    if is_contraction(word):
+        return None
+    if word in proper_nouns:
+        return word
+    lower = word.lower()
+    return lower if len(lower) > 2 and lower not in STOPWORDS else None
+
+
+def tfidf_postings(scenes: list):
+    """Sparse TF-IDF of a story
+
+    Capitalized words never used in lowercase anywhere in the story count as
+    names and keep their case. Words are counted once per scene and each
+    distinct word is mapped to its term once.
+
+    Returns (postings, scene_lengths, idf): postings maps each term to
+    {scene index: count} in scene order, scene_lengths are the number of
+    terms of each scene and idf maps each term to its IDF. The weight of a
+    term in a scene is count / scene_lengths[scene] * idf[term].
+    """
+    word_counts = [Counter(WORD_RE.findall(scene["text"])) for scene in scenes]
+    lowercase_words, capitalized_words = set(), set()
+    for counts in word_counts:
+        for word in counts:
+            (capitalized_words if word[0].isupper() else lowercase_words).add(word)
+    proper_nouns = {word for word in capitalized_words
+                    if word.lower() not in lowercase_words and not is_contraction(word)}
+
+    terms = {}
+    postings = defaultdict(dict)
+    scene_lengths = []
+    for j, counts in enumerate(word_counts):
+        length = 0
+        for word, count in counts.items():
+            if word not in terms:
+                terms[word] = word_term(word, proper_nouns)
+            term = terms[word]
+            if term is not None:
+                postings[term][j] = postings[term].get(j, 0) + count
+                length += count
+        scene_lengths.append(max(length, 1))
+    n_scenes = len(scenes)
+    idf = {term: math.log((1 + n_scenes) / (1 + len(posting))) + 1 for term, posting in postings.items()}
+    return postings, scene_lengths, idf
+
+
+def find_setups(scenes: list) -> dict:
+    """Candidate setups and payoffs of a story (no model)
+
+    A setup is a term that is not background (in at most MAX_DF_FRACTION of
+    the scenes) and occurs at least MIN_SETUP_COUNT times in the scene that
+    introduces it. It is a payoff candidate when it returns at least
+    min_gap scenes later, and dangling when it never appears again after
+    that although the story went on for min_gap more scenes.
+
+    Only the postings of the terms passing the setup filters are scored.
+
+    Returns {"paid_off": [...], "dangling": [...], "min_gap": int}, each
+    list sorted by the TF-IDF weight of the introduction.
+    """
+    n_scenes = len(scenes)
+    postings, scene_lengths, idf = tfidf_postings(scenes)
+    min_gap = max(2, n_scenes // 10)
+    max_df = max(2, MAX_DF_FRACTION * n_scenes)
+    scene_numbers = [scene["scene"] for scene in scenes]
+
+    paid_off, dangling = [], []
+    for term, posting in postings.items():
+        if len(posting) > max_df:
+            continue
+        first = next(iter(posting))
+        if posting[first] < MIN_SETUP_COUNT:
+            continue
+        last = next(reversed(posting))
+        entry = {
+            "term": term,
+            "setup_scene": scene_numbers[first],
+            "setup_weight": posting[first] / scene_lengths[first] * idf[term],
+            "scenes_present": len(posting),
+            "last_scene": scene_numbers[last],
+        }
+        # Strongest recurrence at least min_gap scenes after the introduction
+        payoff, payoff_weight = None, 0
+        for j, count in posting.items():
+            weight = count / scene_lengths[j] * idf[term]
+            if j >= first + min_gap and weight > payoff_weight:
+                payoff, payoff_weight = j, weight
+        if payoff is not None:
+            paid_off.append({**entry, "payoff_scene": scene_numbers[payoff],
+                             "payoff_weight": round(payoff_weight, 4), "gap": payoff - first})
+        if last - first < min_gap and first + min_gap < n_scenes:
+            dangling.append(entry)
+
+    def ranked(entries):
+        entries = sorted(entries, key=lambda entry: (-entry["setup_weight"], entry["term"]))[:MAX_CANDIDATES]
+        for entry in entries:
+            entry["setup_weight"] = round(entry["setup_weight"], 4)
+        return entries
+
+    return {"paid_off": ranked(paid_off), "dangling": ranked(dangling), "min_gap": min_gap}
+
+
+def term_excerpt(scenes: list, scene_number: int, term: str) -> str:
+    text = next(scene["text"] for scene in scenes if scene["scene"] == scene_number)
+    flags = 0 if term[0].isupper() else re.IGNORECASE
+    match = re.search(rf"\b{re.escape(term)}\b", text, flags)
+    return excerpt(text, match.start() if match else 0, EXCERPT_CHARS)
+
+
+def build_prompt(candidates: dict, scenes: list, chapter_summaries: list) -> str:
+    paid_off = "\n\n".join(
+        f"[{c['term']}] setup in scene {c['setup_scene']}: {term_excerpt(scenes, c['setup_scene'], c['term'])}\n"
+        f"  returns in scene {c['payoff_scene']}: {term_excerpt(scenes, c['payoff_scene'], c['term'])}"
+        for c in candidates["paid_off"])
+    dangling = "\n\n".join(
+        f"[{c['term']}] introduced in scene {c['setup_scene']}, never mentioned after scene {c['last_scene']}: "
+        f"{term_excerpt(scenes, c['setup_scene'], c['term'])}"
+        for c in candidates["dangling"])
+    outline = "\n".join(f"- {summary}" for summary in chapter_summaries) or "(no scene plan)"
+    return f"""
+You are a plot judge. A local analysis of a {len(scenes)}-scene story found candidate setups that come back later
+(possible payoffs / callbacks / Chekhov's guns) and setups that vanish right after their introduction.
+Verify the candidates from the excerpts: keep only real narrative setups, judge whether each payoff is earned,
+and whether each vanished setup is a loose end. Then judge plot sophistication, context management and clichés
+from the chapter outline and the excerpts.
+Return JSON: {{verified_payoffs:[{{term, setup_scene, payoff_scene, effective, note}}], loose_ends:[{{term, setup_scene, note}}], plot_sophistication, context_management, cliches, suggestions:[], score}}
+
+Chapter outline:
+{outline}
+
+Setups that return later:
+{paid_off or "(none found)"}
+
+Setups that vanish:
+{dangling or "(none found)"}
 """
 
-# TODO: Implement plot evaluation
-# - Analyze plot structure and sophistication
-# - Track context/callbacks/chekov's guns throughout the story
-# - Evaluate cliché usage and freshness
-# - Assess template adherence and deviation
-# - Return plot analysis and suggestions
 
+def build_prompts(session_id: str):
+    """Load a session, find setup/payoff candidates and build the judge prompt
+
+    Returns (sess_dir, prompts, candidates, analysis_seconds, story_tokens).
+    """
+    sess_dir, log, story = load_session(session_id)
+    scenes = read_scenes(os.path.join(sess_dir, "final_story.txt"))
+    started = time.monotonic()
+    candidates = find_setups(scenes)
+    analysis_seconds = time.monotonic() - started
+    scene_plan = step_data(log, "split_chapters_into_scenes_success").get("scene_plan") or []
+    chapter_summaries = [chapter for act in scene_plan for chapter in act.get("chapters", [])]
+    prompts = {"plot": build_prompt(candidates, scenes, chapter_summaries)}
+    return sess_dir, prompts, candidates, analysis_seconds, estimate_tokens(story)
+
+
+def session_cache_key(session_id: str, model: str = MODEL) -> str:
+    return cache_key(build_prompts(session_id)[1], PROMPT_VERSION, model)
+
+
+def judge_session(session_id: str, model: str = MODEL, force: bool = False, local_only: bool = False) -> str:
+    """Run the plot analysis of one session, return the output path
+
+    With local_only the model is not called and the output only holds the
+    setup/payoff candidates. Skipped when the existing output was produced
+    from the same prompt, prompt version and model, unless force is set.
+    """
+    print(f"🧩 Plot Judge - session {session_id}")
+    sess_dir, prompts, candidates, analysis_seconds, story_tokens = build_prompts(session_id)
+    prompt_tokens = estimate_tokens(prompts["plot"])
+    print(f"- Local analysis: {len(candidates['paid_off'])} payoff and {len(candidates['dangling'])} dangling "
+          f"candidates in {analysis_seconds * 1000:.0f}ms, prompt ~{prompt_tokens} tokens "
+          f"instead of ~{story_tokens} for the full story")
+
+    out_path = os.path.join(sess_dir, OUTPUT_FILE)
+    key = None if local_only else cache_key(prompts, PROMPT_VERSION, model)
+    if key and not force and is_cached(out_path, key):
+        print(f"♻️  Up to date, skipping (use --force to rerun): {out_path}")
+        return out_path
+
+    metrics = {"analysis_seconds": round(analysis_seconds, 4),
+               "prompt_tokens_estimate": prompt_tokens,
+               "story_tokens_estimate": story_tokens}
+    analysis_text = None
+    if not local_only:
+        print("- Verifying candidates...")
+        analysis_text, call_metrics = gpt5_respond_with_usage(prompts["plot"], model)
+        metrics.update(call_metrics)
+
+    result = {
+        "session_id": session_id,
+        "model": None if local_only else model,
+        "analysis": analysis_text,
+        "candidates": candidates,
+        "metrics": metrics,
+        "cache_key": key,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"✅ Saved plot analysis to: {out_path}")
+    return out_path
+
+
+def main():
+    def add_arguments(parser):
+        parser.add_argument("--local-only", action="store_true",
+                            help="only find setup/payoff candidates, without calling the model")
+
+    args = judge_args("Plot sophistication judge", SESSION_ID, MODEL, add_arguments)
+    judge_session(args.session, args.model, args.force, args.local_only)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Judge runner
+Runs a judge x session matrix through a bounded, rate-limited worker pool.
+Pairs whose output is up to date (same inputs, prompt version and model,
+see common.cache_key) are skipped, so an interrupted run can simply be
+started again and "all" only re-pays for sessions that changed.
+
+Examples:
+    python -m judges                                 # all judges on every unjudged session
+    python -m judges 1-10 --judges gpa,structure     # a range of numeric sessions
+    python -m judges "2025*" 4 --workers 8 --rpm 60  # glob + single session, 60 calls/min
+    python -m judges all --force                     # ignore cached results
+    python -m judges all --backend llama.cpp --backend-uri http://localhost:8080 --model goat-70b
+
+To submit the prompts as an offline provider batch instead, see judges/batch.py.
+"""
+
+import os
+import sys
+import time
+import fnmatch
+import argparse
+import importlib
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from judges import common
+
+# judge name -> module exposing OUTPUT_FILE, MODEL, session_cache_key(session_id, model)
+# and judge_session(session_id, model, force)
+JUDGES = {
+    "gpa": "judges.gpa_judge",
+    "character": "judges.character_judge",
+    "plot": "judges.plot_judge",
+    "structure": "judges.structure_judge",
+    "structure_simple": "judges.structure_judge_simple",
+    "writing_quality": "judges.writing_quality_judge",
+}
+
+
+def list_session_ids():
+    if not os.path.isdir(common.LOGS_DIR):
+        return []
+    return sorted(name.replace("session_", "") for name in os.listdir(common.LOGS_DIR)
+                  if name.startswith("session_") and os.path.isdir(os.path.join(common.LOGS_DIR, name)))
+
+
+def is_judgeable(session_id):
+    sess_dir = common.session_dir(session_id)
+    return all(os.path.exists(os.path.join(sess_dir, name))
+               for name in ("generation_log.json", "final_story.txt"))
+
+
+def output_exists(session_id, judge_module):
+    sess_dir = common.session_dir(session_id)
+    return any(os.path.exists(os.path.join(sess_dir, folder, judge_module.OUTPUT_FILE))
+               for folder in ("", "evaluations"))
+
+
+def select_sessions(selectors, session_ids, judge_modules):
+    """Resolve selectors to session IDs (in archive order, without duplicates)
+
+    Selectors: "all", "unjudged" (missing any of the selected judges),
+    numeric ranges "3-7", globs "2025*" and plain session IDs.
+    """
+    selected = set()
+    for selector in selectors:
+        if selector == "all":
+            selected.update(session_ids)
+        elif selector == "unjudged":
+            selected.update(sid for sid in session_ids
+                            if not all(output_exists(sid, m) for m in judge_modules.values()))
+        elif "-" in selector and all(part.isdigit() for part in selector.split("-", 1)):
+            low, high = (int(part) for part in selector.split("-", 1))
+            selected.update(sid for sid in session_ids if sid.isdigit() and low <= int(sid) <= high)
+        else:
+            matches = fnmatch.filter(session_ids, selector)
+            if not matches:
+                print(f"⚠️  No session matches '{selector}'")
+            selected.update(matches)
+    return [sid for sid in session_ids if sid in selected]
+
+
+def is_up_to_date(session_id, judge_module, model):
+    output_path = os.path.join(common.session_dir(session_id), judge_module.OUTPUT_FILE)
+    return common.is_cached(output_path, judge_module.session_cache_key(session_id, model))
+
+
+def run_matrix(judge_names, session_ids, model=None, workers=4, force=False):
+    """Run every (judge, session) pair, return {(judge, session): error or None}
+
+    Pairs with an up to date cached result are skipped unless force is set.
+    """
+    judge_modules = {name: importlib.import_module(JUDGES[name]) for name in judge_names}
+    tasks = []
+    for sid in session_ids:
+        if not is_judgeable(sid):
+            print(f"⏭️  Session {sid}: no final_story.txt / generation_log.json, skipping")
+            continue
+        tasks.extend((name, sid) for name in judge_modules)
+
+    if not tasks:
+        print("✅ Nothing to judge")
+        return {}
+
+    print(f"⚖️  Running {len(tasks)} judge runs with {workers} workers")
+    results = {}
+    cached = 0
+    started = time.monotonic()
+
+    def run(name, sid):
+        """Returns the run time, or None if the cached result was reused"""
+        module = judge_modules[name]
+        judge_model = model or module.MODEL
+        if not force and is_up_to_date(sid, module, judge_model):
+            return None
+        t0 = time.monotonic()
+        module.judge_session(sid, judge_model, force=True)
+        return time.monotonic() - t0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run, name, sid): (name, sid) for name, sid in tasks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            name, sid = futures[future]
+            try:
+                elapsed = future.result()
+                results[(name, sid)] = None
+                if elapsed is None:
+                    cached += 1
+                    print(f"[{done}/{len(tasks)}] ♻️  {name} × session {sid} (cached)")
+                else:
+                    print(f"[{done}/{len(tasks)}] ✅ {name} × session {sid} ({elapsed:.1f}s)")
+            except Exception as e:
+                results[(name, sid)] = str(e)
+                print(f"[{done}/{len(tasks)}] ❌ {name} × session {sid}: {e}")
+                traceback.print_exc()
+
+    failed = sum(1 for error in results.values() if error)
+    print(f"\n🏁 {len(tasks) - failed - cached} succeeded, {cached} cached, {failed} failed "
+          f"in {time.monotonic() - started:.1f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m judges",
+        description="Run judges over many sessions",
+        epilog="Session selectors: all, unjudged, ranges (3-7), globs (2025*) or IDs")
+    parser.add_argument("sessions", nargs="*", default=["unjudged"],
+                        help="session selectors (default: unjudged)")
+    parser.add_argument("--judges", default=",".join(JUDGES),
+                        help=f"comma separated judges (default: {','.join(JUDGES)})")
+    parser.add_argument("--model", default=None, help="override the judges' default model")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent judge runs (default: 4)")
+    parser.add_argument("--rpm", type=float, default=None,
+                        help="max model calls per minute across all workers (default: unlimited)")
+    parser.add_argument("--force", action="store_true",
+                        help="judge again even if the cached result is up to date")
+    common.add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    judge_names = [name.strip() for name in args.judges.split(",") if name.strip()]
+    unknown = [name for name in judge_names if name not in JUDGES]
+    if unknown:
+        parser.error(f"unknown judges: {', '.join(unknown)} (available: {', '.join(JUDGES)})")
+
+    common.set_rate_limit(args.rpm)
+    common.set_backend(args.backend, args.backend_uri)
+    judge_modules = {name: importlib.import_module(JUDGES[name]) for name in judge_names}
+    session_ids = select_sessions(args.sessions, list_session_ids(), judge_modules)
+    results = run_matrix(judge_names, session_ids, args.model, args.workers, args.force)
+    if any(results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,39 +3,28 @@
 Story Structure Judge
 Analyzes story coherence, completeness, and narrative structure
 Creates a structured summary for human review
+Long stories are analyzed in scene-aligned chunks and merged (judges/chunking.py)
 """
 
 import os
+import sys
 import json
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 # Get project root (one level up from judges/)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
 
-# === Configure here ===
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("Please set OPENAI_API_KEY environment variable (you can use a .env file)")
+from judges.chunking import map_reduce, part_header, story_chunks
+from judges.common import CHUNK_TOKENS, MAP_WORKERS, cache_key, is_cached, judge_args, load_session
 
+# === Defaults for direct runs ===
 MODEL = "gpt-5"
 SESSION_ID = "20251028_121006"  # Numeric session ID (e.g., "1", "2", "3") or old format
-# =======================
-
+# ================================
 
-def gpt5_respond(prompt: str) -> str:
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.responses.create(
-        model=MODEL,
-        input=prompt.strip(),
-        reasoning={"effort": "low"},
-        text={"verbosity": "low"},
-    )
-    return resp.output_text
+OUTPUT_FILE = "structure_analysis.json"
+PROMPT_VERSION = "2"  # bump when the prompt or result handling change
 
 
 STRUCTURE_ANALYSIS_PROMPT = """Analyze the provided story and create a structured summary. Your goal is to help someone who has NOT read the story understand what happens, who the characters are, and how the story works.
@@ -78,50 +67,68 @@ STORY TO ANALYZE:
 """
 
 
-def load_session(session_id: str):
-    """Load a session by ID (supports both numeric and old timestamp formats)"""
-    sess_dir = os.path.join(PROJECT_ROOT, "story_generation_logs", f"session_{session_id}")
-    log_path = os.path.join(sess_dir, "generation_log.json")
-    story_path = os.path.join(sess_dir, "final_story.txt")
-    
-    with open(log_path, "r", encoding="utf-8") as f:
-        log = json.load(f)
-    with open(story_path, "r", encoding="utf-8") as f:
-        story = f.read()
-    
-    return sess_dir, log, story
+REDUCE_INSTRUCTIONS = """Write one analysis of the whole story in exactly the format (same sections and headings) used by the part analyses."""
+
+
+def build_chunk_prompts(chunks: list) -> list:
+    return [part_header(i, chunks) + STRUCTURE_ANALYSIS_PROMPT.format(story=chunk["text"])
+            for i, chunk in enumerate(chunks)]
+
+
+def build_prompts(session_id: str, chunk_tokens: int = CHUNK_TOKENS):
+    """Load a session and build its analysis prompts (one per chunk)"""
+    sess_dir = load_session(session_id)[0]
+    return sess_dir, {"structure_analysis": build_chunk_prompts(story_chunks(sess_dir, chunk_tokens))}
 
 
-def analyze_structure(story: str) -> str:
-    """Run structural analysis on the story"""
+def session_cache_key(session_id: str, model: str = MODEL, chunk_tokens: int = CHUNK_TOKENS) -> str:
+    return cache_key(build_prompts(session_id, chunk_tokens)[1], PROMPT_VERSION, model)
+
+
+def analyze_structure(prompts: list, model: str = MODEL, workers: int = MAP_WORKERS):
+    """Run structural analysis on the story, return (analysis, metrics)"""
     print("📐 Analyzing story structure...")
-    prompt = STRUCTURE_ANALYSIS_PROMPT.format(story=story)
-    result = gpt5_respond(prompt)
-    return result
+    if len(prompts) > 1:
+        print(f"   {len(prompts)} chunks, {min(workers, len(prompts))} at a time")
+    return map_reduce(prompts, REDUCE_INSTRUCTIONS, model, workers)
 
 
-def main():
+def judge_session(session_id: str, model: str = MODEL, force: bool = False,
+                  chunk_tokens: int = CHUNK_TOKENS, workers: int = MAP_WORKERS) -> str:
+    """Run the analysis of one session, return the output path
+
+    Skipped when the existing output was produced from the same story,
+    prompt version and model, unless force is set.
+    """
     print(f"📐 Story Structure Judge")
-    print(f"Session ID: {SESSION_ID}")
-    print(f"Model: {MODEL}\n")
+    print(f"Session ID: {session_id}")
+    print(f"Model: {model}\n")
     
     # Load session data
-    sess_dir, log, story = load_session(SESSION_ID)
+    sess_dir, log, story = load_session(session_id)
     print(f"✅ Loaded session from: {sess_dir}")
     print(f"📖 Story length: {len(story)} characters\n")
     
+    prompts = build_chunk_prompts(story_chunks(sess_dir, chunk_tokens))
+    key = cache_key({"structure_analysis": prompts}, PROMPT_VERSION, model)
+    output_path = os.path.join(sess_dir, OUTPUT_FILE)
+    if not force and is_cached(output_path, key):
+        print(f"♻️  Up to date, skipping (use --force to rerun): {output_path}")
+        return output_path
+    
     # Run structure analysis
-    structure_analysis = analyze_structure(story)
+    structure_analysis, metrics = analyze_structure(prompts, model, workers)
     
     # Save results
     output = {
-        "session_id": SESSION_ID,
-        "model": MODEL,
+        "session_id": session_id,
+        "model": model,
         "story_length": len(story),
-        "structure_analysis": structure_analysis
+        "structure_analysis": structure_analysis,
+        "metrics": metrics,
+        "cache_key": key
     }
     
-    output_path = os.path.join(sess_dir, "structure_analysis.json")
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(output, f, indent=2, ensure_ascii=False)
     
@@ -130,13 +137,21 @@ def main():
     with open(readable_path, "w", encoding="utf-8") as f:
         f.write("=" * 80 + "\n")
         f.write("STORY STRUCTURE ANALYSIS\n")
-        f.write(f"Session: {SESSION_ID}\n")
+        f.write(f"Session: {session_id}\n")
         f.write("=" * 80 + "\n\n")
         f.write(structure_analysis)
     
     print(f"\n✅ Structure analysis complete!")
     print(f"📄 Saved to: {output_path}")
     print(f"📄 Readable version: {readable_path}")
+    return output_path
+
+
+def main():
+    args = judge_args("Story structure judge", SESSION_ID, MODEL)
+    output_path = judge_session(args.session, args.model, args.force, args.chunk_tokens, args.workers)
+    with open(output_path, "r", encoding="utf-8") as f:
+        structure_analysis = json.load(f)['structure_analysis']
     
     # Print summary
     print("\n" + "=" * 80)
@@ -5,12 +5,170 @@ Writing Quality Judge
 Evaluates if each scene stands alone as a good piece of writing.
 Assesses prose quality, sentence structure, clarity, show vs tell balance,
 dialogue quality, and pacing/rhythm at the scene level.
+
+- Splits final_story.txt on its scene markers
+- Packs consecutive short scenes into one request (--pack-tokens, 0 = one scene per request)
+- Evaluates the requests concurrently (--workers)
+- Saves per-scene scores to story_generation_logs/session_<id>/writing_quality.json
+
+Usage: python judges/writing_quality_judge.py [--session ID] [--model MODEL] [--pack-tokens N]
+(or run it over many sessions with python -m judges)
+"""
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Get project root (one level up from judges/)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from goat_storytelling_agent.story_file import read_scenes
+from judges.chunking import pack_scenes, scenes_text
+from judges.common import (MAP_WORKERS, cache_key, gpt5_respond_with_usage, is_cached, judge_args,
+                           parse_json_response, session_dir)
+
+# === Defaults for direct runs ===
+MODEL = "gpt-5"
+SESSION_ID = "1"  # Numeric session ID (e.g., "1", "2", "3") or old format (e.g., "20251028_121006")
+# ================================
+
+OUTPUT_FILE = "writing_quality.json"
+PROMPT_VERSION = "1"  # bump when the prompt or result handling change
+
+PACK_TOKENS = 4000         # story tokens per request when packing short scenes
+MAX_SCENES_PER_REQUEST = 4
+CRITERIA = ["prose_quality", "sentence_structure", "clarity", "show_vs_tell", "dialogue", "pacing"]
+
+
+def build_prompt(scenes: list) -> str:
+    return f"""
+You are a prose editor. Evaluate each scene below on its own, as a standalone piece of writing.
+Score every criterion from 1 (poor) to 10 (excellent): {", ".join(CRITERIA)}.
+Return JSON: {{"scenes": [{{"scene": <scene number>, {", ".join(f'"{c}"' for c in CRITERIA)}, "overall", "strengths": [], "weaknesses": []}}]}}
+with exactly one entry per scene, in order. Scene numbers are given in the SCENE separators.
+
+{scenes_text(scenes)}
 """
 
-# TODO: Implement writing quality evaluation
-# - Load session and story
-# - Break story into individual scenes
-# - Evaluate each scene independently as a standalone piece of writing
-# - Assess: prose quality, sentence structure, clarity, show vs tell, dialogue, pacing
-# - Return scores and feedback for each scene
 
+def build_prompts(session_id: str, pack_tokens: int = PACK_TOKENS):
+    """Split a session's story into scenes and build one prompt per scene group
+
+    Returns (sess_dir, {"scenes": [[scene numbers], ...], "prompts": [...]}),
+    both lists in story order.
+    """
+    sess_dir = session_dir(session_id)
+    scenes = read_scenes(os.path.join(sess_dir, "final_story.txt"))
+    groups = pack_scenes(scenes, pack_tokens, MAX_SCENES_PER_REQUEST if pack_tokens else None)
+    return sess_dir, {
+        "scenes": [[scene["scene"] for scene in group] for group in groups],
+        "prompts": [build_prompt(group) for group in groups],
+    }
+
+
+def session_cache_key(session_id: str, model: str = MODEL, pack_tokens: int = PACK_TOKENS) -> str:
+    return cache_key(build_prompts(session_id, pack_tokens)[1], PROMPT_VERSION, model)
+
+
+def parse_scene_scores(response: str, scene_numbers: list) -> list:
+    """Per-scene entries for scene_numbers; scenes missing from the response get an error"""
+    try:
+        entries = parse_json_response(response).get("scenes", [])
+    except (ValueError, AttributeError):
+        entries = []
+    by_scene = {entry.get("scene"): entry for entry in entries if isinstance(entry, dict)}
+    if len(scene_numbers) == 1 and len(entries) == 1:
+        by_scene = {scene_numbers[0]: entries[0]}
+    results = []
+    for number in scene_numbers:
+        entry = by_scene.get(number) or by_scene.get(str(number))
+        if entry is None:
+            results.append({"scene": number, "error": "missing from response", "raw": response})
+        else:
+            results.append({**entry, "scene": number})
+    return results
+
+
+def summarize(scene_results: list) -> dict:
+    """Mean of each criterion (and overall) over the scenes that were scored"""
+    summary = {}
+    for criterion in CRITERIA + ["overall"]:
+        values = [entry[criterion] for entry in scene_results
+                  if isinstance(entry.get(criterion), (int, float)) and not isinstance(entry.get(criterion), bool)]
+        summary[criterion] = round(sum(values) / len(values), 2) if values else None
+    return summary
+
+
+def judge_session(session_id: str, model: str = MODEL, force: bool = False,
+                  workers: int = MAP_WORKERS, pack_tokens: int = PACK_TOKENS) -> str:
+    """Score every scene of one session, return the output path
+
+    Skipped when the existing output was produced from the same scenes,
+    prompt version and model, unless force is set.
+    """
+    print(f"✍️  Writing Quality Judge - session {session_id}")
+    sess_dir, prompts = build_prompts(session_id, pack_tokens)
+    key = cache_key(prompts, PROMPT_VERSION, model)
+    out_path = os.path.join(sess_dir, OUTPUT_FILE)
+    if not force and is_cached(out_path, key):
+        print(f"♻️  Up to date, skipping (use --force to rerun): {out_path}")
+        return out_path
+
+    groups = prompts["scenes"]
+    scene_count = sum(len(group) for group in groups)
+    print(f"- Evaluating {scene_count} scenes in {len(groups)} requests, {workers} at a time...")
+    started = time.monotonic()
+    responses = [None] * len(groups)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(gpt5_respond_with_usage, prompt, model): i
+                   for i, prompt in enumerate(prompts["prompts"])}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            responses[i] = future.result()
+            print(f"  [{done}/{len(groups)}] scenes {', '.join(map(str, groups[i]))}")
+
+    scene_results = []
+    for group, (response, _) in zip(groups, responses):
+        scene_results.extend(parse_scene_scores(response, group))
+    summary = summarize(scene_results)
+    call_metrics = [metrics for _, metrics in responses]
+
+    result = {
+        "session_id": session_id,
+        "model": model,
+        "score": summary["overall"],
+        "summary": summary,
+        "scenes": scene_results,
+        "metrics": {
+            "wall_seconds": round(time.monotonic() - started, 3),
+            "requests": len(groups),
+            "scenes": scene_count,
+            "input_tokens": sum(m["input_tokens"] or 0 for m in call_metrics),
+            "output_tokens": sum(m["output_tokens"] or 0 for m in call_metrics),
+        },
+        "cache_key": key,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    failed = sum(1 for entry in scene_results if "error" in entry)
+    print(f"✅ Saved writing quality scores to: {out_path}" + (f" ({failed} scenes unscored)" if failed else ""))
+    return out_path
+
+
+def main():
+    def add_arguments(parser):
+        parser.add_argument("--pack-tokens", type=int, default=PACK_TOKENS,
+                            help=f"pack short scenes into requests of up to this many story tokens, "
+                                 f"0 = one scene per request (default: {PACK_TOKENS})")
+
+    args = judge_args("Per-scene writing quality judge", SESSION_ID, MODEL, add_arguments)
+    judge_session(args.session, args.model, args.force, args.workers, args.pack_tokens)
+
+
+if __name__ == "__main__":
+    main()
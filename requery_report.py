@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compare wasted spec/plan calls of text-mode and structured-mode sessions
+
+Reads the generate_story_start and generate_story_success steps of every
+finished session and reports, per mode (StoryAgent structured=False or
+True), how many calls per session went to replies the parsers could not
+use or to repairing them (StoryAgent.requeries), overall and per stage.
+
+To measure the structured mode on your own backend, generate the same
+topics in both modes, e.g. a generate_batch.py JSONL file where every topic
+appears once with "options": {"structured": false} and once with true,
+then run this script over the resulting sessions.
+
+Sessions logged before the mode and the counts were recorded are skipped.
+
+Usage: python requery_report.py [SESSION_ID ...] [--logs-dir DIR] [--json]
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+MODES = {False: "text", True: "structured"}
+
+
+def session_requeries(session_dir):
+    """(structured, requeries) of a finished session, None if it lacks either"""
+    try:
+        with open(Path(session_dir) / "generation_log.json", 'r', encoding='utf-8') as f:
+            steps = json.load(f).get("steps", [])
+    except (OSError, ValueError):
+        return None
+    structured = requeries = None
+    for step in steps:
+        data = step.get("data") or {}
+        if step.get("step") == "generate_story_start" and "structured" in data:
+            structured = bool(data["structured"])
+        elif step.get("step") == "generate_story_success" and "requeries" in data:
+            requeries = data["requeries"]
+    if structured is None or requeries is None:
+        return None
+    return structured, requeries
+
+
+def compare(session_dirs):
+    """Sessions, wasted calls and wasted calls per session, by mode and stage"""
+    report = {mode: {"sessions": 0, "wasted_calls": 0, "stages": {}} for mode in MODES.values()}
+    for session_dir in session_dirs:
+        result = session_requeries(session_dir)
+        if result is None:
+            continue
+        structured, requeries = result
+        mode = report[MODES[structured]]
+        mode["sessions"] += 1
+        for stage, calls in requeries.items():
+            mode["wasted_calls"] += calls
+            mode["stages"][stage] = mode["stages"].get(stage, 0) + calls
+    for mode in report.values():
+        sessions = mode["sessions"]
+        mode["per_session"] = round(mode["wasted_calls"] / sessions, 2) if sessions else None
+        mode["stages"] = {stage: round(calls / sessions, 2) for stage, calls in sorted(mode["stages"].items())}
+    text, structured = report["text"]["per_session"], report["structured"]["per_session"]
+    report["reduction"] = round(1 - structured / text, 3) if text and structured is not None else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare wasted spec/plan calls of text and structured sessions")
+    parser.add_argument("sessions", nargs="*", help="session IDs (default: all)")
+    parser.add_argument("--logs-dir", default=str(Path(__file__).parent / "story_generation_logs"))
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    logs_dir = Path(args.logs_dir)
+    if args.sessions:
+        session_dirs = [logs_dir / f"session_{sid}" for sid in args.sessions]
+    else:
+        session_dirs = sorted(d for d in logs_dir.iterdir() if d.is_dir() and d.name.startswith("session_"))
+    report = compare(session_dirs)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{'mode':<12}{'sessions':>9}{'wasted':>8}{'/session':>10}  per stage")
+    for name in MODES.values():
+        mode = report[name]
+        per_session = f"{mode['per_session']:.2f}" if mode["per_session"] is not None else "-"
+        stages = ", ".join(f"{stage}: {calls}" for stage, calls in mode["stages"].items() if calls)
+        print(f"{name:<12}{mode['sessions']:>9}{mode['wasted_calls']:>8}{per_session:>10}  {stages or '-'}")
+    if report["reduction"] is not None:
+        print(f"\n📉 Structured mode wastes {report['reduction']:.1%} fewer calls per session")
+    elif not report["text"]["sessions"] or not report["structured"]["sessions"]:
+        print("\nℹ️  Need finished sessions of both modes to compare")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Session API server for the story viewer and internal tools
+
+Serves sessions straight from story_generation_logs/ so nobody has to rerun
+export_sessions.py. Standard library only (http.server).
+
+Endpoints (all GET, JSON unless noted):
+    /api/sessions?page=1&per_page=20         paginated session summaries
+    /api/sessions/<id>                       seed, plans, judge names, scene list
+    /api/sessions/<id>/scenes?page=&per_page= paginated scene texts
+    /api/sessions/<id>/scenes/<n>            one scene (text/plain)
+    /api/sessions/<id>/judges                all judge results
+    /api/sessions/<id>/judges/<name>         one judge result
+
+Responses carry an ETag derived from file and directory stats, so
+If-None-Match requests are answered with 304 without reading any file, and
+bodies are gzip-compressed when the client accepts it. The listing ETag only
+stats a few paths per session instead of walking every session directory.
+"""
+
+import re
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, str(Path(__file__).parent))
+from export_sessions import compute_session_stats, load_scenes, load_session, load_step_timeline, scan_session_files
+from goat_storytelling_agent.story_file import StoryReader
+
+DEFAULT_PORT = 8765
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+MIN_GZIP_SIZE = 1024
+SUMMARY_CACHE_SIZE = 1024
+# What a session summary is built from: directories whose mtime changes when
+# files are added or removed, and files that are rewritten in place
+SUMMARY_DIRS = (".", "plans", "evaluations")
+SUMMARY_FILES = ("seed.json", "generation_log.json", "final_story.txt", "final_story.index.json")
+
+ROUTES = [
+    (re.compile(r'^/api/sessions/?$'), 'sessions'),
+    (re.compile(r'^/api/sessions/(?P<session_id>[^/]+)/?$'), 'session'),
+    (re.compile(r'^/api/sessions/(?P<session_id>[^/]+)/scenes/?$'), 'scenes'),
+    (re.compile(r'^/api/sessions/(?P<session_id>[^/]+)/scenes/(?P<scene>\d+)/?$'), 'scene'),
+    (re.compile(r'^/api/sessions/(?P<session_id>[^/]+)/judges/?$'), 'judges'),
+    (re.compile(r'^/api/sessions/(?P<session_id>[^/]+)/judges/(?P<judge>[^/]+)/?$'), 'judge'),
+]
+
+
+class NotFound(Exception):
+    pass
+
+
+class SessionStore:
+    """Read-only view of a story_generation_logs directory
+
+    Nothing is held in memory except a bounded LRU of session summaries keyed
+    by the session's file signature, so edits on disk are picked up on the
+    next request.
+    """
+
+    def __init__(self, logs_dir):
+        self.logs_dir = Path(logs_dir)
+        self._summary = lru_cache(maxsize=SUMMARY_CACHE_SIZE)(self._load_summary)
+
+    def session_ids(self):
+        if not self.logs_dir.exists():
+            return []
+        return [d.name.replace("session_", "") for d in sorted(self.logs_dir.iterdir())
+                if d.is_dir() and d.name.startswith("session_")]
+
+    def session_dir(self, session_id):
+        session_dir = self.logs_dir / f"session_{session_id}"
+        if "/" in session_id or session_id in (".", "..") or not session_dir.is_dir():
+            raise NotFound(f"Unknown session: {session_id}")
+        return session_dir
+
+    def signature(self, session_id):
+        """Cheap content signature of a session (file names, mtimes and sizes)"""
+        stats = scan_session_files(self.session_dir(session_id))
+        return hashlib.sha1(json.dumps(sorted(stats.items())).encode()).hexdigest()
+
+    def summary_signature(self, session_id):
+        """Signature of what the session's summary shows, from a fixed number of stats"""
+        session_dir = self.session_dir(session_id)
+        stats = []
+        for name in SUMMARY_DIRS + SUMMARY_FILES:
+            try:
+                st = (session_dir / name).stat()
+                stats.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stats.append((name, None, None))
+        return hashlib.sha1(json.dumps(stats).encode()).hexdigest()
+
+    def _load_summary(self, session_id, signature):
+        session_dir = self.session_dir(session_id)
+        session_data = load_session(session_dir)
+        scenes = load_scenes(session_dir)
+        stats = compute_session_stats([(session_data, scenes, load_step_timeline(session_dir))])[0]
+        return {
+            "id": session_id,
+            "title": session_data["title"],
+            "seed": session_data["seed"],
+            "scene_count": len(scenes),
+            "plans_count": len(session_data["plans"]),
+            "judges": sorted(session_data["judges"]),
+            "stats": {key: value for key, value in stats.items()
+                      if key not in ("scene_words", "scene_seconds")},
+        }
+
+    def summary(self, session_id, signature=None):
+        return self._summary(session_id, signature or self.summary_signature(session_id))
+
+    def story(self, session_id):
+        """StoryReader over the session's final_story.txt (None if not written yet)"""
+        story_path = self.session_dir(session_id) / "final_story.txt"
+        return StoryReader(story_path) if story_path.exists() else None
+
+    def detail(self, session_id):
+        session_data = load_session(self.session_dir(session_id))
+        session_data["judges"] = sorted(session_data["judges"])
+        session_data["scenes"] = []
+        story = self.story(session_id)
+        if story:
+            with story:
+                session_data["scenes"] = [
+                    {"scene": entry["scene"], "chapter": entry["chapter"],
+                     "bytes": entry["end"] - entry["start"],
+                     "url": f"/api/sessions/{session_id}/scenes/{entry['scene']}"}
+                    for entry in story.index
+                ]
+        return session_data
+
+    def scene_page(self, session_id, query):
+        """Paginated scene texts; only the scenes on the page are read"""
+        story = self.story(session_id)
+        if not story:
+            return paginate([], query)
+        with story:
+            entries, meta = paginate(story.index, query)
+            return [{"scene": entry["scene"], "chapter": entry["chapter"],
+                     "text": story.scene_text(entry["scene"])} for entry in entries], meta
+
+    def scene_text(self, session_id, scene_num):
+        story = self.story(session_id)
+        if story:
+            with story:
+                try:
+                    return story.scene_text(scene_num)
+                except KeyError:
+                    pass
+        raise NotFound(f"Unknown scene {scene_num} in session {session_id}")
+
+    def judges(self, session_id):
+        return load_session(self.session_dir(session_id))["judges"]
+
+
+def paginate(items, query):
+    """Slice items according to ?page= and ?per_page=, return (page_items, meta)"""
+    try:
+        page = max(1, int(query.get("page", ["1"])[0]))
+        per_page = min(MAX_PER_PAGE, max(1, int(query.get("per_page", [str(DEFAULT_PER_PAGE)])[0])))
+    except ValueError:
+        page, per_page = 1, DEFAULT_PER_PAGE
+    start = (page - 1) * per_page
+    meta = {
+        "page": page,
+        "per_page": per_page,
+        "total": len(items),
+        "pages": (len(items) + per_page - 1) // per_page,
+    }
+    return items[start:start + per_page], meta
+
+
+class SessionRequestHandler(BaseHTTPRequestHandler):
+    store = None  # set by make_server
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        for pattern, name in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            return self.send_json({"error": "Not found"}, status=404)
+
+        try:
+            etag = self.compute_etag(name, match.groupdict(), url.query)
+            if etag and etag in self.headers.get("If-None-Match", ""):
+                return self.send_body(b"", status=304, etag=etag)
+            handler = getattr(self, f"get_{name}")
+            handler(query=query, etag=etag, **match.groupdict())
+        except NotFound as e:
+            self.send_json({"error": str(e)}, status=404)
+
+    def compute_etag(self, name, params, query_string):
+        if name == "sessions":
+            parts = [(sid, self.store.summary_signature(sid)) for sid in self.store.session_ids()]
+        else:
+            parts = [self.store.signature(params["session_id"])]
+        digest = hashlib.sha1(json.dumps([name, params, query_string, parts]).encode()).hexdigest()
+        return f'W/"{digest[:20]}"'
+
+    def get_sessions(self, query, etag):
+        page_ids, meta = paginate(self.store.session_ids(), query)
+        self.send_json({"sessions": [self.store.summary(sid) for sid in page_ids], **meta}, etag=etag)
+
+    def get_session(self, session_id, query, etag):
+        self.send_json(self.store.detail(session_id), etag=etag)
+
+    def get_scenes(self, session_id, query, etag):
+        scenes, meta = self.store.scene_page(session_id, query)
+        self.send_json({"session_id": session_id, "scenes": scenes, **meta}, etag=etag)
+
+    def get_scene(self, session_id, scene, query, etag):
+        text = self.store.scene_text(session_id, int(scene))
+        self.send_body(text.encode('utf-8'), etag=etag, content_type="text/plain; charset=utf-8")
+
+    def get_judges(self, session_id, query, etag):
+        self.send_json({"session_id": session_id, "judges": self.store.judges(session_id)}, etag=etag)
+
+    def get_judge(self, session_id, judge, query, etag):
+        judges = self.store.judges(session_id)
+        if judge not in judges:
+            raise NotFound(f"Unknown judge {judge} in session {session_id}")
+        self.send_json(judges[judge], etag=etag)
+
+    def send_json(self, data, status=200, etag=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_body(body, status=status, etag=etag, content_type="application/json; charset=utf-8")
+
+    def send_body(self, body, status=200, etag=None, content_type=None):
+        use_gzip = len(body) >= MIN_GZIP_SIZE and "gzip" in self.headers.get("Accept-Encoding", "")
+        if use_gzip:
+            body = gzip.compress(body)
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+def make_server(logs_dir, host="127.0.0.1", port=DEFAULT_PORT):
+    """Create a threaded HTTP server serving sessions from logs_dir"""
+    handler = type("Handler", (SessionRequestHandler,), {"store": SessionStore(logs_dir)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve story sessions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--logs-dir", default=str(Path(__file__).parent / "story_generation_logs"))
+    args = parser.parse_args()
+
+    server = make_server(args.logs_dir, args.host, args.port)
+    print(f"📡 Serving sessions from {args.logs_dir} on http://{args.host}:{args.port}/api/sessions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks of the spec, plan and scene parsers
+
+Times goat_storytelling_agent.parsers against the parsers it replaced
+(legacy_parsers.py) on the fixtures and on the generated adversarial
+inputs of parser_inputs.py, and prints microseconds per call.
+
+Usage: python tests/bench_parsers.py [--kind spec|plan|scenes|scene] [--size 5000]
+"""
+
+import sys
+import timeit
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import legacy_parsers as legacy
+from goat_storytelling_agent import parsers
+from goat_storytelling_agent.prompts import book_spec_fields
+from parser_inputs import KINDS, adversarial, chapter_numbers, fixtures
+
+
+def parsers_of(kind, text):
+    """(new, old) zero-argument calls parsing text"""
+    if kind == "spec":
+        return (lambda: parsers.book_spec(text, book_spec_fields),
+                lambda: legacy.parse_book_spec(text, book_spec_fields))
+    if kind == "plan":
+        return lambda: parsers.text_plan(text), lambda: legacy.parse_text_plan(text)
+    if kind == "scenes":
+        act_chapters = chapter_numbers(text)
+
+        def safe(func):
+            def call():
+                try:
+                    func(text, act_chapters)
+                except KeyError:
+                    pass
+            return call
+        return safe(parsers.act_scenes), safe(legacy.act_scenes)
+    return lambda: parsers.scene_text(text), lambda: legacy.prepare_scene_text(text)
+
+
+def per_call_us(func):
+    """Best of 3 timings, each with as many calls as fill 0.2s"""
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the parsers against the legacy ones")
+    parser.add_argument("--kind", choices=KINDS, action="append", help="input kinds (default: all)")
+    parser.add_argument("--size", type=int, default=5000, help="size of the adversarial inputs")
+    args = parser.parse_args()
+
+    print(f"{'input':<42}{'chars':>9}{'new us':>11}{'old us':>11}{'speedup':>9}")
+    for kind in args.kind or KINDS:
+        inputs = {**fixtures(kind), **{f"adversarial:{name}": text
+                                       for name, text in adversarial(kind, args.size).items()}}
+        for name, text in inputs.items():
+            new, old = parsers_of(kind, text)
+            new_us, old_us = per_call_us(new), per_call_us(old)
+            print(f"{kind + ' ' + name:<42}{len(text):>9}{new_us:>11.1f}{old_us:>11.1f}"
+                  f"{old_us / new_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
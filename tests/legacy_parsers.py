@@ -0,0 +1,123 @@
+"""The spec, plan and scene parsers as they were before parsers.py
+
+Kept verbatim (minus the debug prints) as the reference the parsers module
+is checked against in test_parsers.py and timed against in
+bench_parsers.py.
+"""
+import re
+
+
+def parse_book_spec(text_spec, fields):
+    spec_dict = {field: '' for field in fields}
+    last_field = None
+    if "\"\"\"" in text_spec[:int(len(text_spec)/2)]:
+        header, sep, text_spec = text_spec.partition("\"\"\"")
+    text_spec = text_spec.strip()
+
+    for line in text_spec.split('\n'):
+        pseudokey, sep, value = line.partition(':')
+        pseudokey = pseudokey.lower().strip()
+        matched_key = [key for key in fields
+                       if (key.lower().strip() in pseudokey)
+                       and (len(pseudokey) < (2 * len(key.strip())))]
+        if (':' in line) and (len(matched_key) == 1):
+            last_field = matched_key[0]
+            if last_field in spec_dict:
+                spec_dict[last_field] += value.strip()
+        elif ':' in line:
+            last_field = 'other'
+            spec_dict[last_field] = ''
+        else:
+            if last_field:
+                spec_dict[last_field] += ' ' + line.strip()
+    spec_dict.pop('other', None)
+    return spec_dict
+
+
+def split_by_act(original_plan):
+    acts = re.split('\n.{0,5}?Act ', original_plan)
+    acts = [text.strip() for text in acts[:]
+            if (text and (len(text.split()) > 3))]
+    if len(acts) == 4:
+        acts = acts[1:]
+    elif len(acts) != 3:
+        acts = original_plan.split('Act ')
+        if len(acts) == 4:
+            acts = acts[-3:]
+        elif len(acts) != 3:
+            return []
+
+    if acts[0].startswith('Act '):
+        acts = [acts[0]] + ['Act ' + act for act in acts[1:]]
+    else:
+        acts = ['Act ' + act for act in acts[:]]
+    return acts
+
+
+def parse_act(act):
+    act = re.split(r'\n.{0,20}?Chapter .+:', act.strip())
+    chapters = [text.strip() for text in act[1:]
+                if (text and (len(text.split()) > 3))]
+    return {'act_descr': act[0].strip(), 'chapters': chapters}
+
+
+def parse_text_plan(text_plan):
+    acts = split_by_act(text_plan)
+    if not acts:
+        return []
+    plan = [parse_act(act) for act in acts if act]
+    return [act for act in plan if act['chapters']]
+
+
+def act_scenes(text, act_chapters):
+    """The per-act body of StoryAgent.split_chapters_into_scenes"""
+    chapter_scenes = {}
+    snippets = re.split(r'Chapter (\d+)', text.strip())
+    chapters = [text.strip() for text in snippets[:]
+                if (text and text.strip())]
+    current_ch = None
+    merged_chapters = {}
+    for snippet in chapters:
+        if snippet.isnumeric():
+            ch_num = int(snippet)
+            if ch_num != current_ch:
+                current_ch = snippet
+                merged_chapters[ch_num] = ''
+            continue
+        if merged_chapters:
+            merged_chapters[ch_num] += snippet
+    ch_nums = list(merged_chapters.keys()) if len(
+        merged_chapters) <= len(act_chapters) else act_chapters
+    merged_chapters = {ch_num: merged_chapters[ch_num]
+                       for ch_num in ch_nums}
+    for ch_num, chapter in merged_chapters.items():
+        scenes = re.split(r'Scene \d+.{0,10}?:', chapter)
+        scenes = [text.strip() for text in scenes[1:]
+                  if (text and (len(text.split()) > 3))]
+        if not scenes:
+            continue
+        chapter_scenes[ch_num] = scenes
+    return chapter_scenes
+
+
+def prepare_scene_text(text):
+    lines = text.split('\n')
+    ch_ids = [i for i in range(min(5, len(lines)))
+              if 'Chapter ' in lines[i]]
+    if ch_ids:
+        lines = lines[ch_ids[-1]+1:]
+    sc_ids = [i for i in range(min(5, len(lines)))
+              if 'Scene ' in lines[i]]
+    if sc_ids:
+        lines = lines[sc_ids[-1]+1:]
+
+    placeholder_i = None
+    for i in range(len(lines)):
+        if lines[i].startswith('Chapter ') or lines[i].startswith('Scene '):
+            placeholder_i = i
+            break
+    if placeholder_i is not None:
+        lines = lines[:i]
+
+    text = '\n'.join(lines)
+    return text
@@ -0,0 +1,71 @@
+"""Parser inputs shared by test_parsers.py and bench_parsers.py
+
+- fixtures/parsers/<kind>_*.txt: model replies taken from archived
+  sessions, plus hand-written malformed ones
+- adversarial(kind): large generated inputs that stress the patterns
+  (marker soup, thousands of lines, one huge line)
+- mutate: random edits biased towards the markers the parsers look for
+"""
+import re
+import random
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "parsers"
+KINDS = ("spec", "plan", "scenes", "scene")
+
+# Fragments the parsers split or match on
+MARKERS = ["\n", "\n\n", ":", " ", "Act ", "\nAct ", "\n## Act ", "Act 2", "Chapter ",
+           "\n- Chapter 3:", "Chapter 12", "Chapter 1:", "Scene ", "Scene 2:", "Scene 10 (night):", "Scene 4 (evening):",
+           '"""', "Genre:", "Point of View:", "Characters", "premise :", "(+)", "’", "12"]
+
+
+def fixtures(kind):
+    """{file name: text} of the fixtures of a kind"""
+    return {path.name: path.read_text(encoding="utf-8")
+            for path in sorted(FIXTURES_DIR.glob(f"{kind}_*.txt"))}
+
+
+def adversarial(kind, n=5000):
+    """{name: text} of large generated inputs of a kind"""
+    rng = random.Random(n)
+    soup = "".join(rng.choice(MARKERS) for _ in range(n))
+    inputs = {"marker_soup": soup, "one_line": soup.replace("\n", " ")}
+    if kind == "spec":
+        inputs["many_keys"] = "\n".join(f"Key number {i} of the spec: value {i}" for i in range(n))
+        inputs["long_key"] = "Genre " * n + ": value\n" + "continuation\n" * n
+        inputs["colons"] = ":" * n + "\n" + "Genre:" * n
+    elif kind == "plan":
+        inputs["many_acts"] = "\n".join(f"Act {i}: the act number {i} goes on" for i in range(n))
+        inputs["many_chapters"] = "Act 1: setup of the story\n" + "\n".join(
+            f"- Chapter {i}: something happens in chapter {i} here" for i in range(n))
+        inputs["act_words"] = "Act " * n
+        inputs["chapter_colons"] = "Act 1: a b c d\n" + ("\nChapter x" + ":" * 50) * (n // 50)
+    elif kind == "scenes":
+        inputs["many_chapters"] = "\n".join(f"Chapter {i}\nScene 1: one two three four five" for i in range(n))
+        inputs["repeated_chapter"] = "\n".join(f"Chapter 1\nScene {i}: one two three four five" for i in range(n))
+        inputs["scene_no_colon"] = "Chapter 1\n" + "Scene 1 " * n
+    elif kind == "scene":
+        inputs["headers"] = "\n".join(f"Chapter {i}, Scene {i}" for i in range(n))
+        inputs["prose"] = "\n".join("She walked on. " * 20 for _ in range(n))
+    return inputs
+
+
+def mutate(text, rng, edits=4):
+    """text with a few random deletions, duplications and marker insertions"""
+    for _ in range(rng.randint(1, edits)):
+        op = rng.random()
+        i = rng.randint(0, len(text))
+        j = min(len(text), i + rng.randint(0, 200))
+        if op < 0.3:
+            text = text[:i] + text[j:]
+        elif op < 0.5:
+            text = text[:j] + text[i:j] + text[j:]
+        else:
+            text = text[:i] + rng.choice(MARKERS) + text[i:]
+    return text
+
+
+def chapter_numbers(text, default=(1,)):
+    """Chapter numbers an act is assumed to have for a scene breakdown"""
+    numbers = sorted({int(n) for n in re.findall(r"Chapter (\d+)", text)})
+    return numbers or list(default)
@@ -0,0 +1,142 @@
+"""Equivalence, property and fuzz tests of goat_storytelling_agent.parsers
+
+The parsers module has to return what the parsers it replaced returned
+(tests/legacy_parsers.py), on archived model replies, on hand-written
+malformed ones and on random mutations of both. Set PARSER_FUZZ_ITERATIONS
+to fuzz longer than the default.
+"""
+import os
+import random
+import time
+
+import pytest
+
+import legacy_parsers as legacy
+from goat_storytelling_agent import parsers
+from goat_storytelling_agent.prompts import book_spec_fields
+from parser_inputs import adversarial, chapter_numbers, fixtures, mutate
+
+FUZZ_ITERATIONS = int(os.environ.get("PARSER_FUZZ_ITERATIONS", "200"))
+# Generous: a regression to backtracking patterns takes orders of magnitude longer
+ADVERSARIAL_SECONDS = 2.0
+
+
+def outcome(func, *args):
+    """Result of a call, or the type of the exception it raised"""
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e)
+
+
+def act_chapter_variants(text):
+    numbers = chapter_numbers(text)
+    return [numbers, numbers[:1], [n + 100 for n in numbers]]
+
+
+PAIRS = {
+    "spec": [(lambda text: parsers.book_spec(text, book_spec_fields),
+              lambda text: legacy.parse_book_spec(text, book_spec_fields))],
+    "plan": [(parsers.split_by_act, legacy.split_by_act),
+             (parsers.act, legacy.parse_act),
+             (parsers.text_plan, legacy.parse_text_plan)],
+    "scene": [(parsers.scene_text, legacy.prepare_scene_text)],
+}
+
+
+def assert_equivalent(kind, text):
+    if kind == "scenes":
+        for act_chapters in act_chapter_variants(text):
+            assert outcome(parsers.act_scenes, text, act_chapters) == \
+                outcome(legacy.act_scenes, text, act_chapters)
+        return
+    for new, old in PAIRS[kind]:
+        assert outcome(new, text) == outcome(old, text)
+
+
+@pytest.mark.parametrize("kind", ["spec", "plan", "scenes", "scene"])
+def test_fixtures_match_legacy(kind):
+    inputs = fixtures(kind)
+    assert inputs
+    for text in inputs.values():
+        assert_equivalent(kind, text)
+
+
+@pytest.mark.parametrize("kind", ["spec", "plan", "scenes", "scene"])
+def test_adversarial_inputs_match_legacy(kind):
+    for text in adversarial(kind, n=500).values():
+        assert_equivalent(kind, text)
+
+
+@pytest.mark.parametrize("kind", ["spec", "plan", "scenes", "scene"])
+def test_fuzzed_fixtures_match_legacy(kind):
+    rng = random.Random(kind)
+    inputs = list(fixtures(kind).values())
+    for _ in range(FUZZ_ITERATIONS):
+        assert_equivalent(kind, mutate(rng.choice(inputs), rng))
+
+
+@pytest.mark.parametrize("kind", ["spec", "plan", "scenes", "scene"])
+def test_adversarial_inputs_parse_quickly(kind):
+    if kind == "scenes":
+        def parse(text):
+            return outcome(parsers.act_scenes, text, chapter_numbers(text))
+    else:
+        parse = PAIRS[kind][-1][0]
+    for name, text in adversarial(kind).items():
+        started = time.perf_counter()
+        parse(text)
+        assert time.perf_counter() - started < ADVERSARIAL_SECONDS, name
+
+
+def test_book_spec_properties():
+    rng = random.Random(0)
+    inputs = list(fixtures("spec").values())
+    for _ in range(FUZZ_ITERATIONS):
+        spec = parsers.book_spec(mutate(rng.choice(inputs), rng), book_spec_fields)
+        assert list(spec) == book_spec_fields
+        assert all(isinstance(value, str) for value in spec.values())
+
+
+def test_book_spec_messy_fixture():
+    spec = parsers.book_spec(fixtures("spec")["spec_messy.txt"], book_spec_fields)
+    assert spec["Genre"] == "gothic mystery"
+    assert spec["Time"] == "late autumn continues on the next line without a colon"
+    assert spec["Point of View"] == "third personlimited"
+    assert "repeated after the closing quotes" in spec["Premise"]
+
+
+def test_text_plan_properties():
+    rng = random.Random(1)
+    inputs = list(fixtures("plan").values())
+    for _ in range(FUZZ_ITERATIONS):
+        text = mutate(rng.choice(inputs), rng)
+        acts = parsers.split_by_act(text)
+        assert acts == [] or (len(acts) == 3 and all(act.startswith("Act ") for act in acts))
+        plan = parsers.text_plan(text)
+        assert len(plan) <= 3
+        assert all(act["chapters"] for act in plan)
+
+
+def test_archived_plans_round_trip():
+    for text in (fixtures("plan")["plan_mansion.txt"], fixtures("plan")["plan_detective.txt"]):
+        plan = parsers.text_plan(text)
+        assert len(plan) == 3
+        from goat_storytelling_agent.plan import Plan
+        assert parsers.text_plan(Plan.plan_2_str(plan)) == plan
+
+
+def test_act_scenes_takes_the_last_marker_of_each_chapter():
+    text = fixtures("scenes")["scenes_renumbered.txt"]
+    scenes = parsers.act_scenes(text, [7, 8, 9])
+    assert list(scenes) == [7, 8, 9]
+    assert scenes[7] == ["Only this scene counts for chapter seven because the marker repeats."]
+    assert len(scenes[8]) == 1
+    with pytest.raises(KeyError):
+        parsers.act_scenes(text, [1, 2])
+
+
+def test_scene_text_drops_headers_and_the_next_scene():
+    text = parsers.scene_text(fixtures("scene")["scene_mansion_1.txt"])
+    assert text.lstrip().startswith("Dusk made a bruise of the harbor.")
+    assert "The model kept going" not in text
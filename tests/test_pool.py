@@ -0,0 +1,123 @@
+"""Replica selection, failover and ejection of BackendPool (pool.py)"""
+import pytest
+
+from goat_storytelling_agent import storytelling_agent
+from goat_storytelling_agent.pool import BackendPool
+
+REPLICAS = ["http://gpu1:8080", "http://gpu2:8080", "http://gpu3:8080"]
+
+
+def make_pool(**kwargs):
+    return BackendPool(REPLICAS, check_interval=None, **kwargs)
+
+
+def down(uri):
+    raise ConnectionError(uri)
+
+
+def test_calls_spread_over_replicas():
+    pool = make_pool()
+    uris = [pool.call(lambda uri: uri) for _ in range(6)]
+    assert sorted(uris) == sorted(REPLICAS * 2)
+
+
+def test_failed_call_moves_to_another_replica():
+    pool = make_pool()
+    tried = []
+
+    def query(uri):
+        tried.append(uri)
+        if uri == REPLICAS[0]:
+            raise ConnectionError("down")
+        return "reply"
+
+    assert pool.call(query) == "reply"
+    assert tried == REPLICAS[:2]
+    stats = pool.stats()
+    assert stats[REPLICAS[0]]["errors"] == 1
+    assert all(replica["outstanding"] == 0 for replica in stats.values())
+
+
+def test_rejected_result_moves_to_another_replica():
+    pool = make_pool()
+    replies = {REPLICAS[0]: "", REPLICAS[1]: "reply"}
+    assert pool.call(lambda uri: replies[uri]) == "reply"
+    assert pool.stats()[REPLICAS[0]]["errors"] == 1
+
+
+def test_last_failure_is_raised():
+    pool = make_pool()
+    with pytest.raises(ConnectionError):
+        pool.call(down, attempts=2)
+    assert [replica["errors"] for replica in pool.stats().values()] == [1, 1, 0]
+
+
+def test_replica_is_ejected_after_failures_in_a_row():
+    pool = make_pool(max_failures=2, cooldown=60)
+
+    def query(uri):
+        if uri == REPLICAS[0]:
+            raise ConnectionError("down")
+        return "reply"
+
+    for _ in range(6):
+        pool.call(query)
+    stats = pool.stats()
+    assert not stats[REPLICAS[0]]["available"]
+    assert stats[REPLICAS[0]]["calls"] == 2
+    # Ejected replicas get no calls during their cooldown
+    for _ in range(4):
+        assert pool.call(lambda uri: uri) != REPLICAS[0]
+
+
+def test_all_replicas_out_still_tries_the_first_one_due_back():
+    pool = make_pool(max_failures=1, cooldown=60)
+    with pytest.raises(ConnectionError):
+        pool.call(down, attempts=3)
+    assert not any(replica["available"] for replica in pool.stats().values())
+    assert pool.call(lambda uri: uri) == REPLICAS[0]
+
+
+def test_interrupted_call_is_released_without_counting_a_failure():
+    pool = make_pool(max_failures=1)
+
+    def query(uri):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        pool.call(query)
+    stats = pool.stats()
+    assert all(replica["outstanding"] == 0 for replica in stats.values())
+    assert all(replica["errors"] == 0 and replica["available"] for replica in stats.values())
+
+
+def test_hf_backend_does_not_sleep_after_its_last_try(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(storytelling_agent.time, "sleep", sleeps.append)
+
+    def post(*args, **kwargs):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(storytelling_agent.requests, "post", post)
+    tokenizer = lambda text, **kwargs: {"input_ids": text.split()}
+    messages = [{"role": "user", "content": "hi"}]
+    assert storytelling_agent._query_chat_hf("http://gpu1:8080", messages, tokenizer, retries=1) == ''
+    assert sleeps == []
+    assert storytelling_agent._query_chat_hf("http://gpu1:8080", messages, tokenizer, retries=3) == ''
+    assert sleeps == [5, 5]
+
+
+def test_agent_fails_over_between_replicas(monkeypatch):
+    tried = []
+
+    def fake_llamacpp(endpoint, messages, retries, **kwargs):
+        tried.append((endpoint, retries))
+        return "" if endpoint == REPLICAS[0] else "reply"
+
+    monkeypatch.setattr(storytelling_agent, "_query_chat_llamacpp", fake_llamacpp)
+    monkeypatch.setattr(storytelling_agent, "_backend_pool",
+                        lambda endpoints, policy: BackendPool(endpoints, policy, check_interval=None))
+    agent = storytelling_agent.StoryAgent(REPLICAS[:2], backend="llama.cpp")
+    assert agent.query_chat([{"role": "user", "content": "hi"}]) == "reply"
+    # Each replica gets one try, failover replaces the backend's own retries
+    assert tried == [(REPLICAS[0], 1), (REPLICAS[1], 1)]
@@ -0,0 +1,109 @@
+"""Routing table validation and cascades of StoryAgent (routing.py)"""
+import pytest
+
+from goat_storytelling_agent import routing, storytelling_agent
+from goat_storytelling_agent.pool import BackendPool
+from goat_storytelling_agent.storytelling_agent import SUPPORTED_BACKENDS, StoryAgent
+
+LOCAL = {"backend": "llama.cpp", "backend_uri": "http://localhost:8080"}
+REPLICAS = ["http://gpu1:8080", "http://gpu2:8080"]
+
+
+def make_agent(routes=None, **kwargs):
+    return StoryAgent("sk-test", backend="openai", model="gpt-5", routes=routes, **kwargs)
+
+
+@pytest.mark.parametrize("routes, message", [
+    ({"write_a_story": {}}, "Unknown stage"),
+    ({"write_a_scene": []}, "Empty cascade"),
+    ({"write_a_scene": {"temperature": 1.0}}, "Unknown route options"),
+    ({"write_a_scene": [{}, {"backend": "vllm", "backend_uri": "http://x"}]}, "Unknown backend"),
+])
+def test_route_list_rejects_bad_tables(routes, message):
+    (stage, cascade), = routes.items()
+    with pytest.raises(ValueError, match=message):
+        routing.route_list(stage, cascade, SUPPORTED_BACKENDS)
+
+
+def test_route_list_wraps_a_single_route():
+    assert routing.route_list("write_a_scene", LOCAL, SUPPORTED_BACKENDS) == [LOCAL]
+
+
+def test_agent_rejects_routes_to_another_backend_without_a_uri():
+    with pytest.raises(ValueError, match="needs a backend_uri"):
+        make_agent({"write_a_scene": {"backend": "llama.cpp"}})
+
+
+def test_agent_rejects_openai_pools():
+    with pytest.raises(ValueError, match="Backend pools"):
+        make_agent({"write_a_scene": {"backend_uri": ["sk-a", "sk-b"]}})
+
+
+def test_openai_route_over_a_pooled_default_leaves_the_pool(monkeypatch):
+    monkeypatch.setattr(storytelling_agent, "_backend_pool",
+                        lambda endpoints, policy: BackendPool(endpoints, policy, check_interval=None))
+    agent = StoryAgent(REPLICAS, backend="llama.cpp",
+                       routes={"write_a_scene": {"backend": "openai", "backend_uri": "sk-test"}})
+    assert "pool" not in agent.route("write_a_scene")
+
+
+def test_single_uri_route_over_a_pooled_default_leaves_the_pool(monkeypatch):
+    calls = []
+
+    def fake_llamacpp(endpoint, messages, **kwargs):
+        calls.append(endpoint)
+        return "reply"
+
+    monkeypatch.setattr(storytelling_agent, "_query_chat_llamacpp", fake_llamacpp)
+    monkeypatch.setattr(storytelling_agent, "_backend_pool",
+                        lambda endpoints, policy: BackendPool(endpoints, policy, check_interval=None))
+    agent = StoryAgent(REPLICAS, backend="llama.cpp", routes={"write_a_scene": LOCAL})
+    route = agent.route("write_a_scene")
+    assert "pool" not in route and "pool" in agent.default_route
+    assert routing.describe(route) == "llama.cpp:http://localhost:8080"
+    agent.query_chat([{"role": "user", "content": "hi"}], stage="write_a_scene")
+    assert calls == ["http://localhost:8080"]
+
+
+def test_unrouted_stages_use_the_agent_backend():
+    agent = make_agent({"split_chapters_into_scenes": LOCAL})
+    assert agent.route("init_book_spec") == agent.default_route
+    assert agent.route("split_chapters_into_scenes")["backend"] == "llama.cpp"
+    # Options a route leaves out are the agent's own
+    assert agent.route("split_chapters_into_scenes")["request_timeout"] == agent.request_timeout
+
+
+def test_cascade_escalates_per_attempt_and_stays_on_the_last_route():
+    agent = make_agent({"enhance_plot_chapters": [LOCAL, {"model": "gpt-5-mini"}]})
+    routes = [agent.route("enhance_plot_chapters", attempt) for attempt in range(3)]
+    assert [route["backend"] for route in routes] == ["llama.cpp", "openai", "openai"]
+    assert routes[1]["model"] == "gpt-5-mini"
+    # The cascade's later routes start from the stage's own route, not the first one
+    assert routes[1]["backend_uri"] == "sk-test"
+
+
+def test_calls_and_escalations_are_counted_per_route(monkeypatch):
+    calls = []
+
+    def fake_llamacpp(endpoint, messages, **kwargs):
+        calls.append(("llama.cpp", endpoint))
+        return "local reply"
+
+    def fake_openai(endpoint, messages, model, **kwargs):
+        calls.append(("openai", model))
+        return "remote reply"
+
+    monkeypatch.setattr(storytelling_agent, "_query_chat_llamacpp", fake_llamacpp)
+    monkeypatch.setattr(storytelling_agent, "_query_chat_openai", fake_openai)
+    agent = make_agent({"enhance_plot_chapters": [LOCAL, {}]})
+    messages = [{"role": "user", "content": "plan"}]
+    assert agent.query_chat(messages, stage="enhance_plot_chapters") == "local reply"
+    assert agent.query_chat(messages, stage="enhance_plot_chapters", attempt=1) == "remote reply"
+    assert agent.query_chat(messages, stage="init_book_spec") == "remote reply"
+    assert calls == [("llama.cpp", "http://localhost:8080"), ("openai", "gpt-5"), ("openai", "gpt-5")]
+    assert agent.route_calls == {"llama.cpp:http://localhost:8080": 1, "openai:gpt-5": 2}
+    assert agent.escalations == {"enhance_plot_chapters": 1}
+
+
+def test_describe_never_shows_an_openai_key():
+    assert routing.describe({"backend": "openai", "backend_uri": "sk-secret", "model": "gpt-5"}) == "openai:gpt-5"
@@ -0,0 +1,24 @@
+"""Token usage totals and the degeneration default of StoryAgent"""
+from goat_storytelling_agent import storytelling_agent
+from goat_storytelling_agent.storytelling_agent import StoryAgent
+
+
+def test_degeneration_monitor_is_opt_in():
+    assert StoryAgent("sk-test", backend="openai").degeneration is None
+
+
+def test_calls_without_usage_are_counted_apart(monkeypatch):
+    replies = iter([{"input_tokens": 10, "output_tokens": 5},
+                    {"input_tokens": None, "output_tokens": None},
+                    {"input_tokens": 7, "output_tokens": 3}])
+
+    def fake_openai(endpoint, messages, model, usage, **kwargs):
+        usage.update(next(replies))
+        return "reply"
+
+    monkeypatch.setattr(storytelling_agent, "_query_chat_openai", fake_openai)
+    agent = StoryAgent("sk-test", backend="openai")
+    messages = [{"role": "user", "content": "hi"}]
+    for _ in range(3):
+        agent.query_chat(messages)
+    assert agent.usage == {"calls": 3, "input_tokens": 17, "output_tokens": 8, "unknown_usage_calls": 1}
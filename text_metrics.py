@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Cheap local text-quality metrics for every scene of every session
+
+Computes lexical diversity, trigram repetition, the sentence-length
+distribution, the dialogue ratio and Flesch reading ease without any model
+call, to triage stories before paying for the LLM judges.
+
+Counting is vectorized with NumPy over the whole story at once, sessions are
+processed in a process pool, and results are cached next to the export
+manifest in frontend/public/sessions/.text_metrics/<id>.json, keyed by the
+SHA-256 of final_story.txt, so reruns only touch stories that changed and
+the session logs are never modified. export_sessions.py refreshes the
+metrics and puts the per-session summary into the exported stats.
+
+Usage: python text_metrics.py [SESSION_ID ...] [--workers N] [--force] [--cache-dir DIR]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from goat_storytelling_agent.story_file import read_scenes
+
+METRICS_DIR = Path(__file__).parent / "frontend" / "public" / "sessions" / ".text_metrics"
+METRICS_VERSION = 1
+
+WORD_RE = re.compile(r"[A-Za-z]+(?:['’][A-Za-z]+)*")
+SENTENCE_END_RE = re.compile(r"[.!?…]+[\"”’)\]]*(?=\s|$)")
+DIALOGUE_RE = re.compile(r"“[^”]*”|\"[^\"\n]*\"")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+
+def syllables(word):
+    """Rough syllable count of a lowercase word (vowel groups, silent final e)"""
+    count = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(count, 1)
+
+
+def _percentiles(values, owners, n_owners, qs=(10, 50, 90)):
+    """Per-owner percentiles of values (owners sorted ascending)"""
+    result = np.zeros((n_owners, len(qs)))
+    bounds = np.searchsorted(owners, np.arange(n_owners + 1))
+    for i in range(n_owners):
+        chunk = values[bounds[i]:bounds[i + 1]]
+        if len(chunk):
+            result[i] = np.percentile(chunk, qs)
+    return result
+
+
+def story_metrics(scenes):
+    """Text metrics of a story
+
+    Parameters
+    ----------
+    scenes : List[Dict]
+        split_scenes-style dicts ('scene', 'chapter', 'text')
+
+    Returns
+    -------
+    Dict
+        'scenes': one dict of metrics per scene, 'summary': the same metrics
+        over the whole story (trigram repetition counts repeats across scenes)
+    """
+    n = len(scenes)
+    words, owners, word_starts, sentence_ends, sentence_owners = [], [], [], [], []
+    dialogue_chars = np.zeros(n)
+    text_chars = np.zeros(n)
+    offset = 0  # words are assigned to sentences by offset, so offsets are story-wide
+    for i, scene in enumerate(scenes):
+        text = scene["text"]
+        matches = list(WORD_RE.finditer(text))
+        words.extend(m.group(0).lower() for m in matches)
+        owners.extend([i] * len(matches))
+        word_starts.extend(offset + m.start() for m in matches)
+        ends = [offset + m.end() for m in SENTENCE_END_RE.finditer(text)]
+        if not ends or ends[-1] < offset + len(text):
+            ends.append(offset + len(text))
+        sentence_ends.extend(ends)
+        sentence_owners.extend([i] * len(ends))
+        dialogue_chars[i] = sum(len(m.group(0)) for m in DIALOGUE_RE.finditer(text))
+        text_chars[i] = len(text)
+        offset += len(text) + 1
+
+    owners = np.array(owners, dtype=np.int64)
+    tokens = np.bincount(owners, minlength=n).astype(float)
+    if words:
+        vocabulary, ids = np.unique(np.array(words, dtype=object), return_inverse=True)
+        word_syllables = np.array([syllables(w) for w in vocabulary])[ids]
+    else:
+        vocabulary, ids, word_syllables = np.array([]), np.array([], dtype=np.int64), np.array([])
+
+    # Lexical diversity: distinct words per scene
+    vocab_size = max(len(vocabulary), 1)
+    types = np.bincount(np.unique(owners * vocab_size + ids) // vocab_size, minlength=n).astype(float)
+
+    # Trigram repetition: share of trigrams whose (scene, w1, w2, w3) occurs more than once
+    trigrams = np.zeros((0, 4), dtype=np.int64)
+    if len(owners) > 2:
+        trigrams = np.stack([owners[:-2], ids[:-2], ids[1:-1], ids[2:]], axis=1)
+        trigrams = trigrams[owners[:-2] == owners[2:]]
+    scene_trigrams = np.bincount(trigrams[:, 0], minlength=n).astype(float)
+    repeated = np.zeros(n)
+    story_repeated = 0.0
+    if len(trigrams):
+        unique, counts = np.unique(trigrams, axis=0, return_counts=True)
+        repeated = np.bincount(unique[:, 0], weights=np.where(counts > 1, counts, 0), minlength=n)
+        _, story_counts = np.unique(trigrams[:, 1:], axis=0, return_counts=True)
+        story_repeated = float(story_counts[story_counts > 1].sum())
+
+    # Sentence lengths: words assigned to the sentence whose end follows them
+    sentence_ends = np.array(sentence_ends, dtype=np.int64)
+    sentence_owners = np.array(sentence_owners, dtype=np.int64)
+    sentence_ids = np.searchsorted(sentence_ends, np.array(word_starts, dtype=np.int64), side="right")
+    sentence_words = np.bincount(sentence_ids, minlength=len(sentence_ends))[:len(sentence_ends)]
+    nonempty = sentence_words > 0
+    sentence_words, sentence_owners = sentence_words[nonempty], sentence_owners[nonempty]
+    sentences = np.bincount(sentence_owners, minlength=n).astype(float)
+    sentence_sum = np.bincount(sentence_owners, weights=sentence_words, minlength=n)
+    sentence_sq = np.bincount(sentence_owners, weights=sentence_words.astype(float) ** 2, minlength=n)
+    sentence_mean = np.divide(sentence_sum, sentences, out=np.zeros(n), where=sentences > 0)
+    sentence_std = np.sqrt(np.maximum(
+        np.divide(sentence_sq, sentences, out=np.zeros(n), where=sentences > 0) - sentence_mean ** 2, 0))
+    sentence_pcts = _percentiles(sentence_words, sentence_owners, n)
+
+    scene_syllables = np.bincount(owners, weights=word_syllables, minlength=n)
+
+    def flesch(n_words, n_sentences, n_syllables):
+        if not n_words or not n_sentences:
+            return None
+        return round(206.835 - 1.015 * n_words / n_sentences - 84.6 * n_syllables / n_words, 2)
+
+    def ratio(a, b):
+        return round(float(a / b), 4) if b else None
+
+    scene_results = []
+    for i, scene in enumerate(scenes):
+        scene_results.append({
+            "scene": scene["scene"],
+            "chapter": scene["chapter"],
+            "words": int(tokens[i]),
+            "sentences": int(sentences[i]),
+            "type_token_ratio": ratio(types[i], tokens[i]),
+            "guiraud": ratio(types[i], np.sqrt(tokens[i])),
+            "trigram_repetition": ratio(repeated[i], scene_trigrams[i]),
+            "sentence_mean": round(float(sentence_mean[i]), 2),
+            "sentence_std": round(float(sentence_std[i]), 2),
+            "sentence_p10": float(sentence_pcts[i, 0]),
+            "sentence_p50": float(sentence_pcts[i, 1]),
+            "sentence_p90": float(sentence_pcts[i, 2]),
+            "dialogue_ratio": ratio(dialogue_chars[i], text_chars[i]),
+            "flesch_reading_ease": flesch(tokens[i], sentences[i], scene_syllables[i]),
+        })
+
+    total_words, total_sentences = tokens.sum(), sentences.sum()
+    all_pcts = np.percentile(sentence_words, (10, 50, 90)) if len(sentence_words) else np.zeros(3)
+    scene_ttr = np.divide(types, tokens, out=np.zeros(n), where=tokens > 0)
+    scene_rep = np.divide(repeated, scene_trigrams, out=np.zeros(n), where=scene_trigrams > 0)
+    summary = {
+        "scenes": n,
+        "words": int(total_words),
+        "sentences": int(total_sentences),
+        "type_token_ratio": ratio(len(vocabulary), total_words),
+        "guiraud": ratio(len(vocabulary), np.sqrt(total_words)),
+        "scene_type_token_ratio": ratio((scene_ttr * tokens).sum(), total_words),
+        "trigram_repetition": ratio(story_repeated, len(trigrams)),
+        "max_scene_trigram_repetition": round(float(scene_rep.max()), 4) if n else None,
+        "sentence_mean": ratio(total_words, total_sentences),
+        "sentence_std": round(float(sentence_words.std()), 2) if len(sentence_words) else 0.0,
+        "sentence_p10": float(all_pcts[0]),
+        "sentence_p50": float(all_pcts[1]),
+        "sentence_p90": float(all_pcts[2]),
+        "dialogue_ratio": ratio(dialogue_chars.sum(), text_chars.sum()),
+        "flesch_reading_ease": flesch(total_words, total_sentences, scene_syllables.sum()),
+    }
+    return {"summary": summary, "scenes": scene_results}
+
+
+def story_hash(story_path):
+    digest = hashlib.sha256()
+    with open(story_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def metrics_path(session_dir, cache_dir=METRICS_DIR):
+    """Cache file of a session's metrics: <cache_dir>/<session id>.json"""
+    return Path(cache_dir) / f"{Path(session_dir).name.replace('session_', '')}.json"
+
+
+def load_metrics(session_dir, cache_dir=METRICS_DIR):
+    """Cached metrics of a session (None if never computed)"""
+    try:
+        with open(metrics_path(session_dir, cache_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(session_dir, story_sha=None, cache_dir=METRICS_DIR):
+    cached = load_metrics(session_dir, cache_dir)
+    story_path = Path(session_dir) / "final_story.txt"
+    return not cached or cached.get("version") != METRICS_VERSION \
+        or cached.get("story_sha256") != (story_sha or story_hash(story_path))
+
+
+def compute_session(session_dir, cache_dir=METRICS_DIR):
+    """Compute and write the metrics of one session (runs in a worker process)"""
+    session_dir = Path(session_dir)
+    path = metrics_path(session_dir, cache_dir)
+    story_path = session_dir / "final_story.txt"
+    started = time.monotonic()
+    result = {
+        "version": METRICS_VERSION,
+        "story_sha256": story_hash(story_path),
+        **story_metrics(read_scenes(story_path)),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return session_dir.name.replace("session_", ""), result["summary"], time.monotonic() - started
+
+
+def update_metrics(session_dirs, workers=None, force=False, cache_dir=METRICS_DIR):
+    """Recompute the metrics of sessions whose story changed, in a process pool
+
+    Returns {session_id: summary} of the recomputed sessions.
+    """
+    with_story = [Path(d) for d in session_dirs if (Path(d) / "final_story.txt").exists()]
+    stale = [d for d in with_story if force or is_stale(d, cache_dir=cache_dir)]
+    if not stale:
+        return {}
+    cache_dirs = [cache_dir] * len(stale)
+    if len(stale) == 1 or workers == 1:
+        results = map(compute_session, stale, cache_dirs)
+        return {session_id: summary for session_id, summary, _ in results}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return {session_id: summary
+                for session_id, summary, _ in pool.map(compute_session, stale, cache_dirs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute local text-quality metrics for story sessions")
+    parser.add_argument("sessions", nargs="*", help="session IDs (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="recompute even if the cache is up to date")
+    parser.add_argument("--logs-dir", default=str(Path(__file__).parent / "story_generation_logs"))
+    parser.add_argument("--cache-dir", default=str(METRICS_DIR), help=f"metrics cache (default: {METRICS_DIR})")
+    args = parser.parse_args()
+
+    logs_dir = Path(args.logs_dir)
+    if args.sessions:
+        session_dirs = [logs_dir / f"session_{sid}" for sid in args.sessions]
+    else:
+        session_dirs = sorted(d for d in logs_dir.iterdir() if d.is_dir() and d.name.startswith("session_"))
+
+    started = time.monotonic()
+    updated = update_metrics(session_dirs, args.workers, args.force, args.cache_dir)
+    print(f"📏 Text metrics: {len(updated)} computed, {len(session_dirs) - len(updated)} cached or without story "
+          f"({time.monotonic() - started:.2f}s)\n")
+
+    print(f"{'session':<18}{'scenes':>7}{'words':>9}{'TTR':>7}{'guiraud':>9}{'rep3':>7}"
+          f"{'sent':>7}{'dialog':>8}{'flesch':>8}")
+    for session_dir in session_dirs:
+        metrics = load_metrics(session_dir, args.cache_dir)
+        if not metrics:
+            continue
+        s = metrics["summary"]
+        print(f"{session_dir.name.replace('session_', ''):<18}{s['scenes']:>7}{s['words']:>9}"
+              f"{s['scene_type_token_ratio'] or 0:>7.3f}{s['guiraud'] or 0:>9.1f}"
+              f"{s['trigram_repetition'] or 0:>7.3f}{s['sentence_mean'] or 0:>7.1f}"
+              f"{s['dialogue_ratio'] or 0:>8.3f}{s['flesch_reading_ease'] or 0:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()